@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from multiprocessing import cpu_count
+from datetime import date, timedelta
+
+import components.Investment
+import components.repository
+from components.Investment import Investment
+from components.sqlite_db import SQLiteDatabase
+from components.repository import Repository
+from components import batch_summary
+from benchmarks.synthetic import QuoteStub, quote_history_csv, portfolio_document
+
+def create_users(path, tickers, users, fonds_per_user, start, end, deposit_interval, rng):
+    db = SQLiteDatabase(path)
+    for i in range(users):
+        user_id = db.create_user({"id": str(i), "email": "user%d@example.com" % i})
+        held = rng.sample(tickers, fonds_per_user)
+        db.save_portfolio(json.dumps(portfolio_document(held, start, end, deposit_interval)), user_id)
+    db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch summary throughput by number of worker processes")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--fonds-per-user", type=int, default=3)
+    parser.add_argument("--years", type=float, default=2)
+    parser.add_argument("--deposit-interval", type=int, default=30, help="days between deposits")
+    parser.add_argument("--processes", type=int, action="append",
+                        help="worker processes to try, defaults to 1, 2, 4, ... up to the number of cores")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    processes = args.processes or sorted(set([2 ** i for i in range(8) if 2 ** i < cpu_count()] + [cpu_count()]))
+    rng = random.Random(args.seed)
+    end = date.today()
+    start = end - timedelta(days=int(365.25 * args.years))
+    tickers = ["B%d" % i for i in range(args.tickers)]
+    quotes = {"%s.FOND" % ticker: quote_history_csv(ticker, args.years, end, 10, 0.01, rng) for ticker in tickers}
+
+    directory = tempfile.mkdtemp(prefix="portfolio-bench-")
+    try:
+        path = os.path.join(directory, "portfolio.db")
+        create_users(path, tickers, args.users, args.fonds_per_user, start, end, args.deposit_interval, rng)
+        components.repository.storage_backend = "sqlite"
+        components.repository.sqlite_path = path
+        Investment._cache_directory = directory
+
+        with QuoteStub(quotes) as stub, open(os.devnull, "w") as output:
+            components.Investment.quotes_source_url = stub.url
+            baseline = None
+            for count in processes:
+                Investment._memory_cache.clear()
+                repo = Repository()
+                begin = time.time()
+                written, failed = batch_summary.run(repo, batch_summary.file_sink(output), count)
+                elapsed = time.time() - begin
+                repo.close()
+
+                baseline = baseline or (count, elapsed)
+                speedup = baseline[1] / elapsed
+                print "%3d processes %8.3fs %8.1f portfolios/s %6.2fx speedup %5.0f%% efficiency" % (
+                    count, elapsed, written / elapsed, speedup, 100 * speedup * baseline[0] / count)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from datetime import date, timedelta
+
+import components.Investment
+from components.Investment import Investment
+from components.Fond import Fond
+from components.Portfolio import Portfolio
+from components import wire_format
+from benchmarks.synthetic import QuoteStub, quote_history_csv, portfolio_document
+
+def _max_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def deep_size(obj, seen=None):
+    """Bytes allocated for obj and everything it references"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+def _run_stage(stage, args, number, results):
+    context = stage["setup"](args)
+    rss_before = _max_rss_kb()
+    start = time.time()
+    for i in range(number):
+        items = stage["run"](context)
+    elapsed = (time.time() - start) / number
+    result = {
+        "seconds": elapsed,
+        "items": items,
+        "items_per_second": items / elapsed if elapsed else None,
+        "peak_rss_kb": _max_rss_kb(),
+        "rss_growth_kb": _max_rss_kb() - rss_before,
+    }
+    if "retained" in stage:
+        result["retained_kb"] = deep_size(stage["retained"](context)) / 1024
+    results.put(result)
+
+def measure(stage, args):
+    """Runs a stage in a forked child so peak memory is attributed to that stage alone"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_stage, args=(stage, args, args.number, results))
+    process.start()
+    result = results.get()
+    process.join()
+    result["name"] = stage["name"]
+    return result
+
+def _clear_cache(args):
+    Investment._memory_cache.clear()
+    for filename in os.listdir(args.cache_directory):
+        shutil.rmtree(os.path.join(args.cache_directory, filename))
+
+def _load_quotes(args):
+    for ticker in args.tickers:
+        Fond(ticker).fond_quotes.get_quotes()
+
+def _new_portfolio(args):
+    return Portfolio(1, {fond["ticker"]: Fond(**fond) for fond in args.document})
+
+def _date_handler(obj):
+    return Portfolio.json_serializer(obj)
+
+def setup_remote(args):
+    _clear_cache(args)
+    return args
+
+def run_remote(args):
+    _clear_cache(args)
+    _load_quotes(args)
+    return args.quote_rows
+
+def setup_cached(args):
+    _load_quotes(args)
+    return args
+
+def run_cached(args):
+    # measure loading from the cache files, not the in-process cache
+    Investment._memory_cache.clear()
+    _load_quotes(args)
+    return args.quote_rows
+
+def setup_fill_holes(args):
+    _load_quotes(args)
+    investment = Fond(args.tickers[0]).fond_quotes
+    quotes = investment._get_from_cache()["quotes"][::-1]
+    return investment, quotes
+
+def run_fill_holes(context):
+    investment, quotes = context
+    return len(investment._fill_date_holes_in_quotes(quotes))
+
+def setup_development(args):
+    _load_quotes(args)
+    return _new_portfolio(args)
+
+def run_development(portfolio):
+    return sum(len(fond.get_developement()) for fond in portfolio.portfolio.values())
+
+def setup_total_development(args):
+    portfolio = setup_development(args)
+    return portfolio, [fond.get_developement() for fond in portfolio.portfolio.values()]
+
+def run_total_development(context):
+    portfolio, developments = context
+    return len(portfolio.get_total_development([list(development) for development in developments])["development"])
+
+def setup_summary(args):
+    return setup_development(args)
+
+def run_summary(portfolio):
+    return len(portfolio.get_summary()[-1]["development"])
+
+def setup_summary_json(args):
+    portfolio = setup_development(args)
+    return portfolio.get_summary()
+
+def run_summary_json(summary):
+    return len(json.dumps(summary, default=_date_handler))
+
+def run_summary_columnar(summary):
+    return len(wire_format.encode(summary, wire_format.COLUMNAR_JSON))
+
+def setup_analytics(args):
+    return setup_development(args)
+
+def run_analytics(portfolio):
+    return len(portfolio.get_analytics())
+
+def setup_analytics_json(args):
+    portfolio = setup_development(args)
+    return portfolio.get_analytics()
+
+def run_analytics_json(analytics):
+    return len(json.dumps(analytics))
+
+stages = [
+    {"name": "quotes_remote", "setup": setup_remote, "run": run_remote},
+    {"name": "quotes_cached", "setup": setup_cached, "run": run_cached},
+    {"name": "fill_date_holes", "setup": setup_fill_holes, "run": run_fill_holes},
+    {"name": "fond_development", "setup": setup_development, "run": run_development},
+    {"name": "total_development", "setup": setup_total_development, "run": run_total_development},
+    {"name": "summary", "setup": setup_summary, "run": run_summary, "retained": lambda portfolio: portfolio.get_summary()},
+    {"name": "summary_json", "setup": setup_summary_json, "run": run_summary_json},
+    {"name": "summary_columnar_json", "setup": setup_summary_json, "run": run_summary_columnar},
+    {"name": "analytics", "setup": setup_analytics, "run": run_analytics},
+    {"name": "analytics_json", "setup": setup_analytics_json, "run": run_analytics_json},
+]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the quote and development hot paths on synthetic portfolios")
+    parser.add_argument("--years", type=float, default=1, help="years of quote history per fond")
+    parser.add_argument("--fonds", type=int, default=3)
+    parser.add_argument("--deposit-interval", type=int, default=30, help="days between deposits")
+    parser.add_argument("--holidays", type=int, default=10, help="holidays per year")
+    parser.add_argument("--gap-probability", type=float, default=0.01, help="probability of a missing quote on a trading day")
+    parser.add_argument("--number", type=int, default=3, help="runs per stage, the mean is reported")
+    parser.add_argument("--stage", action="append", help="only run the named stage(s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    end = date.today()
+    start = end - timedelta(days=int(365.25 * args.years))
+
+    args.tickers = ["B%d" % i for i in range(args.fonds)]
+    quotes = {"%s.FOND" % ticker: quote_history_csv(ticker, args.years, end, args.holidays, args.gap_probability, rng)
+              for ticker in args.tickers}
+    args.quote_rows = sum(csv.count("\n") - 1 for csv in quotes.values())
+    args.document = portfolio_document(args.tickers, start, end, args.deposit_interval)
+    args.cache_directory = tempfile.mkdtemp(prefix="portfolio-bench-")
+
+    results = []
+    try:
+        with QuoteStub(quotes) as stub:
+            components.Investment.quotes_source_url = stub.url
+            Investment._cache_directory = args.cache_directory
+
+            for stage in stages:
+                if args.stage and stage["name"] not in args.stage:
+                    continue
+                result = measure(stage, args)
+                results.append(result)
+                print "%-18s %9.4fs %12.0f items/s %10d kB peak" % (
+                    result["name"], result["seconds"], result["items_per_second"] or 0, result["peak_rss_kb"])
+    finally:
+        shutil.rmtree(args.cache_directory)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "years": args.years,
+                "fonds": args.fonds,
+                "deposit_interval": args.deposit_interval,
+                "holidays": args.holidays,
+                "gap_probability": args.gap_probability,
+                "number": args.number,
+                "seed": args.seed,
+                "quote_rows": args.quote_rows,
+                "deposits": sum(len(fond["deposits"]) for fond in args.document),
+            },
+            "stages": results,
+        }, f, indent=2)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import timeit
+import datetime
+from datetime import date, timedelta
+
+from components import dates
+
+def strptime(texts, format):
+    return [datetime.datetime.strptime(text, format).date() for text in texts]
+
+def fast_path(texts, format):
+    return [dates._parse_fixed_width(text, format) for text in texts]
+
+def memoized(texts, format):
+    return [dates.parse(text, format) for text in texts]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Date parsing throughput, strptime vs the dates module")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=2500, help="distinct days among the rows, like quotes of many fonds")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    start = date(2000, 1, 1)
+    days = [start + timedelta(days=i % args.days) for i in range(args.rows)]
+
+    for format in [dates.COMPACT, dates.ISO]:
+        texts = [day.strftime(format) for day in days]
+        for name, function in [("strptime", strptime), ("fast path", fast_path), ("memoized", memoized)]:
+            dates._parsed[format].clear()
+            best = min(timeit.repeat(lambda: function(texts, format), number=1, repeat=args.repeat))
+            print "%-9s %-10s %8.4fs %10.0f rows/s" % (format, name, best, args.rows / best)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import timeit
+from datetime import date, timedelta
+
+from components.Fond import Fond
+from components.Portfolio import Portfolio
+
+def generate_deposits(tickers, num_deposits):
+    start = date(2000, 1, 1)
+    return [{
+        "ticker": tickers[i % len(tickers)],
+        "date": (start + timedelta(days=i)).isoformat(),
+        "amount": 1000
+    } for i in range(num_deposits)]
+
+def new_portfolio(tickers):
+    return Portfolio(1, {ticker: Fond(ticker, ticker) for ticker in tickers})
+
+def per_call(deposits, tickers):
+    # mirrors one PUT /deposit per entry: every call rewrites the whole document
+    portfolio = new_portfolio(tickers)
+    for deposit in deposits:
+        portfolio.deposit(deposit["ticker"], deposit["date"], deposit["amount"])
+        portfolio.to_json()
+
+def batch(deposits, tickers):
+    portfolio = new_portfolio(tickers)
+    portfolio.deposit_many(deposits)
+    portfolio.to_json()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deposit import throughput, per-call vs batch")
+    parser.add_argument("--deposits", type=int, default=500)
+    parser.add_argument("--fonds", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tickers = ["T%d" % i for i in range(args.fonds)]
+    deposits = generate_deposits(tickers, args.deposits)
+
+    for name, function in [("per-call", per_call), ("batch", batch)]:
+        best = min(timeit.repeat(lambda: function(deposits, tickers), number=1, repeat=args.repeat))
+        print "%-10s %8.4fs %10.0f deposits/s" % (name, best, args.deposits / best)
+
+if __name__ == "__main__":
+    sys.exit(main())
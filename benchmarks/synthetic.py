@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+import random
+import threading
+import BaseHTTPServer
+from datetime import date, timedelta
+
+quote_headers = ["quote_date", "paper", "exch", "open", "high", "low", "close", "volume", "value"]
+
+def trading_days(start, end, holidays_per_year=0, gap_probability=0.0, rng=random):
+    """Weekdays between start and end, minus random holidays and random missing quotes"""
+    holidays = set()
+    for year in range(start.year, end.year + 1):
+        first = date(year, 1, 1)
+        for i in range(holidays_per_year):
+            holidays.add(first + timedelta(days=rng.randint(0, 364)))
+
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5 and day not in holidays and rng.random() >= gap_probability:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+def quote_history_csv(ticker, years, end=None, holidays_per_year=10, gap_probability=0.01, rng=random):
+    """Quote history in the csv format served by the quotes source, newest row first"""
+    end = end or date.today()
+    start = end - timedelta(days=int(365.25 * years))
+
+    close = rng.uniform(50, 500)
+    rows = []
+    for day in trading_days(start, end, holidays_per_year, gap_probability, rng):
+        close *= rng.uniform(0.97, 1.03)
+        price = "%.2f" % close
+        rows.append(",".join([day.strftime("%Y%m%d"), ticker, "Fonds", price, price, price, price, "0", "0"]))
+
+    return "\n".join([",".join(quote_headers)] + rows[::-1]) + "\n"
+
+def portfolio_document(tickers, start, end, deposit_interval=30, amount=1000):
+    """Portfolio document as stored in the portfolio column, one deposit every deposit_interval days"""
+    document = []
+    for ticker in tickers:
+        deposits = []
+        day = start
+        while day <= end:
+            deposits.append({"date": day.isoformat(), "amount": amount})
+            day += timedelta(days=deposit_interval)
+        document.append({"ticker": ticker, "name": "Synthetic %s" % ticker, "deposits": deposits})
+    return document
+
+class QuoteStub:
+    """Serves generated quote histories over http on localhost, like the quotes source would"""
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+        stub = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = stub.quotes.get(self.path.strip("/"))
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:%d/{}" % self.server.server_port
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
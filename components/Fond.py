@@ -12,6 +12,11 @@ from copy import deepcopy
 
 from Investment import Investment
 from error import InvalidUsage, InvalidDate
+from records import Deposit, DevelopmentRow
+from unit_index import UnitIndex
+from deadline import DeadlineExceeded
+import dates
+import metrics
 
 class Fond:
     def __init__(self, ticker=None, name=None, deposits=[]):
@@ -19,11 +24,14 @@ class Fond:
             raise InvalidUsage("Ticker must contain a valid ticker (was {})".format(ticker))
         self.ticker = ticker
         self.name = name
-        self.fond_quotes = Investment("%s.FOND" % self.ticker)
-        self.deposits = map(lambda x: {
-            "date": datetime.datetime.strptime(x["date"], "%Y-%m-%d").date(),
-            "amount": int(x["amount"])
-        }, deposits)
+        self._fond_quotes = None
+        self._unit_index = None
+        # the earliest date whose development changed since the fond was loaded
+        self.changed_from = None
+        self.deposits = map(lambda x: Deposit(
+            date=dates.parse(x["date"]),
+            amount=int(x["amount"])
+        ), deposits)
 
     def __eq__(self, other): 
         return isinstance(other, Fond) and self.ticker == other.ticker
@@ -36,30 +44,72 @@ class Fond:
             }
 
     @property
-    def quotes(self):
-        quotes = self.fond_quotes.get_quotes()
+    def fond_quotes(self):
+        # created on first use, fonds that are only deposited into never touch their quotes
+        if self._fond_quotes is None:
+            # development only needs the date and closing price of every quote
+            self._fond_quotes = Investment("%s.FOND" % self.ticker, columns=("quote_date", "close"))
+        return self._fond_quotes
+
+    @property
+    def quotes_stale(self):
+        return self._fond_quotes is not None and self._fond_quotes.stale
+
+    def get_unit_index(self, deadline=None):
+        # loaded once, a fond lives for a single request
+        if self._unit_index is None:
+            self._unit_index = UnitIndex.for_quotes(self.ticker, self.fond_quotes.get_quotes(deadline))
+        return self._unit_index
+
+    @property
+    def unit_index(self):
+        return self.get_unit_index()
+
+    def _start_position(self, index):
         if self.deposits:
-            start_idx = self.find_quote_entry_by_date(quotes, self.deposits[0]["date"])
-        else:
-            start_idx = -10
+            return index.position(self.deposits[0]["date"])
+        return -10
 
-        return quotes[start_idx:]
+    @property
+    def quotes(self):
+        index = self.unit_index
+        return index.quotes[self._start_position(index):]
 
     def _string_to_date(self, date):
-        if isinstance(date, str) or isinstance(date, unicode):
-            return datetime.datetime.strptime(date, "%Y-%m-%d").date()
-        elif isinstance(date, datetime.date):
-            return date
-
-        raise InvalidDate("Unknown type '%s' for date" % type(date).__name__)
+        return dates.to_date(date)
         
     def deposit(self, amount, date):
         date = self._string_to_date(date)
         if self.get_deposit_by_date(date):
             raise InvalidUsage("A deposit for that date is already registered")
 
-        updated_deposits = self.deposits + [{"amount": amount, "date": date}]
+        updated_deposits = self.deposits + [Deposit(date=date, amount=amount)]
         self.deposits = sorted(updated_deposits, key=lambda deposit: deposit["date"])
+        self.mark_changed(date)
+
+    def mark_changed(self, date):
+        if self.changed_from is None or date < self.changed_from:
+            self.changed_from = date
+
+    def merge_deposits(self, deposits):
+        """The deposits with deposits added, and the earliest added date, without changing the fond"""
+        registered = set(deposit["date"] for deposit in self.deposits)
+        new_deposits = []
+        for amount, date in deposits:
+            date = self._string_to_date(date)
+            if date in registered:
+                raise InvalidUsage("A deposit for %s is already registered in %s" % (date.isoformat(), self.ticker))
+
+            registered.add(date)
+            new_deposits.append(Deposit(date=date, amount=amount))
+
+        earliest = min(deposit.date for deposit in new_deposits) if new_deposits else None
+        return sorted(self.deposits + new_deposits, key=lambda deposit: deposit["date"]), earliest
+
+    def deposit_many(self, deposits):
+        self.deposits, earliest = self.merge_deposits(deposits)
+        if earliest is not None:
+            self.mark_changed(earliest)
 
     def delete_deposit(self, date):
         date = self._string_to_date(date)
@@ -70,6 +120,7 @@ class Fond:
         num_deleted = num_deposits_before - num_deposits_after
         if num_deleted is not 1:
             raise InvalidUsage("failed to delete deposit (%s)" % num_deleted)
+        self.mark_changed(date)
 
     def find_quote_entry_by_date(self, quotes, date):
         for i in range(len(quotes) - 1, -1, -1):
@@ -84,31 +135,40 @@ class Fond:
     def _price_developement_percent(self, before, after):
         return float(after["close"])/float(before["close"])
 
-    def get_developement(self):
-        rows = []
-        cash = 0
-
-        for i in range(0, len(self.quotes)):
-            curr_date = self.quotes[i]["quote_date"]
-            deposit = self.get_deposit_by_date(curr_date)
-
-            if i == 0:
-                percent_development = 1
-            else:
-                percent_development = self._price_developement_percent(self.quotes[i - 1], self.quotes[i])
-
-            cash = cash * percent_development + deposit
-            rows.append({
-                "date": curr_date,
-                "value": cash,
-                "deposit": deposit,
-                "quote": self.quotes[i]
-            })
-
-        return rows
+    def _deposits_by_date(self):
+        deposits = {}
+        for deposit in self.deposits:
+            day = dates.ordinal(deposit.date)
+            deposits[day] = deposits.get(day, 0) + deposit.amount
+        return deposits
+
+    def iter_developement(self, deadline=None):
+        index = self.get_unit_index(deadline)
+        deposits = self._deposits_by_date()
+        units = 0.0
+
+        for i in range(len(index))[self._start_position(index):]:
+            quote = index.quotes[i]
+            deposit = deposits.get(index.ordinals[i], 0)
+            units += deposit / index.values[i]
+            yield DevelopmentRow(quote["quote_date"], units * index.values[i], deposit, quote)
+
+    @metrics.timed("compute_seconds", "Time spent computing developments", label="stage")
+    def get_developement(self, deadline=None):
+        return list(self.iter_developement(deadline))
+
+    def get_summary(self, deadline=None):
+        try:
+            development = self.get_developement(deadline)
+        except DeadlineExceeded:
+            return {
+                "ticker": self.ticker,
+                "name": self.name,
+                "development": [],
+                "total_deposited": sum(deposit["amount"] for deposit in self.deposits),
+                "incomplete": True
+            }
 
-    def get_summary(self):
-        development = self.get_developement()
         return {
             "ticker": self.ticker,
             "name": self.name,
@@ -1,107 +1,252 @@
 #!/usr/bin/env python
 
 import os
+import re
 import time
 import requests
 import StringIO
 import csv
 import json
-from copy import deepcopy
 import datetime
+import tempfile
+import threading
+from cachetools import LRUCache
 
 from error import InvalidUsage
-from settings import quotes_source_url
+from settings import quotes_source_url, quotes_timeout, quotes_negative_ttl
+from settings import quotes_publication_time, market_holidays_file, quote_cache_size
+from market_calendar import load_calendar
+from deadline import DeadlineExceeded
+import metrics
+import quote_refresher
+import dates
 
 class Investment:
     _cache_directory = "/tmp"
-
-    def __init__(self, ticker):
+    # parsed quotes shared by every Investment in the process, keyed by (ticker, columns)
+    _memory_cache = LRUCache(maxsize=quote_cache_size)
+    # quotes with the date holes filled, computed once per loaded quotes
+    _filled_cache = LRUCache(maxsize=quote_cache_size)
+    # the caches are shared by the request threads and the quote refresher
+    _cache_lock = threading.Lock()
+    # expired quotes are served right away and refreshed by a background thread
+    revalidate_in_background = True
+    # decides when cached quotes can have been superseded
+    calendar = load_calendar(market_holidays_file, quotes_publication_time)
+    # tickers the quotes source does not know, and until when to believe it
+    _unknown_tickers = {}
+    # the columns of the quotes source, they name the cache files so nothing else is kept
+    known_columns = ("quote_date", "paper", "exch", "open", "high", "low", "close", "volume", "value")
+    # the ticker names the cache directory and goes into the quotes source url
+    _valid_ticker = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+    def __init__(self, ticker, columns=None):
+        if not self._valid_ticker.match(ticker or "") or ".." in ticker:
+            raise InvalidUsage("%s is not a valid ticker" % ticker)
         self.ticker = ticker
+        # the quote columns to load, None loads every column
+        self.columns = tuple(columns) if columns else None
         self.quotes_source_url = quotes_source_url.format(self.ticker)
-        self.filename = "%s/%s.json" % (self._cache_directory, self.ticker)
+        self.directory = "%s/%s" % (self._cache_directory, self.ticker)
+        self.filename = "%s/meta.json" % self.directory
         self.quotes = None
+        self.stale = False
+
+    def _cache_key(self):
+        return (self.ticker, self.columns)
+
+    def _projection(self, headers):
+        columns = self.columns or self.known_columns
+        return [(headers.index(column), column) for column in columns
+                if column in headers and column in self.known_columns]
+
+    def _rows_to_quotes(self, headers, rows):
+        projection = self._projection(headers)
+        return [self._map_datestring_to_datetime({column: row[i].strip() for i, column in projection}) for row in rows]
 
     def _get_quotes_from_remote(self):
-        response = requests.get(self.quotes_source_url)
-        if response.status_code is not 200:
+        breaker = quote_refresher.circuit_breaker(self.quotes_source_url)
+        if not breaker.allow():
+            metrics.inc("quote_upstream_requests_total", "Requests to the quotes source", status="circuit_open")
             return None
 
-        quotes = response.text
-        f = StringIO.StringIO(quotes)
-        reader = csv.reader(f)
-        quotes = [map(lambda x: x.encode("utf-8").strip(), row) for row in reader]
-        headers = quotes.pop(0)
+        try:
+            with metrics.timer("quote_upstream_seconds", "Latency of the quotes source"):
+                response = requests.get(self.quotes_source_url, timeout=quotes_timeout)
+        except requests.RequestException:
+            breaker.record_failure()
+            metrics.inc("quote_upstream_requests_total", "Requests to the quotes source", status="error")
+            return None
 
-        def row_to_dict(row, headers):
-            return {headers[i]: row[i] for i in range(0, len(headers))}
+        metrics.inc("quote_upstream_requests_total", "Requests to the quotes source", status=response.status_code)
+        # unknown tickers are answered with 4xx by a healthy source
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if 400 <= response.status_code < 500:
+            self._unknown_tickers[self.ticker] = time.time() + quotes_negative_ttl
+        if response.status_code is not 200:
+            return None
 
+        headers, rows = self._parse_csv(response.text.encode("utf-8"))
         quotes = {
             "fetch_time": int(time.time()),
-            "quotes": [row_to_dict(row, headers) for row in quotes]
+            "quotes": self._rows_to_quotes(headers, rows)
         }
 
-        self._put_in_cache(quotes)
-        quotes["quotes"] = map(self._map_datestring_to_datetime, quotes["quotes"])
+        # the cache keeps every known column, other consumers may ask for more than this one
+        self._put_in_cache(quotes["fetch_time"], headers, rows)
+        with self._cache_lock:
+            self._memory_cache[self._cache_key()] = quotes
         return quotes
 
-    def _fill_date_holes_in_quotes(self, quotes):
-        i = 1
-        while i < len(quotes):
-            day_after_yesterday = quotes[i - 1]["quote_date"] + datetime.timedelta(days=1)
-            if day_after_yesterday != quotes[i]["quote_date"]:
-                copy = deepcopy(quotes[i - 1])
-                copy["quote_date"] = day_after_yesterday
-                quotes = quotes[:i] + [copy] + quotes[i:]
-            else:
-                i += 1
+    def _parse_csv(self, data):
+        reader = csv.reader(StringIO.StringIO(data))
+        rows = [row for row in reader if row]
+        headers = map(lambda x: x.strip(), rows.pop(0))
+        return headers, rows
+
+    def import_quotes(self, data, fetch_time):
+        """Stores csv in the format of the quotes source as if it was fetched at fetch_time"""
+        headers, rows = self._parse_csv(data) if data.strip() else ([], [])
+        if "quote_date" not in headers:
+            raise InvalidUsage("%s quotes have no quote_date column" % self.ticker)
+        self._put_in_cache(fetch_time, headers, rows)
+        return len(rows)
+
+    def _get_quotes_from_remote_within(self, deadline):
+        """Stops waiting for the quotes source when the deadline passes, the fetch still fills the cache"""
+        if not deadline.expired:
+            result = []
+            fetch = threading.Thread(target=lambda: result.append(self._get_quotes_from_remote()),
+                                     name="quote-fetch-%s" % self.ticker)
+            fetch.daemon = True
+            fetch.start()
+            fetch.join(deadline.remaining())
+            if not fetch.is_alive():
+                return result[0] if result else None
+        else:
+            quote_refresher.schedule(self.ticker, self._get_quotes_from_remote)
+
+        metrics.inc("quote_cache_requests_total", "Quote cache lookups", result="deadline")
+        raise DeadlineExceeded("quotes for %s were not loaded in time" % self.ticker)
 
-        return quotes
-
-    def _put_in_cache(self, quotes):
-        with open(self.filename, "wr") as f:
-            f.write(json.dumps(quotes, indent=2))
+    def _fill_date_holes_in_quotes(self, quotes):
+        filled = quotes[:1]
+        for quote in quotes[1:]:
+            previous = filled[-1]
+            # days without a quote repeat the last known quote
+            for day in range(dates.ordinal(previous["quote_date"]) + 1, dates.ordinal(quote["quote_date"])):
+                copy = dict(previous)
+                copy["quote_date"] = dates.from_ordinal(day)
+                filled.append(copy)
+            filled.append(quote)
+
+        return filled
+
+    def _column_filename(self, column):
+        return "%s/%s.json" % (self.directory, column)
+
+    def _write_file(self, filename, data):
+        # write and rename, so readers never see a half written file
+        # the temp file is unique per writer, threads of one process refresh the same ticker too
+        fd, tmp_filename = tempfile.mkstemp(suffix=".tmp", prefix="%s." % os.path.basename(filename), dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(data))
+        os.rename(tmp_filename, filename)
+
+    def _put_in_cache(self, fetch_time, headers, rows):
+        """Stores one file per column, so loading reads only the requested columns"""
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # another writer created it in the meantime
+                if not os.path.isdir(self.directory):
+                    raise
+
+        projection = [(i, column) for i, column in enumerate(headers) if column in self.known_columns]
+        for i, column in projection:
+            self._write_file(self._column_filename(column), [row[i].strip() for row in rows])
+        self._write_file(self.filename, {"fetch_time": fetch_time, "columns": [column for i, column in projection],
+                                         "count": len(rows)})
+
+        with self._cache_lock:
+            for key in self._memory_cache.keys():
+                if key[0] == self.ticker:
+                    self._memory_cache.pop(key, None)
 
     def _map_datestring_to_datetime(self, q):
         if "quote_date" not in q:
             return q
-        q["quote_date"] = datetime.datetime.strptime(q["quote_date"], "%Y%m%d").date()
+        q["quote_date"] = dates.parse(q["quote_date"], dates.COMPACT)
         return q
 
     def _get_from_cache(self):
+        with self._cache_lock:
+            quotes = self._memory_cache.get(self._cache_key())
+        if quotes is not None:
+            return quotes
+
         if not os.path.isfile(self.filename):
             self.quotes = None
             return
 
-        quotes = json.loads(open(self.filename, "r").read())
-        quotes["quotes"] = map(self._map_datestring_to_datetime, quotes["quotes"])
+        meta = json.loads(open(self.filename, "r").read())
+        projection = self._projection(meta["columns"])
+        columns = [json.loads(open(self._column_filename(column), "r").read()) for i, column in projection]
+        if any(len(values) != meta["count"] for values in columns):
+            # a writer replaced the cache while it was being read
+            return None
+
+        names = [column for i, column in projection]
+        quotes = {
+            "fetch_time": meta["fetch_time"],
+            "quotes": [self._map_datestring_to_datetime(dict(zip(names, row))) for row in zip(*columns)]
+        }
+        with self._cache_lock:
+            self._memory_cache[self._cache_key()] = quotes
         return quotes
 
     def _get_date_today(self):
         return datetime.datetime.today()
 
-    def _quotes_has_expired(self, quotes):
-        deprecated_timestamp = time.mktime(self._get_date_today().replace(hour=18, minute=0, second=0).timetuple())
-        day_of_week = self._get_date_today().weekday()
-        weekend = [5, 6]
-
-        if day_of_week in weekend:
-            return False
-
-        if quotes["fetch_time"] > int(deprecated_timestamp):
-            return False
+    def expires_at(self, quotes):
+        """The first moment newer quotes than the ones in quotes can be published"""
+        return self.calendar.next_publication(datetime.datetime.fromtimestamp(quotes["fetch_time"]))
 
-        if time.mktime(self._get_date_today().timetuple()) - quotes["fetch_time"] < 30 * 60:
-            return False
-
-        return True
+    def _quotes_has_expired(self, quotes):
+        return self._get_date_today() >= self.expires_at(quotes)
 
-    def get_quotes(self):
+    @metrics.timed("quote_load_seconds", "Time spent loading quotes", label="stage")
+    def get_quotes(self, deadline=None):
         if not self.quotes:
-            self.quotes = self._get_from_cache() or self._get_quotes_from_remote()
+            self.quotes = self._get_from_cache()
+            metrics.inc("quote_cache_requests_total", "Quote cache lookups", result="hit" if self.quotes else "miss")
+            if not self.quotes and self._unknown_tickers.get(self.ticker, 0) > time.time():
+                metrics.inc("quote_cache_requests_total", "Quote cache lookups", result="unknown")
+                raise InvalidUsage("%s is not a valid ticker" % self.ticker)
+            if not self.quotes:
+                self.quotes = self._get_quotes_from_remote_within(deadline) if deadline else self._get_quotes_from_remote()
             if not self.quotes:
                 raise InvalidUsage("%s is not a valid ticker" % self.ticker)
 
-        if self._quotes_has_expired(self.quotes):
-            self.quotes = self._get_quotes_from_remote()
-
-        return self._fill_date_holes_in_quotes(self.quotes["quotes"][::-1])
+        self.stale = self._quotes_has_expired(self.quotes)
+        if self.stale:
+            metrics.inc("quote_cache_requests_total", "Quote cache lookups", result="expired")
+            if self.revalidate_in_background:
+                quote_refresher.schedule(self.ticker, self._get_quotes_from_remote)
+            else:
+                # keep serving the cached quotes if the source fails
+                fresh = self._get_quotes_from_remote()
+                if fresh:
+                    self.quotes, self.stale = fresh, False
+
+        with self._cache_lock:
+            filled = self._filled_cache.get(self._cache_key())
+        if filled is None or filled[0] is not self.quotes:
+            filled = (self.quotes, self._fill_date_holes_in_quotes(self.quotes["quotes"][::-1]))
+            with self._cache_lock:
+                self._filled_cache[self._cache_key()] = filled
+        return filled[1]
@@ -1,18 +1,30 @@
 import json
+import heapq
+import hashlib
+import itertools
 import datetime
-from copy import deepcopy
 
 from Fond import Fond
+from holdings import Holdings
+from records import Record, DevelopmentRow
 from error import InvalidUsage, InvalidDate
+import metrics
+import analytics
+import dates
+from deadline import DeadlineExceeded
 
 class Portfolio:
-    def __init__(self, user_id, fonds):
+    def __init__(self, user_id, fonds, revision=None):
         self.user_id = user_id
-        self.portfolio = fonds
+        self.portfolio = fonds if isinstance(fonds, Holdings) else Holdings(fonds=fonds)
+        # the stored version the portfolio was loaded from or saved as
+        self.revision = revision
+        # set when a change can not be described by a date, e.g. a new fond
+        self._changed_everything = False
 
     @staticmethod
     def json_serializer(obj):
-        if isinstance(obj, Fond):
+        if isinstance(obj, Fond) or isinstance(obj, Record):
             return obj.to_json()
         elif isinstance(obj, datetime.datetime) or isinstance(obj, datetime.date):
             return obj.isoformat()
@@ -20,45 +32,128 @@ class Portfolio:
             return None
 
     def _string_to_date(self, date):
-        if isinstance(date, str) or isinstance(date, unicode):
-            return datetime.datetime.strptime(date, "%Y-%m-%d").date()
-        elif isinstance(date, datetime.date):
-            return date
-
-        raise InvalidDate("Unknown type '%s' for date" % type(date).__name__)
+        return dates.to_date(date)
 
     def to_json(self):
-        return json.dumps(self.portfolio.values(), default=Portfolio.json_serializer)
+        return json.dumps(self.portfolio.documents(), default=Portfolio.json_serializer)
+
+    def version(self, deadline=None):
+        """Changes whenever the portfolio or the last quote of one of its fonds changes"""
+        last_quotes = []
+        for ticker in sorted(self.portfolio):
+            try:
+                quotes = self.portfolio[ticker].get_unit_index(deadline).quotes
+            except DeadlineExceeded:
+                last_quotes.append("\n%s unavailable" % ticker)
+                continue
+            if quotes:
+                last_quotes.append("\n%s %s %s" % (ticker, quotes[-1]["quote_date"].isoformat(), quotes[-1]["close"]))
+
+        # every fond is hydrated now, so the documents hash the same however the portfolio was used before
+        digest = hashlib.sha1(json.dumps(self.portfolio.documents(), sort_keys=True, default=Portfolio.json_serializer))
+        for line in last_quotes:
+            digest.update(line)
+        return digest.hexdigest()
+
+    def stale_tickers(self, deadline=None):
+        """Tickers served from expired quotes while a refresh is pending"""
+        stale = []
+        for ticker in sorted(self.portfolio):
+            fond = self.portfolio[ticker]
+            try:
+                fond.get_unit_index(deadline)
+            except DeadlineExceeded:
+                continue
+            if fond.quotes_stale:
+                stale.append(ticker)
+        return stale
+
+    def changed_from(self):
+        """The earliest date whose development changed since the portfolio was loaded,
+        None when no date was changed or the change is not limited to dates"""
+        if self._changed_everything:
+            return None
+        changed = [self.portfolio[ticker].changed_from for ticker in self.portfolio.hydrated()]
+        changed = [date for date in changed if date is not None]
+        return min(changed) if changed else None
+
+    def last_date(self, deadline=None):
+        """The date of the last development row, None if the quotes of a fond are not available"""
+        last = None
+        for ticker in self.portfolio:
+            try:
+                quotes = self.portfolio[ticker].get_unit_index(deadline).quotes
+            except DeadlineExceeded:
+                return None
+            if quotes and (last is None or quotes[-1]["quote_date"] > last):
+                last = quotes[-1]["quote_date"]
+        return last
 
     def get_deposits_by_date(self, date):
         return sum([fond.get_deposit_by_date(self._string_to_date(date)) for ticker, fond in self.portfolio.items()])
 
-    def get_summary(self):
-        summary = [fond.get_summary() for fond in self.portfolio.values()]
-        combined_development = self.get_total_development(map(lambda x: deepcopy(x["development"]), summary))
-
-        return summary + [combined_development]
+    @metrics.timed("compute_seconds", "Time spent computing developments", label="stage")
+    def get_summary(self, start=None, end=None, deadline=None):
+        """Fonds whose quotes are not loaded before the deadline are flagged incomplete and left out of the total"""
+        summary = [fond.get_summary(deadline) for fond in self.portfolio.values()]
+        complete = [entry for entry in summary if not entry.get("incomplete")]
+        combined_development = self.get_total_development([entry["development"] for entry in complete],
+                                                          [entry["ticker"] for entry in complete])
+
+        summary.append(combined_development)
+        if start or end:
+            # totals still cover the whole history, only the rows are limited
+            for entry in summary:
+                entry["development"] = [row for row in entry["development"] if _in_range(row["date"], start, end)]
+        return summary
+
+    def iter_development_rows(self, start=None, end=None):
+        """Yields (ticker, row) for every fond and then the portfolio total, one date at a time"""
+        fonds = self.portfolio.values()
+        merged = heapq.merge(*[_tagged(i, fond.iter_developement()) for i, fond in enumerate(fonds)])
+        for date, group in itertools.groupby(merged, key=lambda entry: entry[0]):
+            if end and date > end:
+                break
+
+            rows = [(fonds[i].ticker, row) for date, i, row in group]
+            if not _in_range(date, start, end):
+                continue
+            for entry in rows:
+                yield entry
+            yield "Portfolio", DevelopmentRow(date, sum(row["value"] for ticker, row in rows),
+                                              sum(row["deposit"] for ticker, row in rows))
+
+    @metrics.timed("compute_seconds", "Time spent computing developments", label="stage")
+    def get_total_development(self, fonds, tickers=None):
+        # rows are immutable, sum into [value, deposit, quote] per date and build the rows once
+        totals = {}
+        for development in fonds:
+            for row in development:
+                total = totals.get(row["date"])
+                if total is None:
+                    totals[row["date"]] = [row["value"], row["deposit"], row.get("quote")]
+                else:
+                    total[0] += row["value"]
+                    total[1] += row["deposit"]
 
-    def get_total_development(self, fonds):
-        def add_lists(list_a, list_b):
-            res = list_a
-            for b_entry in list_b:
-                a_entry = filter(lambda x: x["date"] == b_entry["date"], res)
+        result = [DevelopmentRow(date, value, deposit, quote) for date, (value, deposit, quote) in sorted(totals.items())]
+        covered = self.portfolio.values() if tickers is None else [self.portfolio[ticker] for ticker in tickers]
+        accumulated_deposits = sum(deposit["amount"] for fond in covered
+                                   for deposit in fond.deposits if deposit["date"] in totals)
 
-                if not a_entry:
-                    res += [b_entry]
-                else:
-                    a_entry[0]["value"] += b_entry["value"]
-                    a_entry[0]["deposit"] += b_entry["deposit"]
-            
-            return sorted(res, key=lambda x: x["date"])
+        return {"name": "Portfolio", "ticker": "Portfolio", "development": result, "total_deposited": accumulated_deposits,
+                "covers": [fond.ticker for fond in covered]}
 
-        result = reduce(add_lists, fonds, [])
-        accumulated_deposits = 0
-        for quote in result:
-            accumulated_deposits += self.get_deposits_by_date(quote["date"])
+    @metrics.timed("compute_seconds", "Time spent computing developments", label="stage")
+    def get_analytics(self):
+        fonds = self.portfolio.values()
+        developments = [fond.get_developement() for fond in fonds]
+        result = [analytics.analyze(fond.ticker, fond.name, development, fond.deposits)
+                  for fond, development in zip(fonds, developments)]
 
-        return {"name": "Portfolio", "ticker": "Portfolio", "development": result, "total_deposited": accumulated_deposits}
+        total = self.get_total_development(developments)
+        deposits = [deposit for fond in fonds for deposit in fond.deposits]
+        return result + [analytics.analyze(total["ticker"], total["name"], total["development"], deposits)]
 
     def deposit(self, ticker, date, amount):
         if ticker not in self.portfolio:
@@ -66,6 +161,29 @@ class Portfolio:
 
         return self.portfolio[ticker].deposit(amount, self._string_to_date(date))
 
+    def deposit_many(self, deposits):
+        deposits_by_ticker = {}
+        for i, deposit in enumerate(deposits):
+            ticker = deposit["ticker"]
+            if ticker not in self.portfolio:
+                raise InvalidUsage("%s is not registered in the portfolio (entry %d)" % (ticker, i))
+
+            try:
+                date = self._string_to_date(deposit["date"])
+            except ValueError:
+                raise InvalidUsage("'%s' is not a valid date (entry %d)" % (deposit["date"], i))
+
+            deposits_by_ticker.setdefault(ticker, []).append((deposit["amount"], date))
+
+        # validate every fond before touching any of them, so a bad batch leaves the portfolio unchanged
+        merged = [(self.portfolio[ticker], self.portfolio[ticker].merge_deposits(fond_deposits))
+                  for ticker, fond_deposits in deposits_by_ticker.items()]
+        for fond, (fond_deposits, earliest) in merged:
+            fond.deposits = fond_deposits
+            fond.mark_changed(earliest)
+
+        return len(deposits)
+
     def delete_deposit(self, ticker, date):
         if ticker not in self.portfolio:
             raise InvalidUsage("%s is not registered in the portfolio" % ticker)
@@ -77,4 +195,11 @@ class Portfolio:
             raise InvalidUsage("Portfolio already contains", ticker)
 
         self.portfolio[ticker] = Fond(**{"ticker": ticker, "name": name})
+        self._changed_everything = True
+
+def _tagged(i, rows):
+    for row in rows:
+        yield row["date"], i, row
 
+def _in_range(date, start, end):
+    return (start is None or date >= start) and (end is None or date <= end)
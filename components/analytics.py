@@ -0,0 +1,121 @@
+#!/usr/bin/python
+
+import math
+
+# the development series has one row per calendar day
+_days_per_year = 365.0
+
+def daily_returns(development):
+    """Returns of each day with that day's deposit taken out"""
+    returns = []
+    for previous, row in zip(development, development[1:]):
+        if previous["value"] > 0:
+            returns.append((row["value"] - row["deposit"]) / float(previous["value"]) - 1)
+    return returns
+
+def time_weighted_return(returns):
+    growth = 1.0
+    for r in returns:
+        growth *= 1 + r
+    return growth - 1
+
+def max_drawdown(returns):
+    growth, peak, drawdown = 1.0, 1.0, 0.0
+    for r in returns:
+        growth *= 1 + r
+        peak = max(peak, growth)
+        drawdown = min(drawdown, growth / peak - 1)
+    return drawdown
+
+def volatility(returns):
+    if len(returns) < 2:
+        return None
+    mean = sum(returns) / len(returns)
+    variance = sum((r - mean) ** 2 for r in returns) / (len(returns) - 1)
+    return math.sqrt(variance * _days_per_year)
+
+def _npv(rate, cashflows):
+    try:
+        return sum(amount * (1 + rate) ** -years for years, amount in cashflows)
+    except OverflowError:
+        # close to -100% the latest cashflow outgrows every other one
+        return math.copysign(float("inf"), max(cashflows)[1])
+
+def _npv_derivative(rate, cashflows):
+    try:
+        return sum(-years * amount * (1 + rate) ** (-years - 1) for years, amount in cashflows)
+    except OverflowError:
+        return math.copysign(float("inf"), -max(cashflows)[1])
+
+def xirr(deposits, value, end_date, tolerance=1e-9, max_iterations=50):
+    """Annual money-weighted return of the deposits given their value at end_date.
+
+    Newton's method from a 10% guess, falling back to bisection when it leaves
+    the domain or does not converge. Returns None when there is no solution.
+    """
+    deposits = [deposit for deposit in deposits if deposit["date"] <= end_date and deposit["amount"]]
+    if not deposits or value <= 0:
+        return None
+
+    start = min(deposit["date"] for deposit in deposits)
+    cashflows = [((deposit["date"] - start).days / _days_per_year, -float(deposit["amount"])) for deposit in deposits]
+    cashflows.append(((end_date - start).days / _days_per_year, float(value)))
+    if all(years == 0 for years, amount in cashflows):
+        return None
+
+    rate = 0.1
+    for i in range(max_iterations):
+        npv = _npv(rate, cashflows)
+        if abs(npv) < tolerance:
+            return rate
+        derivative = _npv_derivative(rate, cashflows)
+        if derivative == 0 or math.isinf(npv) or math.isinf(derivative):
+            break
+        rate -= npv / derivative
+        if rate <= -1:
+            break
+
+    return _bisect(cashflows, tolerance)
+
+def _bisect(cashflows, tolerance):
+    # npv falls as the rate rises, deposits come before the final value
+    low, high = -0.999999, 1.0
+    while _npv(high, cashflows) > 0:
+        high *= 10
+        if high > 1e9:
+            return None
+    if _npv(low, cashflows) < 0:
+        return None
+
+    # close to -100% the npv is steep, so stop on the npv and not the width
+    for i in range(200):
+        middle = (low + high) / 2
+        npv = _npv(middle, cashflows)
+        if abs(npv) < tolerance:
+            break
+        if npv > 0:
+            low = middle
+        else:
+            high = middle
+    if math.isinf(npv):
+        return None
+    return middle
+
+def analyze(ticker, name, development, deposits):
+    """Return figures of one development series, deposits are the cashflows behind it"""
+    if development:
+        # deposits outside the series are not part of its value
+        deposits = [deposit for deposit in deposits if deposit["date"] >= development[0]["date"]]
+
+    returns = daily_returns(development)
+    value = development[-1]["value"] if development else 0
+    return {
+        "ticker": ticker,
+        "name": name,
+        "value": value,
+        "total_deposited": sum(row["deposit"] for row in development),
+        "twr": time_weighted_return(returns) if returns else None,
+        "xirr": xirr(deposits, value, development[-1]["date"]) if development else None,
+        "max_drawdown": max_drawdown(returns),
+        "volatility": volatility(returns),
+    }
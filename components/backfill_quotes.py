@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import argparse
+from multiprocessing import Pool
+
+from Investment import Investment
+from error import InvalidUsage
+
+def quote_files(paths):
+    """(ticker, path) for every csv given or inside a given directory, the file name is the ticker"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".csv")]
+        else:
+            files.append(path)
+    return [(os.path.basename(path)[:-len(".csv")] if path.endswith(".csv") else os.path.basename(path), path)
+            for path in files]
+
+def backfill(entry):
+    ticker, path = entry
+    try:
+        with open(path) as f:
+            data = f.read()
+        # quotes are as old as the file, they are refreshed once the market has published newer ones
+        return ticker, Investment(ticker).import_quotes(data, int(os.path.getmtime(path))), None
+    except (InvalidUsage, IOError, OSError) as e:
+        return ticker, None, getattr(e, "message", None) or str(e)
+
+def run(files, processes=None, progress=sys.stderr):
+    """Parses and caches every (ticker, path) in parallel, returns (loaded, failed)"""
+    pool = Pool(processes)
+    loaded = failed = 0
+    try:
+        for i, (ticker, count, error) in enumerate(pool.imap_unordered(backfill, files)):
+            if error is not None:
+                progress.write("[%d/%d] %s failed: %s\n" % (i + 1, len(files), ticker, error))
+                failed += 1
+            else:
+                progress.write("[%d/%d] %s: %d quotes\n" % (i + 1, len(files), ticker, count))
+                loaded += 1
+    finally:
+        pool.close()
+        pool.join()
+
+    return loaded, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fills the quote cache from csv files in the format of the quotes source")
+    parser.add_argument("paths", nargs="+", help="<ticker>.csv files or directories containing them")
+    parser.add_argument("--processes", type=int, help="worker processes, defaults to the number of cores")
+    args = parser.parse_args(argv)
+
+    loaded, failed = run(quote_files(args.paths), args.processes)
+    sys.stderr.write("%d tickers loaded, %d failed\n" % (loaded, failed))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
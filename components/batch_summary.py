@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+import sys
+import json
+import argparse
+import threading
+from multiprocessing import Pool, cpu_count
+
+from repository import Repository
+from Portfolio import Portfolio
+from holdings import Holdings
+from warmup import warm_up
+from error import InvalidUsage
+
+def summarize(entry):
+    user_id, documents = entry
+    try:
+        portfolio = Portfolio(user_id, Holdings(documents=documents))
+        version, summary = portfolio.version(), portfolio.get_summary()
+    except (InvalidUsage, IOError) as e:
+        return user_id, None, None, getattr(e, "message", None) or str(e)
+    except Exception as e:
+        # one broken portfolio must not cost the summaries of all the others
+        return user_id, None, None, "%s: %s" % (type(e).__name__, e)
+    return user_id, version, json.dumps(summary, default=Portfolio.json_serializer), None
+
+def file_sink(output):
+    def write(user_id, version, summary):
+        output.write('{"user_id": %s, "version": "%s", "summary": %s}\n' % (json.dumps(user_id), version, summary))
+    return write
+
+def _bounded(entries, slots, stopped):
+    # the pool reads its input as fast as it can, only keep a window of portfolios in flight
+    for entry in entries:
+        slots.acquire()
+        if stopped.is_set():
+            return
+        yield entry
+
+def run(repo, sink, processes=None, chunksize=8):
+    """Hands the summary of every portfolio to sink(user_id, version, summary), returns (written, failed)"""
+    # loaded before the pool forks, so every worker shares the parsed quotes
+    warm_up(repo.hot_tickers(None))
+
+    pool = Pool(processes)
+    slots = threading.Semaphore((processes or cpu_count()) * chunksize * 4)
+    stopped = threading.Event()
+    written = failed = 0
+    try:
+        for user_id, version, summary, error in pool.imap_unordered(
+                summarize, _bounded(repo.iter_portfolios(), slots, stopped), chunksize):
+            slots.release()
+            if error is not None:
+                sys.stderr.write("summary of user %s failed: %s\n" % (user_id, error))
+                failed += 1
+                continue
+
+            sink(user_id, version, summary)
+            written += 1
+    except:
+        # the pool's task handler may wait for a slot, wake it up and let it stop reading portfolios
+        stopped.set()
+        slots.release()
+        pool.terminate()
+        pool.join()
+        raise
+
+    pool.close()
+    pool.join()
+
+    return written, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Computes the summary of every portfolio")
+    destination = parser.add_mutually_exclusive_group()
+    destination.add_argument("--output", default="-", help="json lines file, - for stdout")
+    destination.add_argument("--table", action="store_true", help="store the summaries served by /summary")
+    parser.add_argument("--processes", type=int, help="worker processes, defaults to the number of cores")
+    parser.add_argument("--chunksize", type=int, default=8, help="portfolios handed to a worker at a time")
+    args = parser.parse_args(argv)
+
+    repo = Repository()
+    output = sys.stdout if args.table or args.output == "-" else open(args.output, "w")
+    sink = repo.put_materialized_summary if args.table else file_sink(output)
+    try:
+        written, failed = run(repo, sink, args.processes, args.chunksize)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        repo.close()
+
+    sys.stderr.write("%d summaries written, %d failed\n" % (written, failed))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import csv
+import time
+from bisect import bisect_left
+
+import dates
+from error import InvalidUsage
+
+class TickerCatalogue:
+    """Known tickers with a prefix index over tickers and the words of their names"""
+
+    def __init__(self, tickers=(), loaded_at=None):
+        self.tickers = {}
+        self.loaded_at = loaded_at if loaded_at is not None else time.time()
+        keys = []
+        for ticker, name, last_quote_date in tickers:
+            self.tickers[ticker] = {"ticker": ticker, "name": name, "last_quote_date": last_quote_date}
+            for key in set([ticker.lower()] + (name or "").lower().split()):
+                keys.append((key, ticker))
+        # sorted (key, ticker) pairs, every match of a prefix sits in one run
+        self.keys = sorted(keys)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self.tickers
+
+    def get(self, ticker):
+        return self.tickers.get(ticker)
+
+    def search(self, query, limit=20):
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        found = []
+        i = bisect_left(self.keys, (query,))
+        while i < len(self.keys) and len(found) < limit:
+            key, ticker = self.keys[i]
+            if not key.startswith(query):
+                break
+            if ticker not in found:
+                found.append(ticker)
+            i += 1
+        return [self.tickers[ticker] for ticker in found]
+
+def read_catalogue_csv(stream):
+    """Reads (ticker, name, last_quote_date) rows, last_quote_date is optional"""
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or not set(["ticker", "name"]).issubset(map(str.strip, reader.fieldnames)):
+        raise InvalidUsage("csv must have a header containing ticker and name")
+
+    tickers = []
+    for row in reader:
+        row = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        try:
+            if not row["ticker"]:
+                raise ValueError("empty ticker")
+            last_quote_date = row.get("last_quote_date")
+            tickers.append((row["ticker"], row["name"], dates.parse(last_quote_date) if last_quote_date else None))
+        except ValueError:
+            raise InvalidUsage("invalid ticker on line %d" % reader.line_num)
+
+    return tickers
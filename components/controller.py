@@ -5,18 +5,27 @@ import json
 import requests
 import uuid
 import urlparse
-from flask import Flask, url_for, request, Response, redirect, session, jsonify
+import time
+import csv
+import StringIO
+from flask import Flask, url_for, request, Response, redirect, session, jsonify, g
 from flask_cors import CORS
 from flask_oauthlib.client import OAuth
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from cachetools import TTLCache
 
 from repository import Repository
+from Portfolio import Portfolio
 import settings
-from validation import validate_deposit, validate_addfond
+from validation import validate_deposit, validate_addfond, validate_deposit_import, read_deposit_csv, read_date_range, read_since
 from error import InvalidUsage
+from deadline import Deadline
+import wire_format
+import metrics
+from profiling import RequestProfiler
 
 repo = None
+shared_metrics = None
 app = Flask(__name__)
 app.secret_key = settings.secret_key
 CORS(app)
@@ -35,19 +44,69 @@ google = oauth.remote_app('google',
                           authorize_url='https://accounts.google.com/o/oauth2/auth')
 
 login_state = TTLCache(maxsize=128, ttl=1*60) # 1 minute ttl
+profiler = RequestProfiler(settings.profiling, settings.profiling_keys, settings.profile_directory)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.time()
 
 @app.before_request
 def check_if_valid_session_key():
     if request.method == "OPTIONS":
         return None
 
-    if request.endpoint in ["login", "authorized", "login_verify"]:
+    if request.endpoint in ["login", "authorized", "login_verify", "prometheus_metrics", "profile_report"]:
         return None
 
     session_key = request.headers.get("api-key")
-    if not session_key or not repo.valid_session_key(session_key):
+    with metrics.timer("session_lookup_seconds", "Time spent validating session keys"):
+        valid = session_key and repo.valid_session_key(session_key)
+    if not valid:
         raise InvalidUsage("invalid session key", status_code=401)
 
+@app.before_request
+def start_profiler():
+    if profiler.allowed(request):
+        g.profile = profiler.start()
+
+@app.after_request
+def finish_profiler(response):
+    profile = g.pop("profile", None)
+    if profile:
+        response.headers["X-Profile-Id"] = profiler.finish(profile, "%s %s" % (request.method, request.full_path))
+    return response
+
+@app.teardown_request
+def stop_profiler(exception):
+    profile = g.pop("profile", None)
+    if profile:
+        profile.disable()
+
+@app.route("/profile/<profile_id>")
+def profile_report(profile_id):
+    if not profiler.allowed(request):
+        raise InvalidUsage("profiling is not enabled for this key", status_code=403)
+
+    report = profiler.report(profile_id)
+    if report is None:
+        raise InvalidUsage("profile not found", status_code=404)
+    return Response(report, status=200, mimetype="text/plain")
+
+@app.after_request
+def observe_request(response):
+    if "request_start" in g:
+        labels = {"endpoint": request.endpoint or "unknown", "method": request.method}
+        metrics.registry.histogram("http_request_seconds", "Time spent handling requests").observe(
+            time.time() - g.request_start, **labels)
+        metrics.inc("http_requests_total", "Handled requests", status=response.status_code, **labels)
+    return response
+
+@app.route("/metrics")
+def prometheus_metrics():
+    # every worker has a registry of its own, sum them when they share a directory
+    report = shared_metrics.render() if shared_metrics else metrics.registry.render()
+    return Response(report, status=200, content_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.route('/logout')
 def logout():
     session_token = request.headers.get("api-key")
@@ -102,20 +161,97 @@ def userinfo():
     js = repo.get_user_info(session_token)
     return Response(json.dumps(js), status=200, mimetype="application/json")
 
+def stale_headers(portfolio, deadline=None):
+    stale = portfolio.stale_tickers(deadline)
+    if not stale:
+        return {}
+    return {"Warning": '110 - "Response is Stale"', "X-Stale-Quotes": ",".join(stale)}
+
 @app.route("/summary")
 def api_summary():
     session_token = request.headers.get("api-key")
+    start, end = read_date_range(request.args)
+    since = read_since(request.args)
+    if since and (start or end):
+        raise InvalidUsage("since can not be combined with start or end")
+    mimetype = request.accept_mimetypes.best_match(wire_format.available(), default=wire_format.JSON)
 
-    date_handler = lambda obj: (
-        obj.isoformat()
-        if isinstance(obj, datetime)
-        or isinstance(obj, date)
-        else None
-    )
+    portfolio = repo.get_portfolio(session_token)
+    headers = {"Vary": "Accept"}
+    if since:
+        start = delta_start(portfolio, *since)
+        if start:
+            headers["X-Summary-From"] = start.isoformat()
+    # fonds the quotes source does not answer for in time are left out instead of stalling the response
+    deadline = Deadline(settings.summary_deadline) if settings.summary_deadline else None
+    # the nightly batch stores summaries, serve those while nothing has changed
+    js = None
+    if not start and not end:
+        js = repo.get_materialized_summary(portfolio.user_id, portfolio.version(deadline))
+    metrics.inc("summary_requests_total", "Summaries served, by source", source="live" if js is None else "materialized")
+    # a date range leaves the client without some rows, a token would claim it has them
+    complete = since is not None or not (start or end)
+    if js is None:
+        summary = portfolio.get_summary(start, end, deadline)
+        complete = complete and not any(entry.get("incomplete") for entry in summary)
+        with metrics.timer("serialize_seconds", "Time spent encoding responses", endpoint="api_summary"):
+            js = wire_format.encode(summary, mimetype, default=Portfolio.json_serializer)
+    elif mimetype != wire_format.JSON:
+        js = wire_format.encode(json.loads(js), mimetype)
+
+    # clients holding every row can ask for the rows changed since with this token
+    last_date = portfolio.last_date(deadline) if complete and portfolio.revision is not None else None
+    if last_date:
+        headers["X-Summary-Token"] = "%d:%s" % (portfolio.revision, last_date.isoformat())
+    headers.update(stale_headers(portfolio, deadline))
+    return Response(js, status=200, mimetype=mimetype, headers=headers)
+
+def delta_start(portfolio, revision, last_date):
+    """The first date a client holding rows until last_date is missing, None when it needs every row"""
+    changed = date.max
+    if revision is not None:
+        changed = repo.changed_since(portfolio.user_id, revision, portfolio.revision) if portfolio.revision is not None else None
+    if changed is None:
+        return None
+    return min(changed, last_date + timedelta(days=1))
+
+@app.route("/export.csv")
+def export_csv():
+    session_token = request.headers.get("api-key")
+    start, end = read_date_range(request.args)
 
     portfolio = repo.get_portfolio(session_token)
-    js = json.dumps(portfolio.get_summary(), default=date_handler)
-    return Response(js, status=200, mimetype="application/json")
+    # load the quotes up front, errors can not be reported once streaming has started
+    for fond in portfolio.portfolio.values():
+        fond.unit_index
+    headers = stale_headers(portfolio)
+    headers["Content-Disposition"] = "attachment; filename=export.csv"
+    return Response(export_rows(portfolio.iter_development_rows(start, end)), status=200, mimetype="text/csv", headers=headers)
+
+def export_rows(rows, chunk_size=64 * 1024):
+    buffer = StringIO.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["date", "ticker", "value", "deposit"])
+    for ticker, row in rows:
+        writer.writerow([row["date"].isoformat(), ticker, row["value"], row["deposit"]])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@app.route("/analytics")
+def api_analytics():
+    session_token = request.headers.get("api-key")
+
+    portfolio = repo.get_portfolio(session_token)
+    analytics = portfolio.get_analytics()
+    return Response(json.dumps(analytics), status=200, mimetype="application/json", headers=stale_headers(portfolio))
+
+@app.route("/tickers")
+def search_tickers():
+    matches = repo.ticker_catalogue().search(request.args.get("q", ""))
+    return Response(json.dumps(matches, default=Portfolio.json_serializer), status=200, mimetype="application/json")
 
 @app.route("/addfond", methods=["POST"])
 def add_fond():
@@ -125,6 +261,11 @@ def add_fond():
     session_token = request.headers.get("api-key")
     fond_data = request.get_json()
 
+    catalogue = repo.ticker_catalogue()
+    # without a loaded catalogue any ticker is accepted, as before
+    if len(catalogue) and fond_data["ticker"] not in catalogue:
+        raise InvalidUsage("%s is not a known ticker" % fond_data["ticker"])
+
     portfolio = repo.get_portfolio(session_token)
     portfolio.add_fond(fond_data["ticker"], fond_data["name"])
 
@@ -162,15 +303,50 @@ def deposit():
     repo.put_portfolio(portfolio)
     return Response(status=204)
 
+@app.route("/deposit/import", methods=["POST"])
+def import_deposits():
+    if request.mimetype == "text/csv":
+        deposits = read_deposit_csv(request.stream)
+    elif "file" in request.files:
+        deposits = read_deposit_csv(request.files["file"].stream)
+    elif validate_deposit_import(request):
+        deposits = request.get_json()["deposits"]
+    else:
+        raise InvalidUsage("invalid input")
+
+    session_token = request.headers.get("api-key")
+    portfolio = repo.get_portfolio(session_token)
+    portfolio.deposit_many(deposits)
+
+    repo.put_portfolio(portfolio)
+    return Response(status=204)
+
 @app.errorhandler(InvalidUsage)
 def handle_invalid_usage(error):
     response = jsonify(error.to_dict())
     response.status_code = error.status_code
     return response
 
-def main():
-    global repo
+def create_app():
+    global repo, shared_metrics
     repo = Repository()
+    repo.start_session_sweeper()
+    if settings.metrics_directory:
+        shared_metrics = metrics.SharedRegistry(settings.metrics_directory)
+        shared_metrics.start(settings.metrics_write_interval)
+    return app
+
+def shutdown():
+    global repo, shared_metrics
+    if repo:
+        repo.close()
+        repo = None
+    if shared_metrics:
+        shared_metrics.stop()
+        shared_metrics = None
+
+def main():
+    create_app()
     app.run(debug=settings.debug, host="0.0.0.0")
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import datetime
+
+from error import InvalidDate
+
+ISO = "%Y-%m-%d"
+COMPACT = "%Y%m%d"
+
+# parsed dates by format, quotes and deposits keep coming back to the same few thousand days
+_parsed = {ISO: {}, COMPACT: {}}
+_max_parsed = 100000
+
+def _parse_fixed_width(text, format):
+    if format == COMPACT and len(text) == 8 and text.isdigit():
+        return datetime.date(int(text[:4]), int(text[4:6]), int(text[6:]))
+    if format == ISO and len(text) == 10 and text[4] == "-" and text[7] == "-" \
+            and text[:4].isdigit() and text[5:7].isdigit() and text[8:].isdigit():
+        return datetime.date(int(text[:4]), int(text[5:7]), int(text[8:]))
+    # anything else, like dates without zero padding, is left to strptime
+    return datetime.datetime.strptime(text, format).date()
+
+def parse(text, format=ISO):
+    """Parses text as a date in format, raises ValueError like strptime"""
+    parsed = _parsed.get(format)
+    if parsed is None:
+        return datetime.datetime.strptime(text, format).date()
+
+    date = parsed.get(text)
+    if date is None:
+        date = _parse_fixed_width(text, format)
+        if len(parsed) >= _max_parsed:
+            parsed.clear()
+        parsed[text] = date
+    return date
+
+def to_date(value, format=ISO):
+    if isinstance(value, str) or isinstance(value, unicode):
+        return parse(value, format)
+    elif isinstance(value, datetime.date):
+        return value
+
+    raise InvalidDate("Unknown type '%s' for date" % type(value).__name__)
+
+def ordinal(date):
+    """Days since 0001-01-01, used as a cheap key and to step through consecutive days"""
+    return date.toordinal()
+
+def from_ordinal(days):
+    return datetime.date.fromordinal(days)
@@ -3,19 +3,37 @@
 import sys
 import json
 import uuid
-import MySQLdb
-from datetime import datetime
+from datetime import datetime, timedelta
+
+try:
+    import MySQLdb
+    import MySQLdb.cursors
+except ImportError: # only needed by the MySQL backend
+    MySQLdb = None
+
+from storage import Storage
+import metrics
+
+db_timed = metrics.timed("db_query_seconds", "Time spent in database queries")
+
+class Database(Storage):
+    def __init__(self, dbname, host, port, user, password, session_lifetime=None):
+        if MySQLdb is None:
+            raise ImportError("MySQLdb is required by the mysql storage backend")
 
-class Database:
-    def __init__(self, dbname, host, port, user, password):
         self.connection = MySQLdb.connect(db=dbname, host=host, user=user, passwd=password)
         self.cur = self.connection.cursor()
 
         self.table = "user"
         self.session_table = "session"
+        self.summary_table = "summary"
+        self.ticker_table = "ticker"
+        self.change_table = "portfolio_change"
+        self.session_lifetime = session_lifetime
 
         self._initialize_database()
 
+    @db_timed
     def _execute_query(self, query, data=None):
         self.cur.execute(query, data)
         self.connection.commit()
@@ -23,8 +41,37 @@ class Database:
     def _initialize_database(self):
         self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (id INT NOT NULL AUTO_INCREMENT PRIMARY KEY, user_data JSON, portfolio JSON)""".format(self.table))
         self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (uuid VARCHAR(36) UNIQUE NOT NULL PRIMARY KEY, user_id INT, created TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""".format(self.session_table))
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (user_id INT NOT NULL PRIMARY KEY, version VARCHAR(40) NOT NULL, summary LONGTEXT, created TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""".format(self.summary_table))
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (ticker VARCHAR(32) NOT NULL PRIMARY KEY, name VARCHAR(255), last_quote_date DATE)""".format(self.ticker_table))
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (user_id INT NOT NULL, version INT NOT NULL, changed_from DATE NOT NULL, PRIMARY KEY (user_id, version))""".format(self.change_table))
+        self.connection.commit()
+
+        self._migrate_database()
+
+    def _has_column(self, table, column):
+        sql = """SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s"""
+        self.cur.execute(sql, (table, column))
+        return self.cur.fetchone()[0] > 0
+
+    def _has_index(self, table, index):
+        sql = """SELECT COUNT(*) FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s"""
+        self.cur.execute(sql, (table, index))
+        return self.cur.fetchone()[0] > 0
+
+    def _migrate_database(self):
+        if not self._has_column(self.table, "google_id"):
+            self.cur.execute("""ALTER TABLE {} ADD COLUMN google_id VARCHAR(64) GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(user_data, '$.id'))) STORED""".format(self.table))
+        if not self._has_column(self.table, "portfolio_version"):
+            self.cur.execute("""ALTER TABLE {} ADD COLUMN portfolio_version INT NOT NULL DEFAULT 0""".format(self.table))
+        if not self._has_index(self.table, "idx_google_id"):
+            self.cur.execute("""CREATE INDEX idx_google_id ON {} (google_id)""".format(self.table))
+        if not self._has_index(self.session_table, "idx_user_id"):
+            self.cur.execute("""CREATE INDEX idx_user_id ON {} (user_id)""".format(self.session_table))
+        if not self._has_index(self.session_table, "idx_created"):
+            self.cur.execute("""CREATE INDEX idx_created ON {} (created)""".format(self.session_table))
         self.connection.commit()
 
+    @db_timed
     def get_portfolio(self, session_token):
         session = self.get_session(session_token)
         if not session:
@@ -45,15 +92,58 @@ class Database:
         data = (document, user_id)
         self._execute_query(sql, data)
 
-    def save_portfolio(self, portfolio, user_id):
-        self._update_document("portfolio", user_id, portfolio)
+    @db_timed
+    def save_portfolio(self, portfolio, user_id, changed_from=None):
+        # the row stays locked until the commit, the version read back is the one written here
+        sql = """UPDATE {} SET portfolio=%s, portfolio_version=portfolio_version + 1 WHERE ID=%s""".format(self.table)
+        self.cur.execute(sql, (portfolio, user_id))
+        self.cur.execute("""SELECT portfolio_version FROM {} WHERE id = %s""".format(self.table), (user_id,))
+        result = self.cur.fetchone()
+        if result and changed_from is not None:
+            sql = """INSERT INTO {} (user_id, version, changed_from) VALUES (%s, %s, %s)""".format(self.change_table)
+            self.cur.execute(sql, (user_id, result[0], changed_from))
+        self.connection.commit()
+        return result[0] if result else None
+
+    @db_timed
+    def get_portfolio_changes(self, user_id, since_version):
+        sql = """SELECT version, changed_from FROM {} WHERE user_id = %s AND version > %s ORDER BY version""".format(self.change_table)
+        self.cur.execute(sql, (user_id, since_version))
+        self.connection.commit()
+        return list(self.cur.fetchall())
+
+    @db_timed
+    def get_portfolio_version(self, session_token):
+        if not self._is_valid_uuid4(session_token):
+            return None
+
+        sql = """SELECT u.id, u.portfolio_version FROM {} s JOIN {} u ON u.id = s.user_id
+                 WHERE s.uuid = %s AND s.created > %s""".format(self.session_table, self.table)
+        data = (session_token, self._session_expiry_cutoff())
+
+        self.cur.execute(sql, data)
+        self.connection.commit()
+        return self.cur.fetchone()
+
+    @db_timed
+    def get_versioned_portfolio(self, user_id):
+        sql = """SELECT portfolio_version, portfolio FROM {} WHERE id = %s""".format(self.table)
+        self.cur.execute(sql, (user_id,))
+        self.connection.commit()
+
+        result = self.cur.fetchone()
+        if not result:
+            return None
+        version, portfolio = result
+        return version, json.loads(portfolio, "ISO-8859-1")
 
     def save_user(self, user_info, user_id):
         self._update_document("user_data", user_id, user_info)
 
+    @db_timed
     def get_user_info_by_google_id(self, google_id):
-        sql = """SELECT id, user_data FROM %s WHERE user_data->"$.id" = %%s""" % self.table
-        data = (google_id,)
+        sql = """SELECT id, user_data FROM {} WHERE google_id = %s""".format(self.table)
+        data = (str(google_id),)
 
         self.cur.execute(sql, data)
         self.connection.commit()
@@ -65,6 +155,7 @@ class Database:
         id, user_data = result
         return id, json.loads(user_data, "ISO-8859-1")
 
+    @db_timed
     def _get_document_by_user_id(self, user_id, document_name):
         sql = """SELECT id, {} FROM {} WHERE id = %s""".format(document_name, self.table)
         data = (user_id,)
@@ -77,12 +168,26 @@ class Database:
         id, document = result
         return id, json.loads(document, "ISO-8859-1")
 
+    def _streaming_cursor(self):
+        # rows are fetched from the server while iterating instead of all at once
+        return self.connection.cursor(MySQLdb.cursors.SSCursor)
+
+    def iter_portfolios(self):
+        cursor = self._streaming_cursor()
+        try:
+            cursor.execute("""SELECT id, portfolio FROM {}""".format(self.table))
+            for id, portfolio in cursor:
+                yield id, json.loads(portfolio, "ISO-8859-1")
+        finally:
+            cursor.close()
+
     def get_user_info_by_user_id(self, user_id):
         return self._get_document_by_user_id(user_id, "user_data")
 
     def get_portfolio_by_user_id(self, user_id):
         return self._get_document_by_user_id(user_id, "portfolio")
 
+    @db_timed
     def get_user_info(self, session_token):
         session = self.get_session(session_token)
         if not session:
@@ -101,6 +206,7 @@ class Database:
         user_info["user_id"] = user_id
         return user_info
 
+    @db_timed
     def create_user(self, user_info):
         sql = """INSERT INTO {} (user_data, portfolio) VALUES (%s, '[]')""".format(self.table)
         data = (json.dumps(user_info),)
@@ -113,6 +219,7 @@ class Database:
 
         return self.cur.fetchone()[0]
 
+    @db_timed
     def delete_sessions_for_user(self, user_id):
         sql = """DELETE FROM {} WHERE user_id = %s""".format(self.session_table)
         data = (user_id,)
@@ -120,6 +227,7 @@ class Database:
         self.cur.execute(sql, data)
         self.connection.commit()
 
+    @db_timed
     def new_session(self, user_id):
         self.delete_sessions_for_user(user_id)
 
@@ -139,17 +247,62 @@ class Database:
             return False
         return True
 
+    @db_timed
     def get_session(self, uuid_string):
         if not self._is_valid_uuid4(uuid_string):
             return None
 
-        sql = """SELECT * FROM {} WHERE uuid = %s""".format(self.session_table)
-        data = (uuid_string,)
+        sql = """SELECT * FROM {} WHERE uuid = %s AND created > %s""".format(self.session_table)
+        data = (uuid_string, self._session_expiry_cutoff())
 
         self.cur.execute(sql, data)
         self.connection.commit()
         return self.cur.fetchone()
 
+    def _session_expiry_cutoff(self):
+        if not self.session_lifetime:
+            return datetime.min
+        return datetime.now() - timedelta(seconds=self.session_lifetime)
+
+    @db_timed
+    def delete_expired_sessions(self, batch_size):
+        sql = """DELETE FROM {} WHERE created <= %s LIMIT %s""".format(self.session_table)
+        data = (self._session_expiry_cutoff(), batch_size)
+
+        self.cur.execute(sql, data)
+        self.connection.commit()
+        return self.cur.rowcount
+
+    @db_timed
+    def get_materialized_summary(self, user_id):
+        sql = """SELECT version, summary FROM {} WHERE user_id = %s""".format(self.summary_table)
+        data = (user_id,)
+
+        self.cur.execute(sql, data)
+        self.connection.commit()
+        return self.cur.fetchone()
+
+    @db_timed
+    def save_materialized_summary(self, user_id, version, summary):
+        sql = """INSERT INTO {} (user_id, version, summary) VALUES (%s, %s, %s)
+                 ON DUPLICATE KEY UPDATE version = VALUES(version), summary = VALUES(summary), created = CURRENT_TIMESTAMP""".format(self.summary_table)
+        data = (user_id, version, summary)
+        self._execute_query(sql, data)
+
+    @db_timed
+    def save_tickers(self, tickers):
+        sql = """INSERT INTO {} (ticker, name, last_quote_date) VALUES (%s, %s, %s)
+                 ON DUPLICATE KEY UPDATE name = VALUES(name), last_quote_date = VALUES(last_quote_date)""".format(self.ticker_table)
+        self.cur.executemany(sql, tickers)
+        self.connection.commit()
+        return len(tickers)
+
+    @db_timed
+    def get_tickers(self):
+        self.cur.execute("""SELECT ticker, name, last_quote_date FROM {} ORDER BY ticker""".format(self.ticker_table))
+        self.connection.commit()
+        return list(self.cur.fetchall())
+
     def close(self):
         self.cur.close()
         self.connection.close()
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+
+import time
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Deadline(object):
+    """A time budget shared by everything done to answer one request"""
+
+    def __init__(self, budget, clock=time.time):
+        self.clock = clock
+        self.expires = clock() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires - self.clock())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
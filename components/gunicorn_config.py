@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# gunicorn --config components/gunicorn_config.py controller:app
+
+import os
+import sys
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, chdir)
+
+import settings
+
+bind = "0.0.0.0:%d" % settings.port
+workers = settings.workers
+threads = settings.threads
+worker_class = "gthread" if settings.threads > 1 else "sync"
+graceful_timeout = settings.graceful_timeout
+# the app is imported once in the master and shared copy-on-write with the workers,
+# connections are opened per worker in post_fork
+preload_app = True
+accesslog = "-"
+
+def on_starting(server):
+    if settings.metrics_directory:
+        import metrics
+        metrics.clear_directory(settings.metrics_directory)
+
+def when_ready(server):
+    # runs in the master before any worker is forked, so workers start with warm quote caches
+    from repository import Repository
+    from warmup import warm_up, tickers_to_warm_up
+
+    repo = Repository()
+    try:
+        tickers = tickers_to_warm_up(repo, settings.warmup_tickers, settings.warmup_hot_tickers)
+    finally:
+        repo.close()
+
+    loaded = warm_up(tickers)
+    server.log.info("warmed up quotes for %d of %d tickers", len(loaded), len(tickers))
+
+    if settings.metrics_directory:
+        import metrics
+        # reported once from the master's own snapshot, not once per forked worker
+        metrics.SharedRegistry(settings.metrics_directory).write()
+
+def post_fork(server, worker):
+    import controller
+    import metrics
+    metrics.registry.clear()
+    controller.create_app()
+
+def worker_exit(server, worker):
+    import controller
+    controller.shutdown()
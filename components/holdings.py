@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+import collections
+
+from Fond import Fond
+
+class Holdings(collections.MutableMapping):
+    """The fonds of a portfolio by ticker. Stored fond documents are only parsed into
+    Fond objects on first access, untouched ones are written back as they were read."""
+
+    def __init__(self, documents=None, fonds=None):
+        self._documents = {}
+        self._fonds = {}
+        self._order = []
+
+        for document in documents or []:
+            self._documents[document["ticker"]] = document
+            self._order.append(document["ticker"])
+        for ticker, fond in (fonds or {}).items():
+            self[ticker] = fond
+
+    def __getitem__(self, ticker):
+        if ticker not in self._fonds:
+            if ticker not in self._documents:
+                raise KeyError(ticker)
+            self._fonds[ticker] = Fond(**self._documents.pop(ticker))
+        return self._fonds[ticker]
+
+    def __setitem__(self, ticker, fond):
+        if ticker not in self:
+            self._order.append(ticker)
+        self._documents.pop(ticker, None)
+        self._fonds[ticker] = fond
+
+    def __delitem__(self, ticker):
+        if ticker not in self:
+            raise KeyError(ticker)
+        self._documents.pop(ticker, None)
+        self._fonds.pop(ticker, None)
+        self._order.remove(ticker)
+
+    def __contains__(self, ticker):
+        return ticker in self._fonds or ticker in self._documents
+
+    def __iter__(self):
+        return iter(list(self._order))
+
+    def __len__(self):
+        return len(self._order)
+
+    def hydrated(self):
+        return [ticker for ticker in self._order if ticker in self._fonds]
+
+    def documents(self):
+        """Fond objects for the hydrated fonds and the stored documents for the rest"""
+        return [self._fonds[ticker] if ticker in self._fonds else self._documents[ticker] for ticker in self._order]
@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+
+from repository import Repository
+from catalogue import read_catalogue_csv
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Loads tickers into the ticker catalogue")
+    parser.add_argument("file", help="csv with ticker, name and optionally last_quote_date columns, - for stdin")
+    args = parser.parse_args(argv)
+
+    stream = sys.stdin if args.file == "-" else open(args.file)
+    try:
+        tickers = read_catalogue_csv(stream)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    repo = Repository()
+    try:
+        sys.stderr.write("%d tickers loaded\n" % repo.load_tickers(tickers))
+    finally:
+        repo.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
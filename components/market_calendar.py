@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import datetime
+
+import dates
+
+class MarketCalendar:
+    """Trading days of an exchange and the time of day their quotes are published"""
+
+    def __init__(self, holidays=(), publication_time=datetime.time(18, 0), weekend=(5, 6)):
+        self.holidays = set(holidays)
+        self.publication_time = publication_time
+        self.weekend = set(weekend)
+
+    def is_trading_day(self, day):
+        return day.weekday() not in self.weekend and day not in self.holidays
+
+    def publication(self, day):
+        return datetime.datetime.combine(day, self.publication_time)
+
+    def next_publication(self, moment):
+        """The first publication after moment, nothing new can be published before it"""
+        day = moment.date()
+        if moment >= self.publication(day):
+            day += datetime.timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += datetime.timedelta(days=1)
+        return self.publication(day)
+
+def read_holidays(stream):
+    """One ISO date per line, blank lines and text after # are ignored"""
+    holidays = []
+    for line in stream:
+        line = line.split("#", 1)[0].strip()
+        if line:
+            holidays.append(dates.parse(line))
+    return holidays
+
+def parse_time(text):
+    hour, minute = text.split(":")
+    return datetime.time(int(hour), int(minute))
+
+def load_calendar(holidays_file, publication_time):
+    holidays = []
+    if holidays_file:
+        with open(holidays_file) as f:
+            holidays = read_holidays(f)
+    return MarketCalendar(holidays, parse_time(publication_time))
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+import os
+import json
+import tempfile
+import time
+import uuid
+import threading
+from functools import wraps
+
+default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                             for key, value in labels)
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, labels, value) for labels, value in sorted(self.values.items())]
+
+    def dump(self):
+        with self.lock:
+            return [[labels, value] for labels, value in self.values.items()]
+
+    def merge(self, labels, value):
+        self.inc(value, **dict(labels))
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=default_buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            entry = self.values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][i] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for labels, entry in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, entry["buckets"]):
+                    samples.append((self.name + "_bucket", labels + (("le", _format_value(bound)),), count))
+                samples.append((self.name + "_bucket", labels + (("le", "+Inf"),), entry["count"]))
+                samples.append((self.name + "_sum", labels, entry["sum"]))
+                samples.append((self.name + "_count", labels, entry["count"]))
+        return samples
+
+    def dump(self):
+        with self.lock:
+            return [[labels, dict(entry, buckets=list(entry["buckets"]))] for labels, entry in self.values.items()]
+
+    def merge(self, labels, other):
+        with self.lock:
+            entry = self.values.setdefault(labels, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            entry["buckets"] = [a + b for a, b in zip(entry["buckets"], other["buckets"])]
+            entry["sum"] += other["sum"]
+            entry["count"] += other["count"]
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, help, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name, help=""):
+        return self._get_or_create(Counter, name, help)
+
+    def histogram(self, name, help="", buckets=default_buckets):
+        return self._get_or_create(Histogram, name, help, buckets=buckets)
+
+    def clear(self):
+        with self.lock:
+            self.metrics = {}
+
+    def dump(self):
+        with self.lock:
+            metrics = self.metrics.items()
+        return {name: {"type": metric.type, "help": metric.help, "buckets": getattr(metric, "buckets", None),
+                       "values": metric.dump()} for name, metric in metrics}
+
+    def load(self, dump):
+        """Adds the values of a dump to this registry"""
+        for name, metric in dump.items():
+            if metric["type"] == Histogram.type:
+                target = self.histogram(name, metric["help"], metric["buckets"])
+            else:
+                target = self.counter(name, metric["help"])
+            for labels, value in metric["values"]:
+                target.merge(tuple(tuple(label) for label in labels), value)
+
+    def render(self):
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append("# HELP %s %s" % (name, metric.help))
+            lines.append("# TYPE %s %s" % (name, metric.type))
+            for sample_name, labels, value in metric.samples():
+                lines.append("%s%s %s" % (sample_name, _format_labels(labels), _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+class SharedRegistry:
+    """Sums the registries of several processes, e.g. gunicorn workers. Every process
+    writes snapshots of its own registry into directory, at least every interval seconds."""
+
+    def __init__(self, directory, registry=registry):
+        self.directory = directory
+        self.registry = registry
+        # pids are reused, a new process must not overwrite the counts of a dead one
+        self.filename = os.path.join(directory, "%d-%s.json" % (os.getpid(), uuid.uuid4().hex))
+        self._stopped = threading.Event()
+
+    def write(self):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        # the writer thread and the requests rendering /metrics write at the same time
+        fd, tmp_filename = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(self.registry.dump()))
+        os.rename(tmp_filename, self.filename)
+
+    def collect(self):
+        merged = Registry()
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    merged.load(json.loads(f.read()))
+            except (IOError, ValueError):
+                # removed or being replaced, the next scrape picks it up
+                continue
+        return merged
+
+    def render(self):
+        self.write()
+        return self.collect().render()
+
+    def start(self, interval):
+        def run():
+            while not self._stopped.wait(interval):
+                self.write()
+        writer = threading.Thread(target=run, name="metrics-writer")
+        writer.daemon = True
+        writer.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.write()
+
+def clear_directory(directory):
+    """Removes the snapshots of a previous run"""
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for name in os.listdir(directory):
+        if name.endswith(".json") or name.endswith(".tmp"):
+            os.remove(os.path.join(directory, name))
+
+class timer:
+    """Observes the time spent in a with block in a histogram"""
+
+    def __init__(self, name, help="", **labels):
+        self.histogram = registry.histogram(name, help)
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.histogram.observe(time.time() - self.start, **self.labels)
+
+def timed(name, help="", label="operation"):
+    """Decorator observing the run time of a function, labelled with the function name"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(name, help, **{label: function.__name__}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def inc(name, help="", amount=1, **labels):
+    registry.counter(name, help).inc(amount, **labels)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import os
+import re
+import uuid
+import pstats
+import cProfile
+import StringIO
+
+class RequestProfiler:
+    header = "X-Profile"
+
+    def __init__(self, enabled, keys, directory, top=40):
+        self.enabled = enabled
+        self.keys = set(keys)
+        self.directory = directory
+        self.top = top
+
+    def allowed(self, request):
+        return self.enabled and request.headers.get(self.header) in self.keys
+
+    def start(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def _filename(self, profile_id, extension):
+        return os.path.join(self.directory, "%s.%s" % (profile_id, extension))
+
+    def finish(self, profile, description):
+        profile.disable()
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        profile_id = uuid.uuid4().hex
+        profile.dump_stats(self._filename(profile_id, "prof"))
+
+        report = StringIO.StringIO()
+        report.write("%s\n\n" % description)
+        stats = pstats.Stats(profile, stream=report)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stats.print_callers(self.top / 4)
+
+        with open(self._filename(profile_id, "txt"), "w") as f:
+            f.write(report.getvalue())
+        return profile_id
+
+    def report(self, profile_id):
+        if not re.match("^[0-9a-f]{32}$", profile_id):
+            return None
+
+        filename = self._filename(profile_id, "txt")
+        if not os.path.isfile(filename):
+            return None
+
+        with open(filename, "r") as f:
+            return f.read()
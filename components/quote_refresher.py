@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+import sys
+import time
+import threading
+import urlparse
+from Queue import Queue
+
+from settings import quotes_breaker_threshold, quotes_breaker_reset
+import metrics
+
+class CircuitBreaker(object):
+    """Stops calls to a failing source after failure_threshold consecutive failures.
+
+    Once reset_timeout seconds have passed a single trial call is let through,
+    a success closes the breaker again and a failure keeps it open.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            # let one trial through, the others wait for another timeout
+            self.opened_at = self.clock()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def circuit_breaker(url):
+    """The breaker shared by every url on the same host"""
+    source = urlparse.urlparse(url).netloc
+    with _breakers_lock:
+        if source not in _breakers:
+            _breakers[source] = CircuitBreaker(quotes_breaker_threshold, quotes_breaker_reset)
+        return _breakers[source]
+
+class QuoteRefresher(threading.Thread):
+    """Runs quote refreshes off the request path, one at a time and at most one queued per ticker"""
+
+    def __init__(self):
+        threading.Thread.__init__(self, name="quote-refresher")
+        self.daemon = True
+        self.queue = Queue()
+        self.pending = set()
+        self._lock = threading.Lock()
+
+    def schedule(self, ticker, refresh):
+        with self._lock:
+            if ticker in self.pending:
+                return False
+            self.pending.add(ticker)
+        self.queue.put((ticker, refresh))
+        return True
+
+    def run(self):
+        while True:
+            ticker, refresh = self.queue.get()
+            try:
+                refresh()
+            except Exception as e:
+                sys.stderr.write("refresh of %s failed: %s\n" % (ticker, e))
+            finally:
+                with self._lock:
+                    self.pending.discard(ticker)
+                metrics.inc("quote_refreshes_total", "Background quote refreshes")
+                self.queue.task_done()
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+def schedule(ticker, refresh):
+    global _refresher
+    with _refresher_lock:
+        # threads do not survive a fork, every worker starts its own
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = QuoteRefresher()
+            _refresher.start()
+    return _refresher.schedule(ticker, refresh)
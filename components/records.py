@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+class Record(object):
+    """Immutable record with __slots__ that can be read like the dict it replaces.
+
+    Fields listed in _optional are left out of keys() and to_json() while they are None."""
+    __slots__ = ()
+    _optional = ()
+
+    def __init__(self, *args, **kwargs):
+        values = dict(zip(self.__slots__, args), **kwargs)
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def keys(self):
+        return [name for name in self.__slots__
+                if name not in self._optional or getattr(self, name) is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def replace(self, **changes):
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return type(self)(**values)
+
+    def to_json(self):
+        return {name: getattr(self, name) for name in self.keys()}
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return self.to_json() == other
+        return type(other) is type(self) and self._values() == other._values()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __getstate__(self):
+        return self._values()
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join("%s=%r" % (name, getattr(self, name)) for name in self.__slots__))
+
+class Deposit(Record):
+    __slots__ = ("date", "amount")
+
+class DevelopmentRow(Record):
+    __slots__ = ("date", "value", "deposit", "quote")
+    _optional = ("quote",)
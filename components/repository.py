@@ -1,29 +1,106 @@
 #!/usr/bin/python
 
-from settings import db_credentials
+from settings import db_credentials, storage_backend, sqlite_path
+from settings import session_lifetime, session_sweep_interval, session_sweep_batch_size, session_sweep_lock
+from settings import catalogue_ttl, portfolio_cache_size
 from db import Database
-from Fond import Fond
+from sqlite_db import SQLiteDatabase
+from session_sweeper import SessionSweeper
 from Portfolio import Portfolio
+from holdings import Holdings
+from catalogue import TickerCatalogue
 import json
+import threading
+import time
+import datetime
+from collections import Counter
+from cachetools import LRUCache
 
 from error import InvalidUsage
 
 class Repository:
     def __init__(self):
-        self.db = Database(**db_credentials)
+        # connections can not be shared between threads, every thread gets its own
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._catalogue = None
+        # (version, documents) of recently used portfolios by user_id
+        self._portfolios = LRUCache(maxsize=portfolio_cache_size)
+        self.db
+
+    @property
+    def db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._create_database()
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+    def _create_database(self):
+        if storage_backend == "sqlite":
+            return SQLiteDatabase(sqlite_path, session_lifetime=session_lifetime)
+        return Database(session_lifetime=session_lifetime, **db_credentials)
+
+    def start_session_sweeper(self):
+        if session_sweep_interval <= 0:
+            return None
+
+        sweeper = SessionSweeper(self._create_database, session_sweep_interval, session_sweep_batch_size,
+                                 session_sweep_lock)
+        sweeper.start()
+        return sweeper
+
+    def _cache_portfolio(self, user_id, version, data):
+        with self._lock:
+            self._portfolios[user_id] = (version, data)
 
     def get_portfolio(self, session_token):
-        result = self.db.get_portfolio(session_token)
+        # the version is checked on every request, other workers may have changed the portfolio
+        result = self.db.get_portfolio_version(session_token)
         if not result:
             return None
 
-        user_id, data = result
+        user_id, version = result
+        with self._lock:
+            cached = self._portfolios.get(user_id)
+        if cached is None or cached[0] != version:
+            cached = self.db.get_versioned_portfolio(user_id)
+            if not cached:
+                return None
+            self._cache_portfolio(user_id, *cached)
 
-        fonds = {fond_data["ticker"]: Fond(**fond_data) for fond_data in data}
-        return Portfolio(user_id, fonds)
+        # documents are never modified, Holdings parses them into new Fond objects
+        return Portfolio(user_id, Holdings(documents=cached[1]), revision=cached[0])
 
     def put_portfolio(self, portfolio):
-        self.db.save_portfolio(portfolio.to_json(), portfolio.user_id)
+        data = portfolio.to_json()
+        # without a date no change is logged, and deltas since earlier versions send every row
+        version = self.db.save_portfolio(data, portfolio.user_id, portfolio.changed_from())
+        self._cache_portfolio(portfolio.user_id, version, json.loads(data, "ISO-8859-1"))
+        portfolio.revision = version
+
+    def changed_since(self, user_id, since, revision):
+        """The earliest date changed between the versions since and revision, date.max when nothing
+        changed and None when that is not known"""
+        if since > revision:
+            return None
+        changes = self.db.get_portfolio_changes(user_id, since)
+        # an update that did not log its changes may have changed anything
+        if len(changes) != revision - since:
+            return None
+        return min([changed_from for version, changed_from in changes] + [datetime.date.max])
+
+    def get_materialized_summary(self, user_id, version):
+        """The stored summary of user_id, if it was computed for this version of the portfolio"""
+        result = self.db.get_materialized_summary(user_id)
+        if not result or result[0] != version:
+            return None
+        return result[1]
+
+    def put_materialized_summary(self, user_id, version, summary):
+        self.db.save_materialized_summary(user_id, version, summary)
 
     def get_user_info(self, session_token):
         return self.db.get_user_info(session_token)
@@ -54,5 +131,35 @@ class Repository:
     def valid_session_key(self, session_key):
         return self.db.get_session(session_key) is not None
 
+    def iter_portfolios(self):
+        # streams on a connection of its own, the caller may consume this from another thread
+        db = self._create_database()
+        try:
+            for user_id, data in db.iter_portfolios():
+                yield user_id, data
+        finally:
+            db.close()
+
+    def ticker_catalogue(self):
+        # loaded tickers show up in the other workers once their copy expires
+        catalogue = self._catalogue
+        if catalogue is None or time.time() - catalogue.loaded_at > catalogue_ttl:
+            catalogue = self._catalogue = TickerCatalogue(self.db.get_tickers())
+        return catalogue
+
+    def load_tickers(self, tickers):
+        count = self.db.save_tickers(tickers)
+        self._catalogue = None
+        return count
+
+    def hot_tickers(self, limit):
+        tickers = Counter()
+        for user_id, data in self.db.iter_portfolios():
+            tickers.update(fond_data["ticker"] for fond_data in data)
+        return [ticker for ticker, count in tickers.most_common(limit)]
+
     def close(self):
-        self.db.close()
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for db in connections:
+            db.close()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import sys
+import fcntl
+import threading
+
+class SessionSweeper(threading.Thread):
+    def __init__(self, db_factory, interval, batch_size, lock_filename=None):
+        threading.Thread.__init__(self, name="session-sweeper")
+        self.daemon = True
+        self.db_factory = db_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        # every gunicorn worker starts a sweeper, the one holding the lock file does the sweeping
+        self.lock_filename = lock_filename
+        self.lock_file = None
+        self.stopped = threading.Event()
+
+    def acquire(self):
+        """True when this sweeper may sweep, the lock is kept until the sweeper stops"""
+        if not self.lock_filename or self.lock_file:
+            return True
+        lock_file = open(self.lock_filename, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def sweep(self, db):
+        # delete in bounded batches, each in its own transaction, to keep lock times short
+        total = 0
+        while not self.stopped.is_set():
+            deleted = db.delete_expired_sessions(self.batch_size)
+            total += deleted
+            if deleted < self.batch_size:
+                break
+        return total
+
+    def run(self):
+        # the sweeper gets its own connection, connections are not shared between threads
+        db = self.db_factory()
+        try:
+            while not self.stopped.is_set():
+                try:
+                    # a sweeper that did not get the lock tries again, its holder may have exited
+                    if self.acquire():
+                        self.sweep(db)
+                except Exception as e:
+                    sys.stderr.write("session sweep failed: %s\n" % e)
+                self.stopped.wait(self.interval)
+        finally:
+            db.close()
+            if self.lock_file:
+                self.lock_file.close()
+                self.lock_file = None
+
+    def stop(self):
+        self.stopped.set()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 from os import environ
+from multiprocessing import cpu_count
 
 debug=environ.get("DEBUG", False) != False
 
@@ -9,6 +10,38 @@ google_client_id = environ["GOOGLE_CLIENT_ID"]
 google_client_secret = environ["GOOGLE_CLIENT_SECRET"]
 redirect_uri = "/oauth2callback"
 quotes_source_url = environ["QUOTES_URL"]
+quotes_timeout = float(environ.get("QUOTES_TIMEOUT", 10)) # seconds
+quotes_breaker_threshold = int(environ.get("QUOTES_BREAKER_THRESHOLD", 5)) # consecutive failures before the source is skipped
+quotes_breaker_reset = int(environ.get("QUOTES_BREAKER_RESET", 60)) # seconds until the source is tried again
+quotes_publication_time = environ.get("QUOTES_PUBLICATION_TIME", "18:00") # local time new quotes appear on trading days
+market_holidays_file = environ.get("MARKET_HOLIDAYS_FILE", "") # ISO dates the exchange is closed, one per line
+quotes_negative_ttl = int(environ.get("QUOTES_NEGATIVE_TTL", 60 * 60)) # seconds an unknown ticker is not looked up again
+summary_deadline = float(environ.get("SUMMARY_DEADLINE", 5)) # seconds /summary waits for quotes, 0 waits as long as it takes
+portfolio_cache_size = int(environ.get("PORTFOLIO_CACHE_SIZE", 1000)) # decoded portfolios kept per worker
+quote_cache_size = int(environ.get("QUOTE_CACHE_SIZE", 1000)) # parsed quotes kept per worker, per ticker and column set
+catalogue_ttl = int(environ.get("CATALOGUE_TTL", 10 * 60)) # seconds before the ticker catalogue is reloaded
+
+session_lifetime = int(environ.get("SESSION_LIFETIME", 30 * 24 * 60 * 60)) # seconds
+session_sweep_interval = int(environ.get("SESSION_SWEEP_INTERVAL", 10 * 60)) # seconds, 0 disables the sweeper
+session_sweep_batch_size = int(environ.get("SESSION_SWEEP_BATCH_SIZE", 1000))
+session_sweep_lock = environ.get("SESSION_SWEEP_LOCK", "/tmp/portfolio-session-sweeper.lock") # one worker sweeps at a time, empty sweeps from every worker
+
+metrics_directory = environ.get("METRICS_DIRECTORY", "/tmp/portfolio-metrics") # summed across workers by /metrics, empty reports the answering worker only
+metrics_write_interval = int(environ.get("METRICS_WRITE_INTERVAL", 5)) # seconds between snapshots of a worker's metrics
+
+profiling = environ.get("PROFILING", False) != False
+profiling_keys = [key for key in environ.get("PROFILING_KEYS", "").split(",") if key]
+profile_directory = environ.get("PROFILE_DIRECTORY", "/tmp/profiles")
+
+workers = int(environ.get("WORKERS", 2 * cpu_count() + 1))
+threads = int(environ.get("THREADS", 1))
+port = int(environ.get("PORT", 5000))
+graceful_timeout = int(environ.get("GRACEFUL_TIMEOUT", 30)) # seconds
+warmup_tickers = [ticker for ticker in environ.get("WARMUP_TICKERS", "").split(",") if ticker]
+warmup_hot_tickers = int(environ.get("WARMUP_HOT_TICKERS", 50)) # most held tickers to preload, 0 disables
+
+storage_backend = environ.get("STORAGE_BACKEND", "mysql") # mysql or sqlite
+sqlite_path = environ.get("SQLITE_PATH", "/tmp/portfolio.db")
 
 db_credentials = {
     "dbname": environ["DB_NAME"],
@@ -16,4 +49,4 @@ db_credentials = {
     "host": environ["DB_HOST"],
     "port": int(environ["DB_PORT"]),
     "password": environ["DB_PASSWORD"],
-}
+} if storage_backend == "mysql" else None
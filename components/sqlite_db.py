@@ -0,0 +1,96 @@
+#!/usr/bin/python
+
+import json
+import sqlite3
+
+from db import Database, db_timed
+
+class _Cursor:
+    """Lets the queries shared with the MySQL backend keep their %s placeholders"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query, data=None):
+        return self.cursor.execute(query.replace("%s", "?"), data or ())
+
+    def executemany(self, query, data):
+        return self.cursor.executemany(query.replace("%s", "?"), data)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+class SQLiteDatabase(Database):
+    def __init__(self, path, session_lifetime=None):
+        self.connection = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self.connection.text_factory = str
+        self.cur = _Cursor(self.connection.cursor())
+
+        self.table = "user"
+        self.session_table = "session"
+        self.summary_table = "summary"
+        self.ticker_table = "ticker"
+        self.change_table = "portfolio_change"
+        self.session_lifetime = session_lifetime
+
+        self._initialize_database()
+
+    def _initialize_database(self):
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (id INTEGER PRIMARY KEY AUTOINCREMENT, user_data TEXT, portfolio TEXT,
+                            portfolio_version INTEGER NOT NULL DEFAULT 0,
+                            google_id TEXT GENERATED ALWAYS AS (CAST(json_extract(user_data, '$.id') AS TEXT)) VIRTUAL)""".format(self.table))
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (uuid VARCHAR(36) UNIQUE NOT NULL PRIMARY KEY, user_id INT, created TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""".format(self.session_table))
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (user_id INTEGER NOT NULL PRIMARY KEY, version VARCHAR(40) NOT NULL, summary TEXT, created TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""".format(self.summary_table))
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (ticker VARCHAR(32) NOT NULL PRIMARY KEY, name VARCHAR(255), last_quote_date DATE)""".format(self.ticker_table))
+        self.cur.execute("""CREATE TABLE IF NOT EXISTS {} (user_id INTEGER NOT NULL, version INTEGER NOT NULL, changed_from DATE NOT NULL, PRIMARY KEY (user_id, version))""".format(self.change_table))
+        if not self._has_column(self.table, "portfolio_version"):
+            self.cur.execute("""ALTER TABLE {} ADD COLUMN portfolio_version INTEGER NOT NULL DEFAULT 0""".format(self.table))
+        self.cur.execute("""CREATE INDEX IF NOT EXISTS idx_google_id ON {} (google_id)""".format(self.table))
+        self.cur.execute("""CREATE INDEX IF NOT EXISTS idx_user_id ON {} (user_id)""".format(self.session_table))
+        self.cur.execute("""CREATE INDEX IF NOT EXISTS idx_created ON {} (created)""".format(self.session_table))
+        self.connection.commit()
+
+    def _has_column(self, table, column):
+        self.cur.execute("""PRAGMA table_xinfo({})""".format(table))
+        return column in [row[1] for row in self.cur.fetchall()]
+
+    def _has_index(self, table, index):
+        sql = """SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s"""
+        self.cur.execute(sql, (table, index))
+        return self.cur.fetchone()[0] > 0
+
+    def _streaming_cursor(self):
+        return self.connection.cursor()
+
+    @db_timed
+    def create_user(self, user_info):
+        sql = """INSERT INTO {} (user_data, portfolio) VALUES (%s, '[]')""".format(self.table)
+        data = (json.dumps(user_info),)
+
+        self.cur.execute(sql, data)
+        self.connection.commit()
+
+        return self.cur.lastrowid
+
+    @db_timed
+    def delete_expired_sessions(self, batch_size):
+        # sqlite is not built with DELETE ... LIMIT by default
+        sql = """DELETE FROM {0} WHERE rowid IN (SELECT rowid FROM {0} WHERE created <= %s LIMIT %s)""".format(self.session_table)
+        data = (self._session_expiry_cutoff(), batch_size)
+
+        self.cur.execute(sql, data)
+        self.connection.commit()
+        return self.cur.rowcount
+
+    @db_timed
+    def save_materialized_summary(self, user_id, version, summary):
+        sql = """INSERT OR REPLACE INTO {} (user_id, version, summary) VALUES (%s, %s, %s)""".format(self.summary_table)
+        data = (user_id, version, summary)
+        self._execute_query(sql, data)
+
+    @db_timed
+    def save_tickers(self, tickers):
+        sql = """INSERT OR REPLACE INTO {} (ticker, name, last_quote_date) VALUES (%s, %s, %s)""".format(self.ticker_table)
+        self.cur.executemany(sql, tickers)
+        self.connection.commit()
+        return len(tickers)
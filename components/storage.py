@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+import abc
+
+class Storage(object):
+    """Operations every storage backend has to provide. Portfolios and user data
+    are stored as JSON documents, one row per user, and sessions in a table of their own.
+    A backend missing one of them can not be instantiated."""
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def get_portfolio(self, session_token):
+        pass
+
+    @abc.abstractmethod
+    def save_portfolio(self, portfolio, user_id, changed_from=None):
+        """Returns the version of the portfolio after the update. changed_from, the earliest
+        date whose development changed, is logged with the version when given"""
+
+    @abc.abstractmethod
+    def get_portfolio_changes(self, user_id, since_version):
+        """Returns (version, changed_from) of every logged update after since_version"""
+
+    @abc.abstractmethod
+    def get_portfolio_version(self, session_token):
+        """Returns (user_id, version) of the portfolio of a session without reading the portfolio, or None"""
+
+    @abc.abstractmethod
+    def get_versioned_portfolio(self, user_id):
+        """Returns (version, portfolio) of user_id, or None"""
+
+    @abc.abstractmethod
+    def save_user(self, user_info, user_id):
+        pass
+
+    @abc.abstractmethod
+    def get_user_info_by_google_id(self, google_id):
+        pass
+
+    @abc.abstractmethod
+    def get_user_info_by_user_id(self, user_id):
+        pass
+
+    @abc.abstractmethod
+    def get_portfolio_by_user_id(self, user_id):
+        pass
+
+    @abc.abstractmethod
+    def iter_portfolios(self):
+        """Yields (user_id, portfolio) for every user without loading them all into memory"""
+
+    @abc.abstractmethod
+    def get_user_info(self, session_token):
+        pass
+
+    @abc.abstractmethod
+    def create_user(self, user_info):
+        pass
+
+    @abc.abstractmethod
+    def delete_sessions_for_user(self, user_id):
+        pass
+
+    @abc.abstractmethod
+    def new_session(self, user_id):
+        pass
+
+    @abc.abstractmethod
+    def get_session(self, uuid_string):
+        pass
+
+    @abc.abstractmethod
+    def delete_expired_sessions(self, batch_size):
+        pass
+
+    @abc.abstractmethod
+    def get_materialized_summary(self, user_id):
+        """Returns (version, summary) of the summary stored for user_id, or None"""
+
+    @abc.abstractmethod
+    def save_materialized_summary(self, user_id, version, summary):
+        pass
+
+    @abc.abstractmethod
+    def save_tickers(self, tickers):
+        """Inserts or replaces (ticker, name, last_quote_date) rows of the ticker catalogue"""
+
+    @abc.abstractmethod
+    def get_tickers(self):
+        pass
+
+    @abc.abstractmethod
+    def close(self):
+        pass
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+import dates
+
+class UnitIndex(object):
+    """Value over time of one unit bought at the first quote of a fond.
+
+    The index only depends on the quotes, so one instance per ticker is shared
+    by every portfolio holding the fond. A deposit buys amount / index[date]
+    units, which are worth units * index[t] on any later day.
+    """
+    # ticker -> the index of the latest quotes loaded for it
+    _registry = {}
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.values = []
+        self.ordinals = [dates.ordinal(quote["quote_date"]) for quote in quotes]
+        self.positions = dict((day, i) for i, day in enumerate(self.ordinals))
+
+        value = 1.0
+        for i, quote in enumerate(quotes):
+            if i > 0:
+                value *= float(quote["close"]) / float(quotes[i - 1]["close"])
+            self.values.append(value)
+
+    def __len__(self):
+        return len(self.quotes)
+
+    def position(self, date):
+        return self.positions.get(dates.ordinal(date))
+
+    @classmethod
+    def for_quotes(cls, ticker, quotes):
+        # the quotes list is replaced whenever the quotes are refreshed
+        index = cls._registry.get(ticker)
+        if index is None or index.quotes is not quotes:
+            index = cls(quotes)
+            cls._registry[ticker] = index
+        return index
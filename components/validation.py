@@ -1,5 +1,19 @@
+import csv
 import jsonschema
 
+from error import InvalidUsage
+import dates
+
+_deposit_entry_schema = {
+    "type": "object",
+    "properties": {
+        "ticker": { "type": "string", "minLength": 1 },
+        "date": { "type": "string" },
+        "amount": { "type": "number", "minimum": 0 }
+    },
+    "required": ["ticker", "date", "amount"]
+}
+
 def _validate_json(request, schema):
     if not request.is_json:
         return False
@@ -69,3 +83,60 @@ def validate_addfond(request):
     }
 
     return _validate_json(request, schema)
+
+def validate_deposit_import(request):
+    schema = {
+        "type": "object",
+        "properties": {
+            "deposits": {
+                "type": "array",
+                "items": _deposit_entry_schema
+            }
+        },
+        "required": ["deposits"]
+    }
+
+    return _validate_json(request, schema)
+
+def _parse_amount(amount):
+    amount = float(amount)
+    return int(amount) if amount.is_integer() else amount
+
+def read_deposit_csv(stream):
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or not set(["ticker", "date", "amount"]).issubset(map(str.strip, reader.fieldnames)):
+        raise InvalidUsage("csv must have a header containing ticker, date and amount")
+
+    deposits = []
+    for row in reader:
+        row = {key.strip(): (value or "").strip() for key, value in row.items() if key}
+        try:
+            deposit = {"ticker": row["ticker"], "date": row["date"], "amount": _parse_amount(row["amount"])}
+            jsonschema.validate(deposit, _deposit_entry_schema)
+        except (ValueError, jsonschema.ValidationError):
+            raise InvalidUsage("invalid deposit on line %d" % reader.line_num)
+
+        deposits.append(deposit)
+
+    return deposits
+
+def read_since(args):
+    """since query argument as (revision, date), revision is None for a plain date"""
+    since = args.get("since")
+    if not since:
+        return None
+    revision, _, date = since.rpartition(":")
+    try:
+        return int(revision) if revision else None, dates.parse(date)
+    except ValueError:
+        raise InvalidUsage("since must be a date formatted as YYYY-MM-DD or a token returned by /summary")
+
+def read_date_range(args):
+    """start and end query arguments as dates, either may be None"""
+    try:
+        start, end = [dates.parse(args[name]) if args.get(name) else None for name in ("start", "end")]
+    except ValueError:
+        raise InvalidUsage("start and end must be dates formatted as YYYY-MM-DD")
+    if start and end and start > end:
+        raise InvalidUsage("start must not be after end")
+    return start, end
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+
+import sys
+
+from Fond import Fond
+from error import InvalidUsage
+
+def warm_up(tickers):
+    """Loads quotes and unit indexes for tickers into the in-process caches, refreshing expired ones"""
+    loaded = []
+    for ticker in tickers:
+        try:
+            fond = Fond(ticker)
+            # refresh expired quotes now, warm caches are about to be shared
+            fond.fond_quotes.revalidate_in_background = False
+            fond.unit_index
+            loaded.append(ticker)
+        except (InvalidUsage, IOError) as e:
+            sys.stderr.write("warm-up of %s failed: %s\n" % (ticker, getattr(e, "message", e)))
+    return loaded
+
+def tickers_to_warm_up(repo, configured_tickers, hot_tickers):
+    tickers = list(configured_tickers)
+    if hot_tickers > 0:
+        tickers += [ticker for ticker in repo.hot_tickers(hot_tickers) if ticker not in tickers]
+    return tickers
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+import json
+
+try:
+    import msgpack
+except ImportError: # optional, msgpack is only offered when it is installed
+    msgpack = None
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.portfolio.columnar+json"
+COLUMNAR_MSGPACK = "application/vnd.portfolio.columnar+msgpack"
+
+def available():
+    """Summary formats in order of preference when a client accepts several, the row format first"""
+    return [JSON, COLUMNAR_JSON] + ([COLUMNAR_MSGPACK] if msgpack is not None else [])
+
+def _isoformat(date):
+    # stored summaries were decoded from json and already hold strings
+    return date if isinstance(date, basestring) else date.isoformat()
+
+def columnar(summary):
+    """The summary with the development rows of every entry turned into parallel date, value and deposit arrays"""
+    result = []
+    for entry in summary:
+        entry = dict(entry)
+        rows = entry["development"]
+        entry["development"] = {
+            "date": [_isoformat(row["date"]) for row in rows],
+            "value": [row["value"] for row in rows],
+            "deposit": [row["deposit"] for row in rows],
+        }
+        result.append(entry)
+    return result
+
+def encode(summary, mimetype, default=None):
+    if mimetype == COLUMNAR_JSON:
+        return json.dumps(columnar(summary))
+    if mimetype == COLUMNAR_MSGPACK:
+        # str is text here, keep it out of the msgpack bin type
+        return msgpack.packb(columnar(summary), use_bin_type=False)
+    return json.dumps(summary, default=default)
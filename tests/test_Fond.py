@@ -24,6 +24,16 @@ class TestFond(unittest.TestCase):
         self.assertFalse(Fond("T1") == Fond("T2"))
         self.assertFalse(Fond("T1") == Tmp("T1"))
 
+    @patch('components.Fond.Investment')
+    def test_fond_quotes_is_lazy(self, investment_mock):
+        """the quotes of a fond should only be set up when they are used"""
+        fond = Fond("T1", "ticker 1", [{"date": "2016-1-1", "amount": 1000}])
+        fond.deposit(1000, date(2016, 1, 2))
+        investment_mock.assert_not_called()
+
+        self.assertIs(fond.fond_quotes, fond.fond_quotes)
+        investment_mock.assert_called_once_with("T1.FOND", columns=("quote_date", "close"))
+
     def generate_quotes(self, from_date, num_quotes):
         quotes = [{"quote_date": from_date, "close": randint(10, 1000)}]
         for i in range(1, num_quotes):
@@ -83,6 +93,33 @@ class TestFond(unittest.TestCase):
             {"date": date(2016, 3, 1), "amount": 1000},
         ])
 
+    def test_deposit_many(self):
+        """deposit_many adds all deposits and keeps them sorted by date"""
+        fond = Fond("T1", "ticker 1", [{"date": "2016-2-1", "amount": 1000}])
+        fond.deposit_many([(500, "2016-03-01"), (200, date(2016, 1, 1))])
+        self.assertEquals(fond.deposits, [
+            {"date": date(2016, 1, 1), "amount": 200},
+            {"date": date(2016, 2, 1), "amount": 1000},
+            {"date": date(2016, 3, 1), "amount": 500},
+        ])
+
+    def test_deposit_many_parses_once(self):
+        """deposit_many should parse every date once"""
+        fond = Fond("T1", "ticker 1", [{"date": "2016-2-1", "amount": 1000}])
+        with patch.object(Fond, "_string_to_date", side_effect=fond._string_to_date) as parse_mock:
+            fond.deposit_many([(500, "2016-03-01"), (200, "2016-01-01")])
+        self.assertEquals(parse_mock.call_count, 2)
+        self.assertEquals(fond.changed_from, date(2016, 1, 1))
+
+    def test_deposit_many_raises_exception(self):
+        """deposit_many should raise an exception and leave deposits untouched if a date is already registered"""
+        fond = Fond("T1", "ticker 1", [{"date": "2016-1-1", "amount": 1000}])
+        with self.assertRaises(InvalidUsage):
+            fond.deposit_many([(100, date(2016, 1, 2)), (100, date(2016, 1, 1))])
+        with self.assertRaises(InvalidUsage):
+            fond.deposit_many([(100, date(2016, 1, 2)), (100, date(2016, 1, 2))])
+        self.assertEquals(len(fond.deposits), 1)
+
     def test_delete_deposit(self):
         """delete_deposit deletes a deposit from the deposit list if it exists"""
         fond = Fond("T1", "ticker 1", [
@@ -95,6 +132,20 @@ class TestFond(unittest.TestCase):
         fond.delete_deposit("2016-1-1")
         self.assertEquals(len(fond.deposits), 0)
 
+    def test_changed_from(self):
+        """deposit changes should keep the earliest date whose development changed"""
+        fond = Fond("T1", "ticker 1", [{"date": "2016-1-1", "amount": 1000}, {"date": "2016-3-1", "amount": 1000}])
+        self.assertIsNone(fond.changed_from)
+
+        fond.deposit(1000, date(2016, 4, 1))
+        self.assertEquals(fond.changed_from, date(2016, 4, 1))
+        fond.delete_deposit("2016-3-1")
+        self.assertEquals(fond.changed_from, date(2016, 3, 1))
+        fond.deposit_many([(100, date(2016, 5, 1)), (100, "2016-02-01")])
+        self.assertEquals(fond.changed_from, date(2016, 2, 1))
+        fond.deposit(1000, date(2016, 6, 1))
+        self.assertEquals(fond.changed_from, date(2016, 2, 1))
+
     def test_get_quote_entry_by_date(self):
         """get_quote_entry_by_date should return an index of a quote entry based on date"""
         fond = Fond("T1", "ticker 1")
@@ -139,6 +190,24 @@ class TestFond(unittest.TestCase):
             self.assertIn("deposit", entry)
             self.assertEquals(len(entry.keys()), 3)
 
+    @patch('components.Fond.Investment.get_quotes')
+    def test_get_development_values(self, mock):
+        """get_development should grow every deposit with the closing price from its date"""
+        mock.return_value = [
+            {"quote_date": date(2016, 1, 1) + timedelta(days=i), "close": close}
+            for i, close in enumerate([100, 110, 55, 110])
+        ]
+        fond = Fond("T1", "ticker 1", [
+            {"date": "2016-1-2", "amount": 1000},
+            {"date": "2016-1-3", "amount": 500},
+        ])
+        development = fond.get_developement()
+        self.assertEquals([row["date"] for row in development], [date(2016, 1, 2), date(2016, 1, 3), date(2016, 1, 4)])
+        self.assertEquals([row["deposit"] for row in development], [1000, 500, 0])
+        self.assertAlmostEqual(development[0]["value"], 1000)
+        self.assertAlmostEqual(development[1]["value"], 1000)
+        self.assertAlmostEqual(development[2]["value"], 2000)
+
     @patch('components.Fond.Investment.get_quotes')
     def test_get_summary(self, mock):
         """get_summary should return a dictionary containing summary data"""
@@ -1,14 +1,25 @@
 #!/usr/bin/env python
 
+import os
 import unittest
+import shutil
+import tempfile
 import requests_mock
 from mock import PropertyMock, MagicMock, patch, Mock
 from random import randint, uniform
 from datetime import date, datetime, timedelta
 from time import mktime, time
+from threading import Event, Thread
+
+import requests
+from cachetools import LRUCache
 
 from components.Investment import Investment
+from components.settings import quote_cache_size
+from components import quote_refresher
+from components.market_calendar import MarketCalendar
 from components.error import InvalidUsage
+from components.deadline import Deadline, DeadlineExceeded
 
 class TestFond(unittest.TestCase):
     csvdata = """quote_date,paper,exch,open,high,low,close,volume,value
@@ -58,6 +69,105 @@ class TestFond(unittest.TestCase):
             "quotes": self.parsed_csvdata
         })
 
+    @requests_mock.mock()
+    def test__get_from_cache_memory(self, req_mock):
+        """_get_from_cache should serve quotes fetched by another Investment from memory"""
+        inv = Investment("T1")
+        req_mock.get(inv.quotes_source_url, text=self.csvdata)
+        quotes = inv._get_quotes_from_remote()
+
+        with patch('components.Investment.os.path.isfile') as isfile_mock:
+            self.assertIs(Investment("T1")._get_from_cache(), quotes)
+            isfile_mock.assert_not_called()
+
+    @requests_mock.mock()
+    def test_get_quotes_from_remote_projection(self, req_mock):
+        """_get_quotes_from_remote should only keep the requested columns"""
+        inv = Investment("T1", columns=("quote_date", "close"))
+        req_mock.get(inv.quotes_source_url, text=self.csvdata)
+        self.assertEquals(inv._get_quotes_from_remote()["quotes"], [
+            {"quote_date": quote["quote_date"], "close": quote["close"]} for quote in self.parsed_csvdata
+        ])
+
+    @requests_mock.mock()
+    def test__get_from_cache_projection(self, req_mock):
+        """_get_from_cache should only read the requested columns from the cache"""
+        directory = tempfile.mkdtemp()
+        try:
+            with patch.object(Investment, "_cache_directory", directory), patch.object(Investment, "_memory_cache", {}):
+                inv = Investment("T1")
+                req_mock.get(inv.quotes_source_url, text=self.csvdata)
+                inv._get_quotes_from_remote()
+                Investment._memory_cache.clear()
+
+                self.assertEquals(Investment("T1")._get_from_cache()["quotes"], self.parsed_csvdata)
+
+                projected = Investment("T1", columns=("quote_date", "close"))
+                with patch('components.Investment.open', create=True, side_effect=open) as open_mock:
+                    quotes = projected._get_from_cache()
+                self.assertEquals([call[0][0] for call in open_mock.call_args_list],
+                                  [projected.filename, projected._column_filename("quote_date"), projected._column_filename("close")])
+                self.assertEquals(quotes["quotes"], [
+                    {"quote_date": quote["quote_date"], "close": quote["close"]} for quote in self.parsed_csvdata
+                ])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_import_quotes_concurrently(self):
+        """import_quotes should let threads of one process write the same ticker at the same time"""
+        directory = tempfile.mkdtemp()
+        try:
+            with patch.object(Investment, "_cache_directory", directory), patch.object(Investment, "_memory_cache", {}):
+                errors = []
+                def write():
+                    try:
+                        for i in range(20):
+                            Investment("T1").import_quotes(self.csvdata, 1234)
+                    except Exception as e:
+                        errors.append(e)
+                threads = [Thread(target=write) for i in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+                self.assertEquals(errors, [])
+                self.assertFalse([name for name in os.listdir(Investment("T1").directory) if name.endswith(".tmp")])
+                self.assertEquals(Investment("T1")._get_from_cache()["quotes"], self.parsed_csvdata)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_memory_cache_bounded(self):
+        """the quote caches should keep at most quote_cache_size entries per process"""
+        with patch.object(Investment, "_memory_cache", LRUCache(maxsize=2)):
+            for ticker in ("T1", "T2", "T3"):
+                Investment._memory_cache[Investment(ticker)._cache_key()] = {"fetch_time": 1234, "quotes": []}
+            self.assertEquals(sorted(key[0] for key in Investment._memory_cache.keys()), ["T2", "T3"])
+        self.assertEquals(Investment._memory_cache.maxsize, quote_cache_size)
+        self.assertEquals(Investment._filled_cache.maxsize, quote_cache_size)
+
+    def test_invalid_ticker(self):
+        """Investment should reject tickers that would leave the cache directory"""
+        for ticker in ("../T1", "T1/close", "..", "T1/../T2", "", None):
+            self.assertRaises(InvalidUsage, Investment, ticker)
+        self.assertEquals(Investment("T1.FOND").ticker, "T1.FOND")
+
+    def test_import_quotes_unknown_columns(self):
+        """import_quotes should only cache the columns of the quotes source"""
+        directory = tempfile.mkdtemp()
+        try:
+            with patch.object(Investment, "_cache_directory", directory), patch.object(Investment, "_memory_cache", {}):
+                inv = Investment("T1")
+                inv.import_quotes("quote_date,close,../../escape\n20161222,1814.05,x\n", 1234)
+
+                self.assertEquals(sorted(os.listdir(directory)), ["T1"])
+                self.assertEquals(sorted(os.listdir(inv.directory)), ["close.json", "meta.json", "quote_date.json"])
+                self.assertEquals(Investment("T1")._get_from_cache()["quotes"], [
+                    {"quote_date": date(year=2016, month=12, day=22), "close": "1814.05"}
+                ])
+        finally:
+            shutil.rmtree(directory)
+
     def test__fill_date_holes_in_quotes(self):
         """_fill_date_holes_in_quotes fills in missing entries in a sequence of quotes"""
         inv = Investment("T1")
@@ -81,50 +191,38 @@ class TestFond(unittest.TestCase):
             "close": 12
         }])
 
-    @patch('components.Investment.Investment._get_date_today')
-    def test__quotes_has_expired(self, mock):
-        """_quotes_has_expired_should return False if today is a week end day"""
-        mock.return_value = datetime(year=2016, month=1, day=2, hour=12)
+    def expired(self, fetched, now):
         inv = Investment("T1")
-        quotes = { "fetch_time": mktime(datetime(year=2016, month=1, day=1).timetuple())}
+        with patch.object(inv, "_get_date_today", return_value=now):
+            return inv._quotes_has_expired({"fetch_time": mktime(fetched.timetuple())})
 
-        self.assertFalse(inv._quotes_has_expired(quotes))
+    def test__quotes_has_expired_weekend(self):
+        """_quotes_has_expired should return False on a weekend when the quotes are from after friday's publication"""
+        self.assertFalse(self.expired(datetime(2016, 1, 1, 19), datetime(2016, 1, 2, 12)))
+        self.assertFalse(self.expired(datetime(2016, 1, 1, 19), datetime(2016, 1, 4, 17, 59)))
+        self.assertTrue(self.expired(datetime(2016, 1, 1, 19), datetime(2016, 1, 4, 18)))
 
-    @patch('components.Investment.Investment._get_date_today')
-    def test__quotes_has_expired(self, mock):
-        """_quotes_has_expired_should return False if fetch time was after 18:00 today"""
-        mock.return_value = datetime(year=2016, month=1, day=4)
-        inv = Investment("T1")
-        quotes = { "fetch_time": mktime(datetime(year=2016, month=1, day=4, hour=19).timetuple())}
-
-        self.assertFalse(inv._quotes_has_expired(quotes))
-
-    @patch('components.Investment.Investment._get_date_today')
-    def test__quotes_has_expired(self, mock):
-        """_quotes_has_expired_should return False if fetch time is within the last 30 minutes"""
-        mock.return_value = datetime(year=2016, month=1, day=4, hour=12, minute=10)
-        inv = Investment("T1")
-        quotes = { "fetch_time": mktime(datetime(year=2016, month=1, day=4, hour=12, minute=0).timetuple())}
-
-        self.assertFalse(inv._quotes_has_expired(quotes))
+    def test__quotes_has_expired_after_publication(self):
+        """_quotes_has_expired should return False if fetch time was after 18:00 today"""
+        self.assertFalse(self.expired(datetime(2016, 1, 4, 19), datetime(2016, 1, 4, 23)))
+        self.assertFalse(self.expired(datetime(2016, 1, 4, 19), datetime(2016, 1, 5, 12)))
 
-    @patch('components.Investment.Investment._get_date_today')
-    def test__quotes_has_expired(self, mock):
-        """_quotes_has_expired_should return True if fetch time was over 30 minutes ago"""
-        mock.return_value = datetime(year=2016, month=1, day=4, hour=12, minute=40)
-        inv = Investment("T1")
-        quotes = { "fetch_time": mktime(datetime(year=2016, month=1, day=4, hour=12, minute=0).timetuple())}
+    def test__quotes_has_expired_before_publication(self):
+        """_quotes_has_expired should return False during the day until the next publication"""
+        self.assertFalse(self.expired(datetime(2016, 1, 4, 12), datetime(2016, 1, 4, 12, 40)))
+        self.assertFalse(self.expired(datetime(2016, 1, 4, 12), datetime(2016, 1, 4, 17, 59)))
+        self.assertTrue(self.expired(datetime(2016, 1, 4, 12), datetime(2016, 1, 4, 18)))
 
-        self.assertTrue(inv._quotes_has_expired(quotes))
+    def test__quotes_has_expired_holiday(self):
+        """_quotes_has_expired should skip exchange holidays"""
+        with patch.object(Investment, "calendar", MarketCalendar([date(2016, 1, 5)])):
+            self.assertFalse(self.expired(datetime(2016, 1, 4, 19), datetime(2016, 1, 5, 19)))
+            self.assertTrue(self.expired(datetime(2016, 1, 4, 19), datetime(2016, 1, 6, 18)))
 
-    @patch('components.Investment.Investment._get_date_today')
-    def test__quotes_has_expired_30_mins(self, mock):
-        """_quotes_has_expired_should return True if fetch time was over 30 minutes ago"""
-        mock.return_value = datetime(year=2016, month=1, day=4, hour=12, minute=40)
+    def test_expires_at(self):
+        """expires_at should return the next publication after the quotes were fetched"""
         inv = Investment("T1")
-        quotes = { "fetch_time": mktime(datetime(year=2016, month=1, day=4, hour=12, minute=0).timetuple())}
-
-        self.assertTrue(inv._quotes_has_expired(quotes))
+        self.assertEquals(inv.expires_at({"fetch_time": mktime(datetime(2016, 1, 1, 19).timetuple())}), datetime(2016, 1, 4, 18))
 
     @patch('components.Investment.Investment._get_from_cache')
     @patch('components.Investment.Investment._get_quotes_from_remote')
@@ -170,11 +268,107 @@ class TestFond(unittest.TestCase):
         expired_mock.return_value = False
 
         self.assertEquals(inv.get_quotes(), quotes[:3][::-1])
+        self.assertFalse(inv.stale)
 
+    @patch('components.Investment.quote_refresher.schedule')
+    @patch('components.Investment.Investment._get_from_cache')
+    @patch('components.Investment.Investment._get_quotes_from_remote')
+    @patch('components.Investment.Investment._quotes_has_expired')
+    def test_get_quotes_expired(self, expired_mock, remote_mock, cache_mock, schedule_mock):
+        """get_quotes should serve expired quotes and refresh them in the background"""
+        inv = Investment("T1")
+        quotes = [{"quote_date": date(year=2016, month=1, day=1), "close": 104}]
+        cache_mock.return_value = {"fetch_time": 1234, "quotes": quotes}
         expired_mock.return_value = True
-        remote_mock.return_value = {"fetch_time": 12345, "quotes": quotes}
 
+        self.assertEquals(inv.get_quotes(), quotes)
+        self.assertTrue(inv.stale)
+        remote_mock.assert_not_called()
+        schedule_mock.assert_called_once_with("T1", inv._get_quotes_from_remote)
+
+    @patch('components.Investment.Investment._get_from_cache')
+    @patch('components.Investment.Investment._get_quotes_from_remote')
+    @patch('components.Investment.Investment._quotes_has_expired')
+    def test_get_quotes_expired_in_foreground(self, expired_mock, remote_mock, cache_mock):
+        """get_quotes should refresh expired quotes itself when not revalidating in the background"""
+        quotes = [
+            {"quote_date": date(year=2016, month=1, day=2), "close": 100},
+            {"quote_date": date(year=2016, month=1, day=1), "close": 104},
+        ]
+        cache_mock.return_value = {"fetch_time": 1234, "quotes": quotes[1:]}
+        expired_mock.return_value = True
+
+        inv = Investment("T1")
+        inv.revalidate_in_background = False
+        remote_mock.return_value = {"fetch_time": 12345, "quotes": quotes}
         self.assertEquals(inv.get_quotes(), quotes[::-1])
+        self.assertFalse(inv.stale)
+
+        inv = Investment("T1")
+        inv.revalidate_in_background = False
+        remote_mock.return_value = None
+        self.assertEquals(inv.get_quotes(), quotes[1:])
+        self.assertTrue(inv.stale)
+
+    @patch('components.Investment.quote_refresher.schedule')
+    @patch('components.Investment.Investment._get_from_cache')
+    @patch('components.Investment.Investment._get_quotes_from_remote')
+    def test_get_quotes_deadline(self, remote_mock, cache_mock, schedule_mock):
+        """get_quotes should stop waiting for the quotes source when the deadline passes"""
+        quotes = [{"quote_date": date(year=2016, month=1, day=1), "close": 104}]
+        cache_mock.return_value = None
+        released = Event()
+        remote_mock.side_effect = lambda: released.wait(5) and {"fetch_time": time(), "quotes": quotes}
+
+        with self.assertRaises(DeadlineExceeded):
+            Investment("T1").get_quotes(Deadline(0.05))
+        released.set()
+
+        with self.assertRaises(DeadlineExceeded):
+            Investment("T1").get_quotes(Deadline(0))
+        self.assertEquals(schedule_mock.call_count, 1)
+        self.assertEquals(Investment("T1").get_quotes(Deadline(1)), quotes)
+
+    @requests_mock.mock()
+    def test_get_quotes_from_remote_circuit_breaker(self, req_mock):
+        """_get_quotes_from_remote should stop calling a failing source"""
+        inv = Investment("T1")
+        req_mock.get(inv.quotes_source_url, status_code=503)
+
+        with patch.object(quote_refresher, "_breakers", {}):
+            for i in range(quote_refresher.quotes_breaker_threshold + 3):
+                self.assertIsNone(inv._get_quotes_from_remote())
+            self.assertEquals(req_mock.call_count, quote_refresher.quotes_breaker_threshold)
+
+    @requests_mock.mock()
+    def test_get_quotes_unknown_ticker(self, req_mock):
+        """get_quotes should not ask the source again about a ticker it does not know"""
+        inv = Investment("T1")
+        req_mock.get(inv.quotes_source_url, status_code=404)
+
+        with patch.object(Investment, "_unknown_tickers", {}), patch.object(Investment, "_memory_cache", {}), \
+                patch.object(quote_refresher, "_breakers", {}), \
+                patch('components.Investment.Investment._get_from_cache', return_value=None):
+            for i in range(3):
+                with self.assertRaises(InvalidUsage):
+                    Investment("T1").get_quotes()
+            self.assertEquals(req_mock.call_count, 1)
+            self.assertFalse(quote_refresher.circuit_breaker(inv.quotes_source_url).open)
+
+            Investment._unknown_tickers["T1"] = time() - 1
+            with self.assertRaises(InvalidUsage):
+                Investment("T1").get_quotes()
+            self.assertEquals(req_mock.call_count, 2)
+
+    @requests_mock.mock()
+    def test_get_quotes_from_remote_connection_error(self, req_mock):
+        """_get_quotes_from_remote should return None when the source can not be reached"""
+        inv = Investment("T1")
+        req_mock.get(inv.quotes_source_url, exc=requests.exceptions.ConnectTimeout)
+
+        with patch.object(quote_refresher, "_breakers", {}):
+            self.assertIsNone(inv._get_quotes_from_remote())
+            self.assertEquals(quote_refresher.circuit_breaker(inv.quotes_source_url).failures, 1)
 
     @patch('components.Investment.Investment._get_from_cache')
     @patch('components.Investment.Investment._get_quotes_from_remote')
@@ -197,3 +391,24 @@ class TestFond(unittest.TestCase):
         expired_mock.return_value = False
 
         self.assertEquals(inv.get_quotes(), quotes_with_filled_holes)
+
+    @patch('components.Investment.Investment._get_from_cache')
+    @patch('components.Investment.Investment._get_quotes_from_remote')
+    @patch('components.Investment.Investment._quotes_has_expired')
+    def test_get_quotes_reuses_filled_quotes(self, expired_mock, remote_mock, cache_mock):
+        """get_quotes should only fill the holes once for the same loaded quotes"""
+        quotes = {"fetch_time": 1234, "quotes": [
+            {"quote_date": date(year=2016, month=1, day=4), "close": 100},
+            {"quote_date": date(year=2016, month=1, day=1), "close": 104},
+        ]}
+        cache_mock.return_value = quotes
+        expired_mock.return_value = False
+
+        with patch.object(Investment, "_filled_cache", {}), patch.object(Investment, "revalidate_in_background", False):
+            filled = Investment("T1").get_quotes()
+            self.assertIs(Investment("T1").get_quotes(), filled)
+
+            expired_mock.return_value = True
+            remote_mock.return_value = {"fetch_time": 12345, "quotes": quotes["quotes"][1:]}
+            self.assertEquals(len(Investment("T1").get_quotes()), 1)
+
@@ -1,13 +1,16 @@
 #!/usr/bin/env python
 
 import unittest
+import json
 from mock import PropertyMock, MagicMock, patch, Mock
 from datetime import datetime, timedelta, date
 from random import randint, uniform
 
 from components.Portfolio import Portfolio
 from components.Fond import Fond
+from components.holdings import Holdings
 from components.error import InvalidUsage, InvalidDate
+from components.deadline import Deadline, DeadlineExceeded
 
 class TestPortfolio(unittest.TestCase):
     def setUp(self):
@@ -18,6 +21,10 @@ class TestPortfolio(unittest.TestCase):
                                         {"date": "2016-01-03", "amount": 100}])
         self.portfolio = Portfolio(1, {"T1": self.fond1, "T2": self.fond2})
 
+    def reload(self, portfolio):
+        """The portfolio as the next request reads it"""
+        return Portfolio(portfolio.user_id, Holdings(documents=json.loads(portfolio.to_json())))
+
     def generate_quotes(self, from_date, num_quotes):
         quotes = [{"quote_date": from_date, "close": randint(10, 1000)}]
         for i in range(1, num_quotes):
@@ -46,20 +53,141 @@ class TestPortfolio(unittest.TestCase):
         self.assertEquals(self.portfolio.get_deposits_by_date("2016-01-03"), 100)
         self.assertEquals(self.portfolio.get_deposits_by_date("2016-01-04"), 0)
 
-    @patch('components.Fond.Fond.quotes', new_callable=PropertyMock)
+    @patch('components.Fond.Investment.get_quotes')
     def test_get_summary(self, quotes_mock):
         """get_summary returns a list with a summary for each fond and a combined summary"""
         quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 3)
         res = self.portfolio.get_summary()
 
         for entry in res:
-            self.assertEquals(set(entry.keys()).issubset(set(["ticker", "name", "development", "total_deposited"])), True)
+            self.assertEquals(set(entry.keys()).issubset(set(["ticker", "name", "development", "total_deposited", "covers"])), True)
 
         self.assertEquals(len(res), 3)
         self.assertEquals(res[-1]["name"], "Portfolio")
         self.assertEquals(res[-1]["ticker"], "Portfolio")
         self.assertEquals(res[-1]["total_deposited"], 400)
         self.assertEquals(len(res[-1]["development"]), 3)
+        self.assertEquals(sorted(res[-1]["covers"]), ["T1", "T2"])
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_get_summary_incomplete(self, quotes_mock):
+        """get_summary flags fonds without quotes before the deadline and leaves them out of the total"""
+        quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 3)
+        self.fond2.fond_quotes.get_quotes = Mock(side_effect=DeadlineExceeded("T2"))
+        deadline = Deadline(1)
+        res = self.portfolio.get_summary(deadline=deadline)
+
+        by_ticker = dict((entry["ticker"], entry) for entry in res)
+        self.assertTrue(by_ticker["T2"]["incomplete"])
+        self.assertEquals(by_ticker["T2"]["development"], [])
+        self.assertEquals(by_ticker["T2"]["total_deposited"], 200)
+        self.assertNotIn("incomplete", by_ticker["T1"])
+        self.assertEquals(by_ticker["Portfolio"]["covers"], ["T1"])
+        self.assertEquals(by_ticker["Portfolio"]["total_deposited"], 200)
+        self.fond2.fond_quotes.get_quotes.assert_called_once_with(deadline)
+
+    def test_changed_from(self):
+        """changed_from should return the earliest date changed in any fond"""
+        self.assertIsNone(self.portfolio.changed_from())
+
+        self.portfolio.deposit("T1", "2016-02-01", 100)
+        self.portfolio.deposit_many([{"ticker": "T2", "date": "2016-01-15", "amount": 100}])
+        self.assertEquals(self.portfolio.changed_from(), date(2016, 1, 15))
+
+        self.portfolio.add_fond("T3", "Ticker 3")
+        self.assertIsNone(self.portfolio.changed_from())
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_last_date(self, quotes_mock):
+        """last_date should return the date of the last quote of any fond"""
+        quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 3)
+        self.assertEquals(self.portfolio.last_date(), date(2016, 1, 3))
+
+        quotes_mock.side_effect = DeadlineExceeded("T1")
+        self.assertIsNone(self.reload(self.portfolio).last_date(Deadline(0)))
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_quotes_loaded_once(self, quotes_mock):
+        """a request should load the quotes of every fond once"""
+        quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 3)
+        portfolio = self.reload(self.portfolio)
+        portfolio.version()
+        portfolio.get_summary()
+        portfolio.stale_tickers()
+        portfolio.last_date()
+        self.assertEquals(quotes_mock.call_count, 2)
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_get_analytics(self, quotes_mock):
+        """get_analytics returns return figures for each fond and the combined portfolio"""
+        quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 3)
+        res = self.portfolio.get_analytics()
+
+        self.assertEquals(len(res), 3)
+        self.assertEquals(sorted(entry["ticker"] for entry in res), ["Portfolio", "T1", "T2"])
+        self.assertEquals(res[-1]["ticker"], "Portfolio")
+        self.assertEquals(res[-1]["total_deposited"], 400)
+        for entry in res:
+            self.assertIn("twr", entry)
+            self.assertIn("xirr", entry)
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_version(self, quotes_mock):
+        """version changes when the portfolio or the last quote of a fond changes"""
+        quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 3)
+        version = self.portfolio.version()
+        self.assertEquals(self.portfolio.version(), version)
+
+        self.portfolio.deposit("T1", "2016-01-03", 100)
+        deposited = self.portfolio.version()
+        self.assertNotEquals(deposited, version)
+
+        self.assertEquals(self.reload(self.portfolio).version(), deposited)
+        quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 4)
+        self.assertNotEquals(self.reload(self.portfolio).version(), deposited)
+
+    @patch('components.Fond.Investment._quotes_has_expired')
+    @patch('components.Fond.Investment._get_from_cache')
+    @patch('components.Investment.quote_refresher.schedule')
+    def test_stale_tickers(self, schedule_mock, cache_mock, expired_mock):
+        """stale_tickers lists the fonds served from expired quotes"""
+        cache_mock.return_value = {"fetch_time": 1234, "quotes": self.generate_quotes(date(2016, 1, 1), 3)}
+        expired_mock.side_effect = lambda quotes: True
+        self.assertEquals(self.portfolio.stale_tickers(), ["T1", "T2"])
+
+        expired_mock.side_effect = lambda quotes: False
+        self.assertEquals(self.reload(self.portfolio).stale_tickers(), [])
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_get_summary_date_range(self, quotes_mock):
+        """get_summary limits the development rows to the given dates"""
+        quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 5)
+        res = self.portfolio.get_summary(date(2016, 1, 2), date(2016, 1, 3))
+
+        for entry in res:
+            self.assertEquals([row["date"] for row in entry["development"]], [date(2016, 1, 2), date(2016, 1, 3)])
+        self.assertEquals(res[-1]["total_deposited"], 400)
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_iter_development_rows(self, quotes_mock):
+        """iter_development_rows yields the fond rows and the portfolio total date by date"""
+        quotes_mock.return_value = self.generate_quotes(date(2016, 1, 1), 4)
+        summary = self.portfolio.get_summary()
+        rows = list(self.portfolio.iter_development_rows())
+
+        self.assertEquals(len(rows), 12)
+        self.assertEquals(sorted(ticker for ticker, row in rows[:3]), ["Portfolio", "T1", "T2"])
+        self.assertEquals(rows[2][0], "Portfolio")
+        self.assertEquals([row["date"] for ticker, row in rows], sorted(row["date"] for ticker, row in rows))
+        for entry in summary:
+            streamed = [row for ticker, row in rows if ticker == entry["ticker"]]
+            self.assertEquals([row["date"] for row in streamed], [row["date"] for row in entry["development"]])
+            for row, expected in zip(streamed, entry["development"]):
+                self.assertAlmostEqual(row["value"], expected["value"])
+                self.assertEquals(row["deposit"], expected["deposit"])
+
+        rows = list(self.portfolio.iter_development_rows(date(2016, 1, 2), date(2016, 1, 3)))
+        self.assertEquals(sorted(set(row["date"] for ticker, row in rows)), [date(2016, 1, 2), date(2016, 1, 3)])
 
     def test_get_total_development(self):
         """get_total_development combines fonds into a portfolio development"""
@@ -96,6 +224,28 @@ class TestPortfolio(unittest.TestCase):
 
         fond.deposit.assert_called_once_with(1234, date(2016, 1, 1))
 
+    def test_deposit_many(self):
+        """deposit_many should register every deposit in the right fond"""
+        self.portfolio.deposit_many([
+            {"ticker": "T1", "date": "2016-01-05", "amount": 10},
+            {"ticker": "T2", "date": "2016-01-05", "amount": 20},
+            {"ticker": "T1", "date": "2016-01-04", "amount": 30},
+        ])
+
+        self.assertEquals(self.portfolio.get_deposits_by_date("2016-01-05"), 30)
+        self.assertEquals(self.portfolio.get_deposits_by_date("2016-01-04"), 30)
+        self.assertEquals([d["date"] for d in self.fond1.deposits][-2:], [date(2016, 1, 4), date(2016, 1, 5)])
+
+    def test_deposit_many_is_atomic(self):
+        """deposit_many should not register anything if one of the deposits is invalid"""
+        for entry in [{"ticker": "garbage", "date": "2016-01-05", "amount": 10},
+                      {"ticker": "T2", "date": "2016-01-03", "amount": 10},
+                      {"ticker": "T2", "date": "not a date", "amount": 10}]:
+            with self.assertRaises(InvalidUsage):
+                self.portfolio.deposit_many([{"ticker": "T1", "date": "2016-01-05", "amount": 10}, entry])
+
+        self.assertEquals(self.portfolio.get_deposits_by_date("2016-01-05"), 0)
+
     def test_delete_deposit_raises_exception(self):
         """deposit should raise exception if fond with ticker is not registered"""
         with self.assertRaises(InvalidUsage):
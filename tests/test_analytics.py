@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+import unittest
+from datetime import date, timedelta
+
+from components import analytics
+from components.records import Deposit, DevelopmentRow
+
+class TestAnalytics(unittest.TestCase):
+    def development(self, rows):
+        return [DevelopmentRow(date(2016, 1, 1) + timedelta(days=i), value, deposit) for i, (value, deposit) in enumerate(rows)]
+
+    def test_daily_returns(self):
+        """daily_returns should not count deposits as returns"""
+        development = self.development([(100, 100), (110, 0), (1110, 1000), (555, 0)])
+        returns = analytics.daily_returns(development)
+        self.assertEquals(len(returns), 3)
+        self.assertAlmostEqual(returns[0], 0.1)
+        self.assertAlmostEqual(returns[1], 0)
+        self.assertAlmostEqual(returns[2], -0.5)
+
+    def test_time_weighted_return(self):
+        """time_weighted_return should chain the daily returns"""
+        self.assertAlmostEqual(analytics.time_weighted_return([0.1, 0, -0.5]), -0.45)
+        self.assertEquals(analytics.time_weighted_return([]), 0)
+
+    def test_max_drawdown(self):
+        """max_drawdown should return the largest fall from a peak"""
+        self.assertAlmostEqual(analytics.max_drawdown([0.1, -0.5, 0.5, 1, -0.2]), -0.5)
+        self.assertEquals(analytics.max_drawdown([0.1, 0.2]), 0)
+
+    def test_volatility(self):
+        """volatility should return the annualized standard deviation of the returns"""
+        self.assertEquals(analytics.volatility([0.1]), None)
+        self.assertAlmostEqual(analytics.volatility([0.01, -0.01]), (0.0002 * 365) ** 0.5)
+
+    def test_xirr(self):
+        """xirr should return the annual rate that values the deposits at the final value"""
+        deposits = [Deposit(date(2015, 1, 1), 1000)]
+        self.assertAlmostEqual(analytics.xirr(deposits, 1100, date(2016, 1, 1)), 0.1)
+
+        deposits = [Deposit(date(2015, 1, 1), 1000), Deposit(date(2015, 7, 1), 500), Deposit(date(2015, 10, 1), 200)]
+        rate = analytics.xirr(deposits, 1600, date(2016, 3, 1))
+        cashflows = [((d.date - date(2015, 1, 1)).days / 365.0, -d.amount) for d in deposits] + [(425 / 365.0, 1600)]
+        self.assertAlmostEqual(analytics._npv(rate, cashflows), 0, places=5)
+        self.assertLess(rate, 0)
+
+    def test_xirr_without_solution(self):
+        """xirr should return None when there is nothing to solve"""
+        self.assertEquals(analytics.xirr([], 100, date(2016, 1, 1)), None)
+        self.assertEquals(analytics.xirr([Deposit(date(2016, 1, 1), 100)], 100, date(2016, 1, 1)), None)
+        self.assertEquals(analytics.xirr([Deposit(date(2016, 1, 1), 100)], 0, date(2017, 1, 1)), None)
+
+    def test_xirr_bisection(self):
+        """xirr should fall back to bisection for large losses"""
+        deposits = [Deposit(date(2016, 1, 1), 1000)]
+        rate = analytics.xirr(deposits, 500, date(2016, 1, 31))
+        self.assertAlmostEqual(analytics._npv(rate, [(0, -1000), (30 / 365.0, 500)]), 0, places=5)
+
+    def test_xirr_overflow(self):
+        """xirr should solve losses over long horizons where the npv overflows close to -100%"""
+        rate = analytics.xirr([Deposit(date(2000, 1, 1), 1000)], 0.0001, date(2080, 1, 1))
+        self.assertAlmostEqual(1000 * (1 + rate) ** ((date(2080, 1, 1) - date(2000, 1, 1)).days / 365.0), 0.0001)
+
+        self.assertEquals(analytics._npv(-0.999999, [(0, -1000.0), (80, 0.0001)]), float("inf"))
+
+    def test_analyze(self):
+        """analyze should summarize a development series"""
+        development = self.development([(100, 100), (110, 0), (1110, 1000), (555, 0)])
+        deposits = [Deposit(date(2015, 1, 1), 50), Deposit(date(2016, 1, 1), 100), Deposit(date(2016, 1, 3), 1000)]
+        result = analytics.analyze("T1", "Ticker 1", development, deposits)
+        self.assertEquals(set(result.keys()), set(["ticker", "name", "value", "total_deposited", "twr", "xirr", "max_drawdown", "volatility"]))
+        self.assertEquals(result["value"], 555)
+        self.assertEquals(result["total_deposited"], 1100)
+        self.assertAlmostEqual(result["twr"], -0.45)
+        self.assertAlmostEqual(result["max_drawdown"], -0.5)
+        self.assertLess(result["xirr"], -0.99)
+
+        empty = analytics.analyze("T1", "Ticker 1", [], deposits)
+        self.assertEquals(empty["twr"], None)
+        self.assertEquals(empty["xirr"], None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from mock import patch
+from datetime import date
+
+from components import backfill_quotes
+from components.Investment import Investment
+
+class TestBackfillQuotes(unittest.TestCase):
+    csvdata = """quote_date,paper,exch,open,high,low,close,volume,value
+20161222,T1,Fonds,1814.05,1814.05,1814.05,1814.05,0,0
+20161221,T1,Fonds,1807.52,1807.52,1807.52,1807.52,0,0
+"""
+
+    def setUp(self):
+        self.dump = tempfile.mkdtemp()
+        self.cache = tempfile.mkdtemp()
+        for name, data in [("T1.FOND.csv", self.csvdata), ("T2.FOND.csv", self.csvdata), ("T3.FOND.csv", ""), ("notes.txt", "")]:
+            with open(os.path.join(self.dump, name), "w") as f:
+                f.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.dump)
+        shutil.rmtree(self.cache)
+
+    def test_quote_files(self):
+        """quote_files should name every csv in a directory after its ticker"""
+        files = backfill_quotes.quote_files([self.dump, "/other/T4.csv"])
+        self.assertEquals([ticker for ticker, path in files], ["T1.FOND", "T2.FOND", "T3.FOND", "T4"])
+        self.assertEquals(files[0][1], os.path.join(self.dump, "T1.FOND.csv"))
+
+    def test_run(self):
+        """run should cache the quotes of every file and report the files it could not load"""
+        progress = StringIO()
+        with patch.object(Investment, "_cache_directory", self.cache), patch.object(Investment, "_memory_cache", {}):
+            self.assertEquals(backfill_quotes.run(backfill_quotes.quote_files([self.dump]), 2, progress), (2, 1))
+
+            quotes = Investment("T1.FOND", columns=("quote_date", "close"))._get_from_cache()
+            self.assertEquals(quotes["quotes"], [{"quote_date": date(2016, 12, 22), "close": "1814.05"},
+                                                 {"quote_date": date(2016, 12, 21), "close": "1807.52"}])
+            self.assertEquals(quotes["fetch_time"], int(os.path.getmtime(os.path.join(self.dump, "T1.FOND.csv"))))
+            self.assertFalse(os.path.exists(os.path.join(self.cache, "T3.FOND")))
+
+        lines = progress.getvalue().splitlines()
+        self.assertEquals(len(lines), 3)
+        self.assertIn("[3/3]", lines[-1])
+        self.assertIn("T3.FOND failed", progress.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
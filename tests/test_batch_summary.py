@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import unittest
+import json
+from StringIO import StringIO
+from mock import PropertyMock, MagicMock, patch, Mock
+from datetime import date, timedelta
+
+from components import batch_summary
+from components.repository import Repository
+
+class TestBatchSummary(unittest.TestCase):
+    def setUp(self):
+        self.repo = Mock(spec=Repository)
+        self.repo.hot_tickers.return_value = ["T1"]
+        self.repo.iter_portfolios.return_value = iter([
+            (1, [{"ticker": "T1", "name": "Ticker 1", "deposits": [{"date": "2016-01-01", "amount": 100}]}]),
+            (2, []),
+            (3, [{"ticker": "T1", "name": "Ticker 1", "deposits": [{"date": "2016-01-02", "amount": 200}]}]),
+        ])
+
+    def generate_quotes(self, num_quotes):
+        return [{"quote_date": date(2016, 1, 1) + timedelta(days=i), "close": 100 + i} for i in range(num_quotes)]
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_summarize(self, quotes_mock):
+        """summarize should return the encoded summary of a portfolio, or the reason it failed"""
+        quotes_mock.return_value = self.generate_quotes(3)
+        user_id, version, summary, error = batch_summary.summarize((1, [{"ticker": "T1", "name": "Ticker 1", "deposits": []}]))
+        self.assertEquals((user_id, error), (1, None))
+        self.assertEquals(len(version), 40)
+        self.assertEquals(json.loads(summary)[-1]["ticker"], "Portfolio")
+
+        quotes_mock.side_effect = batch_summary.InvalidUsage("T1 is not a valid ticker")
+        self.assertEquals(batch_summary.summarize((1, [{"ticker": "T1", "name": "Ticker 1", "deposits": []}])),
+                          (1, None, None, "T1 is not a valid ticker"))
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_run(self, quotes_mock):
+        """run should write one summary line per portfolio"""
+        quotes_mock.return_value = self.generate_quotes(3)
+        output = StringIO()
+
+        self.assertEquals(batch_summary.run(self.repo, batch_summary.file_sink(output), processes=2, chunksize=1), (3, 0))
+        self.repo.hot_tickers.assert_called_once_with(None)
+
+        lines = sorted((json.loads(line) for line in output.getvalue().splitlines()), key=lambda line: line["user_id"])
+        self.assertEquals([line["user_id"] for line in lines], [1, 2, 3])
+        self.assertEquals(lines[0]["summary"][0]["total_deposited"], 100)
+        self.assertEquals(lines[1]["summary"], [{"ticker": "Portfolio", "name": "Portfolio", "development": [], "total_deposited": 0,
+                                                "covers": []}])
+        self.assertEquals(lines[2]["summary"][-1]["total_deposited"], 200)
+        self.assertNotEquals(lines[0]["version"], lines[2]["version"])
+
+    @patch('components.Fond.Investment.get_quotes')
+    @patch('components.batch_summary.sys.stderr')
+    def test_run_unexpected_error(self, stderr_mock, quotes_mock):
+        """run should count a portfolio that fails unexpectedly and still write the others"""
+        quotes_mock.return_value = self.generate_quotes(3)
+        self.repo.iter_portfolios.return_value = iter([
+            (1, [{"ticker": "T1", "name": "Ticker 1", "deposits": [{"date": "2016-01-01", "amount": 100}]}]),
+            (2, [{"ticker": "T1", "name": "Ticker 1", "deposits": [{"date": "not a date", "amount": 100}]}]),
+            (3, []),
+        ])
+        output = StringIO()
+
+        self.assertEquals(batch_summary.run(self.repo, batch_summary.file_sink(output), processes=2, chunksize=1), (2, 1))
+        self.assertEquals(sorted(json.loads(line)["user_id"] for line in output.getvalue().splitlines()), [1, 3])
+        stderr_mock.write.assert_called_once_with(
+            "summary of user 2 failed: ValueError: time data 'not a date' does not match format '%Y-%m-%d'\n")
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_run_sink_error(self, quotes_mock):
+        """run should stop the workers and raise when the sink fails"""
+        quotes_mock.return_value = self.generate_quotes(3)
+        self.repo.iter_portfolios.return_value = iter([(i, []) for i in range(500)])
+        sink = Mock(side_effect=IOError("disk full"))
+
+        with self.assertRaises(IOError):
+            batch_summary.run(self.repo, sink, processes=2, chunksize=1)
+        sink.assert_called_once()
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_run_to_table(self, quotes_mock):
+        """run should store the summaries that /summary serves"""
+        quotes_mock.return_value = self.generate_quotes(3)
+
+        self.assertEquals(batch_summary.run(self.repo, self.repo.put_materialized_summary, processes=2), (3, 0))
+        stored = dict((call[0][0], call[0][1:]) for call in self.repo.put_materialized_summary.call_args_list)
+        self.assertEquals(sorted(stored.keys()), [1, 2, 3])
+        version, summary = stored[1]
+        self.assertEquals(json.loads(summary)[0]["ticker"], "T1")
+
+if __name__ == "__main__":
+    unittest.main()
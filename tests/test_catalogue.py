@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+import unittest
+from StringIO import StringIO
+from datetime import date
+
+from components.catalogue import TickerCatalogue, read_catalogue_csv
+from components.error import InvalidUsage
+
+class TestTickerCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.catalogue = TickerCatalogue([
+            ("DNB.NOR", "DNB Norge Indeks", date(2016, 1, 1)),
+            ("SKA.GLO", "Skagen Global", None),
+            ("SKA.KON", "Skagen Kon-Tiki", None),
+            ("ODIN.NOR", "Odin Norge", None),
+        ])
+
+    def test_contains(self):
+        """the catalogue should know its tickers"""
+        self.assertEquals(len(self.catalogue), 4)
+        self.assertIn("SKA.GLO", self.catalogue)
+        self.assertNotIn("SKA", self.catalogue)
+        self.assertEquals(self.catalogue.get("DNB.NOR")["last_quote_date"], date(2016, 1, 1))
+
+    def test_search(self):
+        """search should match prefixes of tickers and of words in names"""
+        self.assertEquals([t["ticker"] for t in self.catalogue.search("ska")], ["SKA.GLO", "SKA.KON"])
+        self.assertEquals([t["ticker"] for t in self.catalogue.search("Norge")], ["DNB.NOR", "ODIN.NOR"])
+        self.assertEquals([t["ticker"] for t in self.catalogue.search("ska.k")], ["SKA.KON"])
+        self.assertEquals([t["ticker"] for t in self.catalogue.search("ska", limit=1)], ["SKA.GLO"])
+        self.assertEquals(self.catalogue.search("xyz"), [])
+        self.assertEquals(self.catalogue.search(" "), [])
+
+    def test_search_deduplicates(self):
+        """search should list a ticker once even if several of its keys match"""
+        catalogue = TickerCatalogue([("NOR", "Norge Nordic", None)])
+        self.assertEquals(len(catalogue.search("no")), 1)
+
+    def test_read_catalogue_csv(self):
+        """read_catalogue_csv should read tickers, names and optional last quote dates"""
+        tickers = read_catalogue_csv(StringIO("ticker,name,last_quote_date\nT1,Ticker 1,2016-01-01\nT2, Ticker 2 ,\n"))
+        self.assertEquals(tickers, [("T1", "Ticker 1", date(2016, 1, 1)), ("T2", "Ticker 2", None)])
+
+        self.assertEquals(read_catalogue_csv(StringIO("name,ticker\nTicker 1,T1\n")), [("T1", "Ticker 1", None)])
+
+    def test_read_catalogue_csv_invalid(self):
+        """read_catalogue_csv should raise InvalidUsage on bad input"""
+        for data in ["", "ticker\nT1\n", "ticker,name\n,Ticker\n", "ticker,name,last_quote_date\nT1,Ticker,2016-13-01\n"]:
+            with self.assertRaises(InvalidUsage):
+                read_catalogue_csv(StringIO(data))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,10 @@ from datetime import date, datetime, timedelta
 
 from components.repository import Repository
 from components.Portfolio import Portfolio
+from components.profiling import RequestProfiler
+from components.catalogue import TickerCatalogue
+from components.Fond import Fond
+from components.records import DevelopmentRow
 import components.controller as controller
 from components.controller import app
 
@@ -15,6 +19,7 @@ class TestFond(unittest.TestCase):
 
     def setUp(self):
         controller.repo = Mock(spec=Repository)
+        controller.repo.ticker_catalogue.return_value = TickerCatalogue()
         self.app = app.test_client()
         self.app.testing = True
 
@@ -35,6 +40,7 @@ class TestFond(unittest.TestCase):
         self.assertEquals(result.status_code, 401)
 
         controller.repo.get_portfolio.return_value = Portfolio(1, {})
+        controller.repo.get_materialized_summary.return_value = None
         controller.repo.valid_session_key.return_value = True
         result = self.app.get("/summary", headers={"api-key": "123"})
         self.assertEquals(result.status_code, 200)
@@ -43,6 +49,143 @@ class TestFond(unittest.TestCase):
         for field in ["development", "total_deposited", "ticker", "name"]:
             self.assertIn(field, data[0].keys())
 
+    def test_summary_columnar(self):
+        """GET /summary should return parallel arrays to clients accepting the columnar format"""
+        controller.repo.get_portfolio.return_value = Portfolio(1, {})
+        controller.repo.valid_session_key.return_value = True
+
+        for stored in [None, '[{"ticker": "Portfolio", "development": [{"date": "2016-01-01", "value": 1, "deposit": 1}]}]']:
+            controller.repo.get_materialized_summary.return_value = stored
+            result = self.app.get("/summary", headers={"api-key": "123", "Accept": "application/vnd.portfolio.columnar+json"})
+            self.assertEquals(result.status_code, 200)
+            self.assertEquals(result.mimetype, "application/vnd.portfolio.columnar+json")
+            self.assertEquals(result.headers["Vary"], "Accept")
+            development = json.loads(result.get_data())[-1]["development"]
+            self.assertEquals(set(development.keys()), set(["date", "value", "deposit"]))
+
+        result = self.app.get("/summary", headers={"api-key": "123", "Accept": "*/*"})
+        self.assertEquals(result.mimetype, "application/json")
+
+    @patch('components.Portfolio.Portfolio.last_date')
+    @patch('components.Portfolio.Portfolio.get_summary')
+    def test_summary_since(self, summary_mock, last_date_mock):
+        """GET /summary should only return the rows changed since a token and hand out a new token"""
+        controller.repo.get_portfolio.return_value = Portfolio(1, {}, revision=7)
+        controller.repo.valid_session_key.return_value = True
+        controller.repo.get_materialized_summary.return_value = None
+        summary_mock.return_value = []
+        last_date_mock.return_value = date(2016, 3, 1)
+
+        controller.repo.changed_since.return_value = date(2016, 2, 1)
+        result = self.app.get("/summary?since=5:2016-02-20", headers={"api-key": "123"})
+        self.assertEquals(result.status_code, 200)
+        controller.repo.changed_since.assert_called_once_with(1, 5, 7)
+        self.assertEquals(summary_mock.call_args[0][0], date(2016, 2, 1))
+        self.assertEquals(result.headers["X-Summary-From"], "2016-02-01")
+        self.assertEquals(result.headers["X-Summary-Token"], "7:2016-03-01")
+        controller.repo.get_materialized_summary.assert_not_called()
+
+        controller.repo.changed_since.return_value = date.max
+        result = self.app.get("/summary?since=7:2016-02-20", headers={"api-key": "123"})
+        self.assertEquals(summary_mock.call_args[0][0], date(2016, 2, 21))
+
+        controller.repo.changed_since.return_value = None
+        result = self.app.get("/summary?since=5:2016-02-20", headers={"api-key": "123"})
+        self.assertIsNone(summary_mock.call_args[0][0])
+        self.assertNotIn("X-Summary-From", result.headers)
+
+        result = self.app.get("/summary?start=2016-01-01", headers={"api-key": "123"})
+        self.assertNotIn("X-Summary-Token", result.headers)
+
+        result = self.app.get("/summary?since=2016-02-20&start=2016-01-01", headers={"api-key": "123"})
+        self.assertEquals(result.status_code, 400)
+
+    @patch('components.Portfolio.Portfolio.get_summary')
+    def test_summary_materialized(self, summary_mock):
+        """GET /summary should serve the stored summary when it matches the portfolio version"""
+        portfolio = Portfolio(1, {})
+        controller.repo.get_portfolio.return_value = portfolio
+        controller.repo.get_materialized_summary.return_value = '[{"ticker": "Portfolio"}]'
+        controller.repo.valid_session_key.return_value = True
+
+        result = self.app.get("/summary", headers={"api-key": "123"})
+        self.assertEquals(result.status_code, 200)
+        self.assertEquals(json.loads(result.get_data()), [{"ticker": "Portfolio"}])
+        controller.repo.get_materialized_summary.assert_called_once_with(1, portfolio.version())
+        summary_mock.assert_not_called()
+
+    @patch('components.Portfolio.Portfolio.get_summary')
+    def test_summary_date_range(self, summary_mock):
+        """GET /summary should compute summaries limited to a date range live"""
+        controller.repo.get_portfolio.return_value = Portfolio(1, {})
+        controller.repo.valid_session_key.return_value = True
+        summary_mock.return_value = []
+
+        result = self.app.get("/summary?start=2016-01-01&end=2016-02-01", headers={"api-key": "123"})
+        self.assertEquals(result.status_code, 200)
+        self.assertEquals(summary_mock.call_args[0][:2], (date(2016, 1, 1), date(2016, 2, 1)))
+        controller.repo.get_materialized_summary.assert_not_called()
+
+        result = self.app.get("/summary?start=2016-02-30", headers={"api-key": "123"})
+        self.assertEquals(result.status_code, 400)
+
+    @patch('components.Fond.Investment.get_quotes')
+    def test_export_csv(self, quotes_mock):
+        """GET /export.csv should stream the development rows as csv"""
+        quotes_mock.return_value = [{"quote_date": date(2016, 1, 1) + timedelta(days=i), "close": 100 + i} for i in range(3)]
+        controller.repo.get_portfolio.return_value = Portfolio(1, {
+            "T1": Fond("T1", "Ticker 1", [{"date": "2016-01-01", "amount": 100}]),
+        })
+        controller.repo.valid_session_key.return_value = True
+
+        result = self.app.get("/export.csv?start=2016-01-02", headers={"api-key": "123"})
+        self.assertEquals(result.status_code, 200)
+        self.assertEquals(result.mimetype, "text/csv")
+        self.assertTrue(result.is_streamed)
+        lines = result.get_data().splitlines()
+        self.assertEquals(lines[0], "date,ticker,value,deposit")
+        self.assertEquals([line.split(",")[:2] for line in lines[1:]],
+                          [["2016-01-02", "T1"], ["2016-01-02", "Portfolio"], ["2016-01-03", "T1"], ["2016-01-03", "Portfolio"]])
+        self.assertAlmostEqual(float(lines[-1].split(",")[2]), 102)
+
+    def test_export_rows_chunks(self):
+        """export_rows should yield the csv in chunks"""
+        rows = [("T1", DevelopmentRow(date(2016, 1, 1) + timedelta(days=i), 100, 0)) for i in range(100)]
+        chunks = list(controller.export_rows(iter(rows), chunk_size=256))
+        self.assertGreater(len(chunks), 5)
+        self.assertEquals(len("".join(chunks).splitlines()), 101)
+
+    @patch('components.Portfolio.Portfolio.stale_tickers')
+    def test_summary_stale(self, stale_mock):
+        """GET /summary should flag responses computed from expired quotes"""
+        controller.repo.get_portfolio.return_value = Portfolio(1, {})
+        controller.repo.get_materialized_summary.return_value = None
+        controller.repo.valid_session_key.return_value = True
+
+        stale_mock.return_value = []
+        result = self.app.get("/summary", headers={"api-key": "123"})
+        self.assertNotIn("X-Stale-Quotes", result.headers)
+
+        stale_mock.return_value = ["T1", "T2"]
+        result = self.app.get("/summary", headers={"api-key": "123"})
+        self.assertEquals(result.headers["X-Stale-Quotes"], "T1,T2")
+        self.assertIn("Stale", result.headers["Warning"])
+
+    def test_analytics(self):
+        """GET /analytics should return return figures for a given user"""
+        result = self.app.get("/analytics")
+        self.assertEquals(result.status_code, 401)
+
+        controller.repo.get_portfolio.return_value = Portfolio(1, {})
+        controller.repo.valid_session_key.return_value = True
+        result = self.app.get("/analytics", headers={"api-key": "123"})
+        self.assertEquals(result.status_code, 200)
+
+        data = json.loads(result.get_data())
+        self.assertEquals(data[-1]["ticker"], "Portfolio")
+        for field in ["twr", "xirr", "max_drawdown", "volatility", "value", "total_deposited"]:
+            self.assertIn(field, data[-1].keys())
+
     def test_addfond(self):
         """POST /addfond should return 204 on success"""
 
@@ -60,6 +203,36 @@ class TestFond(unittest.TestCase):
         self.assertEquals(result.status_code, 204)
         portfolio_mock.add_fond.assert_called_once()
 
+    def test_addfond_unknown_ticker(self):
+        """POST /addfond should reject tickers missing from the catalogue"""
+        portfolio_mock = Mock(spec=Portfolio)
+        controller.repo.get_portfolio.return_value = portfolio_mock
+        controller.repo.valid_session_key.return_value = True
+        controller.repo.ticker_catalogue.return_value = TickerCatalogue([("T1", "Ticker 1", None)])
+
+        for ticker, status_code in [("T2", 400), ("T1", 204)]:
+            result = self.app.post("/addfond",
+                headers={"api-key": "123"},
+                data=json.dumps({"ticker": ticker, "name": "Ticker"}),
+                content_type="application/json")
+            self.assertEquals(result.status_code, status_code)
+        portfolio_mock.add_fond.assert_called_once_with("T1", "Ticker")
+
+    def test_search_tickers(self):
+        """GET /tickers should return the tickers matching a prefix"""
+        controller.repo.valid_session_key.return_value = True
+        controller.repo.ticker_catalogue.return_value = TickerCatalogue([
+            ("DNB.NOR", "DNB Norge", date(2016, 1, 1)),
+            ("SKA.GLO", "Skagen Global", None),
+        ])
+
+        result = self.app.get("/tickers?q=glo", headers={"api-key": "123"})
+        self.assertEquals(result.status_code, 200)
+        self.assertEquals(json.loads(result.get_data()), [{"ticker": "SKA.GLO", "name": "Skagen Global", "last_quote_date": None}])
+
+        result = self.app.get("/tickers?q=dnb", headers={"api-key": "123"})
+        self.assertEquals(json.loads(result.get_data())[0]["last_quote_date"], "2016-01-01")
+
     def test_addfond_returns_401_on_validation_error(self):
         """ POST /addfond with an invalid json request should return 400"""
         portfolio_mock = Mock(spec=Portfolio)
@@ -112,3 +285,72 @@ class TestFond(unittest.TestCase):
             content_type='application/json')
         self.assertEquals(result.status_code, 204)
         portfolio_mock.delete_deposit.assert_called_once()
+
+    def test_import_deposits(self):
+        """POST /deposit/import should register a json batch with a single save"""
+        result = self.app.post("/deposit/import")
+        self.assertEquals(result.status_code, 401)
+
+        portfolio_mock = Mock(spec=Portfolio)
+        controller.repo.get_portfolio.return_value = portfolio_mock
+        controller.repo.valid_session_key.return_value = True
+
+        deposits = [{"ticker": "T1", "date": "2016-01-01", "amount": 1000},
+                    {"ticker": "T1", "date": "2016-01-02", "amount": 1000}]
+        result = self.app.post("/deposit/import",
+            headers={"api-key": "123"},
+            data=json.dumps({"deposits": deposits}),
+            content_type="application/json")
+        self.assertEquals(result.status_code, 204)
+        portfolio_mock.deposit_many.assert_called_once_with(deposits)
+        controller.repo.put_portfolio.assert_called_once_with(portfolio_mock)
+
+    def test_import_deposits_csv(self):
+        """POST /deposit/import should accept a csv body"""
+        portfolio_mock = Mock(spec=Portfolio)
+        controller.repo.get_portfolio.return_value = portfolio_mock
+        controller.repo.valid_session_key.return_value = True
+
+        result = self.app.post("/deposit/import",
+            headers={"api-key": "123"},
+            data="ticker,date,amount\nT1,2016-01-01,1000\n",
+            content_type="text/csv")
+        self.assertEquals(result.status_code, 204)
+        portfolio_mock.deposit_many.assert_called_once_with([{"ticker": "T1", "date": "2016-01-01", "amount": 1000}])
+
+    def test_metrics(self):
+        """GET /metrics should return prometheus metrics without a session key"""
+        self.app.get("/userinfo")
+        result = self.app.get("/metrics")
+        self.assertEquals(result.status_code, 200)
+        self.assertIn('http_requests_total{endpoint="userinfo",method="GET",status="401"}', result.get_data())
+        controller.repo.valid_session_key.assert_not_called()
+
+    def test_profile(self):
+        """a request with an allow-listed X-Profile key should be profiled and its report served"""
+        profiler = Mock(spec=RequestProfiler)
+        profiler.allowed.return_value = True
+        profiler.finish.return_value = "abc"
+        profiler.report.return_value = "report"
+        controller.repo.get_user_info.return_value = {"user_id": 1}
+        controller.repo.valid_session_key.return_value = True
+
+        with patch.object(controller, "profiler", profiler):
+            result = self.app.get("/userinfo", headers={"api-key": "123", "X-Profile": "secret"})
+            self.assertEquals(result.headers["X-Profile-Id"], "abc")
+            profiler.start.assert_called_once()
+
+            result = self.app.get("/profile/abc", headers={"X-Profile": "secret"})
+            self.assertEquals(result.status_code, 200)
+            self.assertEquals(result.get_data(), "report")
+
+            profiler.allowed.return_value = False
+            result = self.app.get("/profile/abc")
+            self.assertEquals(result.status_code, 403)
+
+    def test_unprofiled_request(self):
+        """requests without a profiling key should not be profiled"""
+        controller.repo.get_user_info.return_value = {"user_id": 1}
+        controller.repo.valid_session_key.return_value = True
+        result = self.app.get("/userinfo", headers={"api-key": "123", "X-Profile": "secret"})
+        self.assertNotIn("X-Profile-Id", result.headers)
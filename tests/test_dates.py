@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+import unittest
+from mock import patch
+from datetime import date, datetime
+
+from components import dates
+from components.error import InvalidDate
+
+class TestDates(unittest.TestCase):
+    def test_parse(self):
+        """parse should read both fixed width formats"""
+        self.assertEquals(dates.parse("2016-01-31"), date(2016, 1, 31))
+        self.assertEquals(dates.parse(u"2016-12-01"), date(2016, 12, 1))
+        self.assertEquals(dates.parse("20160131", dates.COMPACT), date(2016, 1, 31))
+        self.assertEquals(type(dates.parse("2016-01-31")), date)
+
+    def test_parse_falls_back_to_strptime(self):
+        """parse should accept anything strptime accepts"""
+        self.assertEquals(dates.parse("2016-1-1"), date(2016, 1, 1))
+        self.assertEquals(dates.parse("01.02.2016", "%d.%m.%Y"), date(2016, 2, 1))
+
+    def test_parse_raises_value_error(self):
+        """parse should raise ValueError for invalid dates"""
+        for text, format in [("2016-02-30", dates.ISO), ("2016-13-01", dates.ISO), ("20160101", dates.ISO),
+                             ("2016-01-01", dates.COMPACT), ("", dates.ISO)]:
+            with self.assertRaises(ValueError):
+                dates.parse(text, format)
+
+    @patch.object(dates, "_max_parsed", 2)
+    @patch.object(dates, "_parsed", {dates.ISO: {}, dates.COMPACT: {}})
+    def test_parse_memoizes(self):
+        """parse should reuse recently parsed dates and bound how many are kept"""
+        first = dates.parse("2016-01-01")
+        self.assertIs(dates.parse("2016-01-01"), first)
+
+        dates.parse("2016-01-02")
+        dates.parse("2016-01-03")
+        self.assertEquals(len(dates._parsed[dates.ISO]), 1)
+
+    def test_to_date(self):
+        """to_date should parse strings and pass dates through"""
+        self.assertEquals(dates.to_date("2016-01-01"), date(2016, 1, 1))
+        day = datetime(2016, 1, 1, 12)
+        self.assertIs(dates.to_date(day), day)
+        with self.assertRaises(InvalidDate):
+            dates.to_date(20160101)
+
+    def test_ordinal(self):
+        """ordinals of consecutive days should be consecutive integers"""
+        self.assertEquals(dates.ordinal(date(2016, 3, 1)) - dates.ordinal(date(2016, 2, 28)), 2)
+        self.assertEquals(dates.from_ordinal(dates.ordinal(date(2016, 2, 29))), date(2016, 2, 29))
+
+if __name__ == "__main__":
+    unittest.main()
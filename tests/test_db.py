@@ -9,6 +9,7 @@ from datetime import date, datetime, timedelta
 
 from components.settings import db_credentials
 from components.db import Database
+from components.Portfolio import Portfolio
 
 class TestDatabase(unittest.TestCase):
     def setUp(self):
@@ -33,6 +34,36 @@ class TestDatabase(unittest.TestCase):
 
         self.delete_all_from_table(self.db.session_table)
 
+    def test_get_session_expired(self):
+        """get_session should return None once the session is older than the session lifetime"""
+        uuid = self.db.new_session(1)
+        self.db._execute_query("UPDATE {} SET created = %s WHERE uuid = %s".format(self.db.session_table),
+                               (datetime.now() - timedelta(hours=2), uuid))
+
+        self.db.session_lifetime = 60 * 60
+        self.assertIsNone(self.db.get_session(uuid))
+
+        self.db.session_lifetime = None
+        self.assertIsNotNone(self.db.get_session(uuid))
+
+        self.delete_all_from_table(self.db.session_table)
+
+    def test_delete_expired_sessions(self):
+        """delete_expired_sessions deletes at most batch_size expired sessions"""
+        self.db.session_lifetime = 60 * 60
+        for user_id in range(1, 4):
+            uuid = self.db.new_session(user_id)
+            self.db._execute_query("UPDATE {} SET created = %s WHERE uuid = %s".format(self.db.session_table),
+                                   (datetime.now() - timedelta(hours=2), uuid))
+        valid = self.db.new_session(4)
+
+        self.assertEquals(self.db.delete_expired_sessions(2), 2)
+        self.assertEquals(self.db.delete_expired_sessions(2), 1)
+        self.assertEquals(self.db.delete_expired_sessions(2), 0)
+        self.assertIsNotNone(self.db.get_session(valid))
+
+        self.delete_all_from_table(self.db.session_table)
+
     def test_delete_sessions_for_user(self):
         """delete_sessions_for_user deletes all sessions for a user"""
         user_id = 1
@@ -83,6 +114,87 @@ class TestDatabase(unittest.TestCase):
 
         self.delete_all_from_table(self.db.table)
 
+    def test_iter_portfolios(self):
+        """iter_portfolios should yield the portfolio of every user"""
+        user_ids = [self.db.create_user({"id": str(i)}) for i in range(3)]
+        self.db.save_portfolio(json.dumps([{"ticker": "T1", "name": "Ticker 1", "deposits": []}]), user_ids[0])
+
+        portfolios = dict(self.db.iter_portfolios())
+        self.assertEquals(sorted(portfolios.keys()), sorted(user_ids))
+        self.assertEquals(portfolios[user_ids[0]][0]["ticker"], "T1")
+        self.assertEquals(portfolios[user_ids[1]], [])
+
+        self.delete_all_from_table(self.db.table)
+
+    def test_portfolio_version(self):
+        """save_portfolio should bump the version get_portfolio_version returns for a session"""
+        user_id = self.db.create_user({"id": "1"})
+        session = self.db.new_session(user_id)
+        self.assertEquals(tuple(self.db.get_portfolio_version(session)), (user_id, 0))
+        self.assertIsNone(self.db.get_portfolio_version("jklsdfjkldsf"))
+
+        self.assertEquals(self.db.save_portfolio(json.dumps([{"ticker": "T1", "name": "Ticker 1", "deposits": []}]), user_id), 1)
+        self.assertEquals(tuple(self.db.get_portfolio_version(session)), (user_id, 1))
+        version, portfolio = self.db.get_versioned_portfolio(user_id)
+        self.assertEquals(version, 1)
+        self.assertEquals(portfolio[0]["ticker"], "T1")
+
+        self.delete_all_from_table(self.db.table)
+        self.delete_all_from_table(self.db.session_table)
+
+    def test_portfolio_changes(self):
+        """save_portfolio should log the earliest changed date with the new version"""
+        user_id = self.db.create_user({"id": "1"})
+        self.db.save_portfolio("[]", user_id, date(2016, 3, 1))
+        self.db.save_portfolio("[]", user_id)
+        self.db.save_portfolio("[]", user_id, date(2016, 2, 1))
+
+        self.assertEquals([tuple(row) for row in self.db.get_portfolio_changes(user_id, 0)],
+                          [(1, date(2016, 3, 1)), (3, date(2016, 2, 1))])
+        self.assertEquals([tuple(row) for row in self.db.get_portfolio_changes(user_id, 1)], [(3, date(2016, 2, 1))])
+
+        self.delete_all_from_table(self.db.table)
+        self.delete_all_from_table(self.db.change_table)
+
+    def test_portfolio_changes_add_fond(self):
+        """a new fond should leave no change row, so the versions before it can not be synced from"""
+        user_id = self.db.create_user({"id": "1"})
+        portfolio = Portfolio(user_id, {})
+        portfolio.add_fond("T1", "Ticker 1")
+        portfolio.deposit("T1", "2016-01-01", 100)
+        version = self.db.save_portfolio(portfolio.to_json(), user_id, portfolio.changed_from())
+
+        self.assertEquals(version, 1)
+        self.assertEquals(list(self.db.get_portfolio_changes(user_id, 0)), [])
+
+        self.delete_all_from_table(self.db.table)
+        self.delete_all_from_table(self.db.change_table)
+
+    def test_materialized_summary(self):
+        """save_materialized_summary should store one summary per user, replacing the previous one"""
+        self.assertIsNone(self.db.get_materialized_summary(1))
+
+        self.db.save_materialized_summary(1, "v1", "[1]")
+        self.db.save_materialized_summary(2, "v1", "[2]")
+        self.db.save_materialized_summary(1, "v2", "[3]")
+        self.assertEquals(tuple(self.db.get_materialized_summary(1)), ("v2", "[3]"))
+        self.assertEquals(tuple(self.db.get_materialized_summary(2)), ("v1", "[2]"))
+
+        self.delete_all_from_table(self.db.summary_table)
+
+    def test_tickers(self):
+        """save_tickers should insert new tickers and update known ones"""
+        self.assertEquals(self.db.get_tickers(), [])
+
+        self.db.save_tickers([("T2", "Ticker 2", date(2016, 1, 1)), ("T1", "Ticker 1", None)])
+        self.db.save_tickers([("T1", "Ticker one", date(2016, 1, 2))])
+        self.assertEquals([tuple(row) for row in self.db.get_tickers()], [
+            ("T1", "Ticker one", date(2016, 1, 2)),
+            ("T2", "Ticker 2", date(2016, 1, 1)),
+        ])
+
+        self.delete_all_from_table(self.db.ticker_table)
+
     def test_get_user_info_by_user_id_returns_none_on_error(self):
         """get_user_info_by_user_id should return None if user_id does not exists"""
         self.assertIsNone(self.db.get_user_info_by_user_id(999999999999))
@@ -108,6 +220,24 @@ class TestDatabase(unittest.TestCase):
 
         self.delete_all_from_table(self.db.table)
 
+    def test_initialize_database_creates_indexes(self):
+        """_initialize_database should add the google_id column and the lookup indexes, also when run twice"""
+        self.db._initialize_database()
+
+        self.assertTrue(self.db._has_column(self.db.table, "google_id"))
+        self.assertTrue(self.db._has_index(self.db.table, "idx_google_id"))
+        self.assertTrue(self.db._has_index(self.db.session_table, "idx_user_id"))
+
+    def test_get_user_info_by_google_id_numeric_id(self):
+        """get_user_info_by_google_id should find users whose google id is stored as a number"""
+        user_info = {"id": 123123123, "name": "Kari", "family_name": "Nordmann"}
+        user_id = self.db.create_user(user_info)
+
+        self.assertEquals(self.db.get_user_info_by_google_id(123123123), (user_id, user_info))
+        self.assertEquals(self.db.get_user_info_by_google_id("123123123"), (user_id, user_info))
+
+        self.delete_all_from_table(self.db.table)
+
     def test_get_user_info_by_google_id_return_none_on_error(self):
         """get_user_info_by_google_id should return None if user does not exist"""
         self.assertIsNone(self.db.get_user_info_by_google_id("123123"))
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+
+import unittest
+
+from components.deadline import Deadline
+
+class TestDeadline(unittest.TestCase):
+    def test_remaining(self):
+        """remaining should count down to zero and the deadline expire"""
+        now = [100.0]
+        deadline = Deadline(2, clock=lambda: now[0])
+        self.assertEquals(deadline.remaining(), 2)
+        self.assertFalse(deadline.expired)
+
+        now[0] = 101.5
+        self.assertEquals(deadline.remaining(), 0.5)
+
+        now[0] = 103
+        self.assertEquals(deadline.remaining(), 0)
+        self.assertTrue(deadline.expired)
+
+if __name__ == "__main__":
+    unittest.main()
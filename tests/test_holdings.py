@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import unittest
+import json
+from mock import PropertyMock, MagicMock, patch, Mock
+from datetime import date
+
+from components.holdings import Holdings
+from components.Fond import Fond
+from components.Portfolio import Portfolio
+
+class TestHoldings(unittest.TestCase):
+    def setUp(self):
+        self.documents = [
+            {"ticker": "T1", "name": "Ticker 1", "deposits": [{"date": "2016-01-01", "amount": 100}]},
+            {"ticker": "T2", "name": "Ticker 2", "deposits": [{"date": "2016-01-02", "amount": 200}]},
+        ]
+
+    @patch('components.holdings.Fond')
+    def test_lazy(self, fond_mock):
+        """fonds should only be parsed when they are accessed"""
+        holdings = Holdings(documents=self.documents)
+        self.assertTrue("T1" in holdings)
+        self.assertEquals(list(holdings), ["T1", "T2"])
+        self.assertEquals(len(holdings), 2)
+        fond_mock.assert_not_called()
+
+        holdings["T2"]
+        holdings["T2"]
+        fond_mock.assert_called_once_with(**self.documents[1])
+        self.assertEquals(holdings.hydrated(), ["T2"])
+
+    def test_documents(self):
+        """documents should return untouched fonds as stored and hydrated fonds as Fond objects"""
+        holdings = Holdings(documents=self.documents)
+        holdings["T1"].deposit(300, date(2016, 1, 3))
+
+        documents = holdings.documents()
+        self.assertIsInstance(documents[0], Fond)
+        self.assertIs(documents[1], self.documents[1])
+
+        saved = json.loads(Portfolio(1, holdings).to_json())
+        self.assertEquals(saved[0]["deposits"], [{"date": "2016-01-01", "amount": 100}, {"date": "2016-01-03", "amount": 300}])
+        self.assertEquals(saved[1], self.documents[1])
+
+    def test_set_and_delete(self):
+        """setting and deleting fonds should keep the order of the holdings"""
+        holdings = Holdings(documents=self.documents)
+        holdings["T3"] = Fond("T3", "Ticker 3")
+        holdings["T1"] = Fond("T1", "Ticker 1 renamed")
+        self.assertEquals(list(holdings), ["T1", "T2", "T3"])
+        self.assertEquals(holdings["T1"].name, "Ticker 1 renamed")
+
+        del holdings["T2"]
+        self.assertEquals(list(holdings), ["T1", "T3"])
+        with self.assertRaises(KeyError):
+            holdings["T2"]
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import unittest
+from StringIO import StringIO
+from datetime import date, datetime, time
+
+from components.market_calendar import MarketCalendar, read_holidays, parse_time, load_calendar
+
+class TestMarketCalendar(unittest.TestCase):
+    def setUp(self):
+        self.calendar = MarketCalendar([date(2016, 3, 24), date(2016, 3, 25), date(2016, 3, 28)])
+
+    def test_is_trading_day(self):
+        """weekends and holidays should not be trading days"""
+        self.assertTrue(self.calendar.is_trading_day(date(2016, 3, 23)))
+        self.assertFalse(self.calendar.is_trading_day(date(2016, 3, 24)))
+        self.assertFalse(self.calendar.is_trading_day(date(2016, 3, 26)))
+
+    def test_next_publication(self):
+        """next_publication should return the publication time of the next trading day"""
+        self.assertEquals(self.calendar.next_publication(datetime(2016, 3, 22, 12)), datetime(2016, 3, 22, 18))
+        self.assertEquals(self.calendar.next_publication(datetime(2016, 3, 22, 18)), datetime(2016, 3, 23, 18))
+        self.assertEquals(self.calendar.next_publication(datetime(2016, 3, 23, 19)), datetime(2016, 3, 29, 18))
+
+    def test_publication_time(self):
+        """next_publication should follow the configured publication time"""
+        calendar = MarketCalendar(publication_time=time(16, 30))
+        self.assertEquals(calendar.next_publication(datetime(2016, 3, 22, 17)), datetime(2016, 3, 23, 16, 30))
+
+    def test_read_holidays(self):
+        """read_holidays should read one date per line and skip comments"""
+        holidays = read_holidays(StringIO("# easter\n2016-03-24\n2016-03-25 # good friday\n\n"))
+        self.assertEquals(holidays, [date(2016, 3, 24), date(2016, 3, 25)])
+
+    def test_parse_time(self):
+        """parse_time should read HH:MM"""
+        self.assertEquals(parse_time("18:00"), time(18, 0))
+        self.assertEquals(parse_time("9:05"), time(9, 5))
+
+    def test_load_calendar_without_holidays(self):
+        """load_calendar should only know weekends without a holiday file"""
+        calendar = load_calendar("", "18:00")
+        self.assertEquals(calendar.holidays, set())
+        self.assertEquals(calendar.publication_time, time(18, 0))
+
+if __name__ == "__main__":
+    unittest.main()
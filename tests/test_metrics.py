@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+from threading import Thread
+from mock import PropertyMock, MagicMock, patch, Mock
+
+from components import metrics
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_counter(self):
+        """counter should count per label set"""
+        counter = self.registry.counter("requests_total", "Requests")
+        counter.inc(status=200)
+        counter.inc(2, status=200)
+        counter.inc(status=500)
+
+        self.assertEquals(counter.samples(), [
+            ("requests_total", (("status", 200),), 3),
+            ("requests_total", (("status", 500),), 1),
+        ])
+
+    def test_histogram(self):
+        """histogram should count observations in cumulative buckets"""
+        histogram = self.registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        self.assertEquals(histogram.samples(), [
+            ("latency_seconds_bucket", (("le", "0.1"),), 1),
+            ("latency_seconds_bucket", (("le", "1"),), 2),
+            ("latency_seconds_bucket", (("le", "+Inf"),), 3),
+            ("latency_seconds_sum", (), 5.55),
+            ("latency_seconds_count", (), 3),
+        ])
+
+    def test_render(self):
+        """render should return the metrics in the prometheus text format"""
+        self.registry.counter("requests_total", "Requests").inc(endpoint="summary")
+        self.assertEquals(self.registry.render(),
+            '# HELP requests_total Requests\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{endpoint="summary"} 1\n')
+
+    def test_registry_returns_existing_metric(self):
+        """counter and histogram should return the already registered metric for a name"""
+        self.assertIs(self.registry.counter("c"), self.registry.counter("c"))
+        self.assertIs(self.registry.histogram("h"), self.registry.histogram("h"))
+
+    def test_load(self):
+        """load should add the values of a dumped registry"""
+        self.registry.counter("requests_total", "Requests").inc(status=200)
+        self.registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1)).observe(0.5)
+
+        merged = metrics.Registry()
+        merged.load(self.registry.dump())
+        merged.load(self.registry.dump())
+        self.assertEquals(merged.counter("requests_total").samples(), [("requests_total", (("status", 200),), 2)])
+        self.assertEquals(merged.histogram("latency_seconds").values[()], {"buckets": [0, 2], "sum": 1.0, "count": 2})
+
+    def test_shared_registry(self):
+        """SharedRegistry should report the sum of the registries writing to its directory"""
+        directory = tempfile.mkdtemp()
+        try:
+            other = metrics.Registry()
+            other.counter("requests_total", "Requests").inc(3, status=200)
+            metrics.SharedRegistry(directory, other).write()
+
+            self.registry.counter("requests_total", "Requests").inc(status=200)
+            shared = metrics.SharedRegistry(directory, self.registry)
+            self.assertIn('requests_total{status="200"} 4\n', shared.render())
+
+            self.registry.counter("requests_total").inc(status=200)
+            self.assertIn('requests_total{status="200"} 5\n', shared.render())
+
+            metrics.clear_directory(directory)
+            self.assertEquals(os.listdir(directory), [])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_shared_registry_concurrent_writes(self):
+        """SharedRegistry should let the writer thread and requests write the snapshot at the same time"""
+        directory = tempfile.mkdtemp()
+        try:
+            self.registry.counter("requests_total", "Requests").inc(status=200)
+            shared = metrics.SharedRegistry(directory, self.registry)
+            errors = []
+            def write():
+                try:
+                    for i in range(50):
+                        shared.write()
+                except Exception as e:
+                    errors.append(e)
+            threads = [Thread(target=write) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEquals(errors, [])
+            self.assertEquals(os.listdir(directory), [os.path.basename(shared.filename)])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_timed(self):
+        """timed should observe the run time of the decorated function"""
+        @metrics.timed("test_timed_seconds")
+        def function(value):
+            return value
+
+        self.assertEquals(function(42), 42)
+        histogram = metrics.registry.histogram("test_timed_seconds")
+        self.assertEquals(histogram.values[(("operation", "function"),)]["count"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
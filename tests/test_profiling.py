@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import unittest
+import shutil
+import tempfile
+from mock import PropertyMock, MagicMock, patch, Mock
+
+from components.profiling import RequestProfiler
+
+class Request:
+    def __init__(self, headers):
+        self.headers = headers
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.profiler = RequestProfiler(True, ["secret"], self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_allowed(self):
+        """allowed should only accept requests carrying an allow-listed key when profiling is enabled"""
+        self.assertTrue(self.profiler.allowed(Request({"X-Profile": "secret"})))
+        self.assertFalse(self.profiler.allowed(Request({"X-Profile": "guess"})))
+        self.assertFalse(self.profiler.allowed(Request({})))
+
+        profiler = RequestProfiler(False, ["secret"], self.directory)
+        self.assertFalse(profiler.allowed(Request({"X-Profile": "secret"})))
+
+    def test_finish(self):
+        """finish should store a report with the call stacks that can be read back by id"""
+        def slow_function():
+            return sum(range(10000))
+
+        profile = self.profiler.start()
+        slow_function()
+        profile_id = self.profiler.finish(profile, "GET /summary")
+
+        report = self.profiler.report(profile_id)
+        self.assertIn("GET /summary", report)
+        self.assertIn("slow_function", report)
+
+    def test_report_unknown_id(self):
+        """report should return None for unknown or malformed ids"""
+        self.assertIsNone(self.profiler.report("0" * 32))
+        self.assertIsNone(self.profiler.report("../../etc/passwd"))
+
+if __name__ == "__main__":
+    unittest.main()
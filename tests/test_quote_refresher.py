@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+import unittest
+import threading
+from mock import PropertyMock, MagicMock, patch, Mock
+
+from components import quote_refresher
+from components.quote_refresher import CircuitBreaker, QuoteRefresher
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000
+        self.breaker = CircuitBreaker(2, 60, clock=lambda: self.now)
+
+    def test_opens_after_consecutive_failures(self):
+        """the breaker should open after failure_threshold consecutive failures"""
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.open)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open(self):
+        """the breaker should let a single trial through after the reset timeout"""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        self.now += 61
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+
+        self.now += 61
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertFalse(self.breaker.open)
+        self.assertTrue(self.breaker.allow())
+
+    @patch.object(quote_refresher, "_breakers", {})
+    def test_circuit_breaker_per_source(self):
+        """circuit_breaker should share one breaker per host"""
+        breaker = quote_refresher.circuit_breaker("http://quotes/T1.FOND")
+        self.assertIs(quote_refresher.circuit_breaker("http://quotes/T2.FOND"), breaker)
+        self.assertIsNot(quote_refresher.circuit_breaker("http://other/T1.FOND"), breaker)
+
+class TestQuoteRefresher(unittest.TestCase):
+    def test_schedule(self):
+        """schedule should run refreshes in the background, one pending per ticker"""
+        refresher = QuoteRefresher()
+        release = threading.Event()
+        refresh = Mock(side_effect=lambda: release.wait(5))
+
+        self.assertTrue(refresher.schedule("T1", refresh))
+        self.assertFalse(refresher.schedule("T1", refresh))
+        self.assertTrue(refresher.schedule("T2", refresh))
+
+        refresher.start()
+        release.set()
+        refresher.queue.join()
+        self.assertEquals(refresh.call_count, 2)
+        self.assertTrue(refresher.schedule("T1", refresh))
+
+    def test_failed_refresh(self):
+        """a failing refresh should not stop the refresher"""
+        refresher = QuoteRefresher()
+        refresher.start()
+        refresher.schedule("T1", Mock(side_effect=IOError("down")))
+        refresh = Mock()
+        refresher.schedule("T2", refresh)
+        refresher.queue.join()
+        refresh.assert_called_once_with()
+        self.assertEquals(refresher.pending, set())
+
+    @patch.object(quote_refresher, "_refresher", None)
+    def test_schedule_starts_refresher(self):
+        """the module level schedule should start a refresher when none is running"""
+        refresh = Mock()
+        self.assertTrue(quote_refresher.schedule("T1", refresh))
+        quote_refresher._refresher.queue.join()
+        refresh.assert_called_once_with()
+        self.assertTrue(quote_refresher._refresher.is_alive())
+
+if __name__ == "__main__":
+    unittest.main()
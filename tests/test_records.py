@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import unittest
+import pickle
+from datetime import date
+
+from components.records import Deposit, DevelopmentRow
+
+class TestRecords(unittest.TestCase):
+    def test_read_like_dict(self):
+        """records should support the dict reads the components rely on"""
+        deposit = Deposit(date(2016, 1, 1), 100)
+        self.assertEquals(deposit["date"], date(2016, 1, 1))
+        self.assertEquals(deposit.amount, 100)
+        self.assertIn("amount", deposit)
+        self.assertEquals(deposit.get("garbage", 1), 1)
+        with self.assertRaises(KeyError):
+            deposit["garbage"]
+
+    def test_immutable(self):
+        """records should not allow fields to be changed or added"""
+        deposit = Deposit(date(2016, 1, 1), 100)
+        with self.assertRaises(AttributeError):
+            deposit.amount = 10
+        with self.assertRaises(AttributeError):
+            deposit.garbage = 10
+        self.assertEquals(deposit.replace(amount=10), Deposit(date(2016, 1, 1), 10))
+
+    def test_equality(self):
+        """records should compare equal to records and dicts with the same values"""
+        self.assertEquals(Deposit(date(2016, 1, 1), 100), Deposit(date=date(2016, 1, 1), amount=100))
+        self.assertEquals(Deposit(date(2016, 1, 1), 100), {"date": date(2016, 1, 1), "amount": 100})
+        self.assertNotEquals(Deposit(date(2016, 1, 1), 100), {"date": date(2016, 1, 1), "amount": 10})
+
+    def test_to_json(self):
+        """to_json should leave out optional fields that are not set"""
+        row = DevelopmentRow(date(2016, 1, 1), 100.0, 100)
+        self.assertEquals(row.to_json(), {"date": date(2016, 1, 1), "value": 100.0, "deposit": 100})
+        self.assertEquals(row.replace(quote={"close": 1}).to_json()["quote"], {"close": 1})
+
+    def test_pickle(self):
+        """records should survive a pickle round trip"""
+        row = DevelopmentRow(date(2016, 1, 1), 100.0, 100, {"close": 1})
+        self.assertEquals(pickle.loads(pickle.dumps(row, pickle.HIGHEST_PROTOCOL)), row)
+
+if __name__ == "__main__":
+    unittest.main()
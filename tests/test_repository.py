@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 import unittest
+import threading
 from mock import PropertyMock, MagicMock, patch, Mock
 from random import randint, uniform
 from datetime import date, datetime, timedelta
@@ -16,12 +17,117 @@ class TestFond(unittest.TestCase):
         repo = Repository()
 
         db_instance = db_mock.return_value
-        db_instance.get_portfolio.return_value = None
+        db_instance.get_portfolio_version.return_value = None
         self.assertIsNone(repo.get_portfolio("123"))
 
-        db_instance.get_portfolio.return_value = (1, [])
+        db_instance.get_portfolio_version.return_value = (1, 0)
+        db_instance.get_versioned_portfolio.return_value = (0, [])
         self.assertIsInstance(repo.get_portfolio("123"), Portfolio)
 
+    @patch('components.repository.Database')
+    def test_get_portfolio_cached(self, db_mock):
+        """get_portfolio should only read the portfolio again when its version has changed"""
+        repo = Repository()
+        db_instance = db_mock.return_value
+        db_instance.get_portfolio_version.return_value = (1, 3)
+        db_instance.get_versioned_portfolio.return_value = (3, [{"ticker": "T1", "name": "Ticker 1", "deposits": []}])
+
+        self.assertEquals(list(repo.get_portfolio("123").portfolio), ["T1"])
+        self.assertEquals(list(repo.get_portfolio("123").portfolio), ["T1"])
+        db_instance.get_versioned_portfolio.assert_called_once_with(1)
+
+        db_instance.get_portfolio_version.return_value = (1, 4)
+        db_instance.get_versioned_portfolio.return_value = (4, [])
+        self.assertEquals(list(repo.get_portfolio("123").portfolio), [])
+        self.assertEquals(db_instance.get_versioned_portfolio.call_count, 2)
+
+    @patch('components.repository.Database')
+    def test_changed_since(self, db_mock):
+        """changed_since should return the earliest date changed after a version, if every change was logged"""
+        repo = Repository()
+        db_instance = db_mock.return_value
+        db_instance.get_portfolio_changes.return_value = [(4, date(2016, 3, 1)), (5, date(2016, 2, 1))]
+        self.assertEquals(repo.changed_since(1, 3, 5), date(2016, 2, 1))
+        db_instance.get_portfolio_changes.assert_called_once_with(1, 3)
+
+        self.assertIsNone(repo.changed_since(1, 2, 5))
+        self.assertIsNone(repo.changed_since(1, 6, 5))
+
+        db_instance.get_portfolio_changes.return_value = []
+        self.assertEquals(repo.changed_since(1, 5, 5), date.max)
+
+    @patch('components.repository.Database')
+    def test_put_portfolio_writes_through(self, db_mock):
+        """put_portfolio should cache the saved portfolio under its new version"""
+        repo = Repository()
+        db_instance = db_mock.return_value
+        db_instance.save_portfolio.return_value = 5
+        db_instance.get_portfolio_version.return_value = (1, 5)
+
+        portfolio = Portfolio(1, {})
+        portfolio.add_fond("T1", "Ticker 1")
+        portfolio.deposit("T1", "2016-01-01", 100)
+        repo.put_portfolio(portfolio)
+        self.assertEquals(portfolio.revision, 5)
+        db_instance.save_portfolio.assert_called_once_with(portfolio.to_json(), 1, None)
+
+        fond = repo.get_portfolio("123").portfolio["T1"]
+        self.assertEquals(fond.deposits, [{"date": date(2016, 1, 1), "amount": 100}])
+        db_instance.get_versioned_portfolio.assert_not_called()
+
+    @patch('components.holdings.Fond')
+    @patch('components.repository.Database')
+    def test_get_portfolio_is_lazy(self, db_mock, fond_mock):
+        """get_portfolio should not parse any fond before it is used"""
+        repo = Repository()
+        db_mock.return_value.get_portfolio_version.return_value = (1, 0)
+        db_mock.return_value.get_versioned_portfolio.return_value = (0, [{"ticker": "T1", "name": "Ticker 1", "deposits": []}])
+
+        portfolio = repo.get_portfolio("123")
+        self.assertIn("T1", portfolio.portfolio)
+        fond_mock.assert_not_called()
+
+    @patch('components.repository.Database')
+    def test_iter_portfolios(self, db_mock):
+        """iter_portfolios should stream portfolios on a connection of its own"""
+        repo = Repository()
+        db_mock.return_value.iter_portfolios.return_value = iter([(1, []), (2, [])])
+
+        self.assertEquals(list(repo.iter_portfolios()), [(1, []), (2, [])])
+        self.assertEquals(db_mock.call_count, 2)
+        db_mock.return_value.close.assert_called_once_with()
+
+    @patch('components.repository.Database')
+    def test_get_materialized_summary(self, db_mock):
+        """get_materialized_summary should only return a summary stored for the given version"""
+        repo = Repository()
+        db_mock.return_value.get_materialized_summary.return_value = ("v1", "[]")
+
+        self.assertEquals(repo.get_materialized_summary(1, "v1"), "[]")
+        self.assertIsNone(repo.get_materialized_summary(1, "v2"))
+
+        db_mock.return_value.get_materialized_summary.return_value = None
+        self.assertIsNone(repo.get_materialized_summary(1, "v1"))
+
+    @patch('components.repository.Database')
+    def test_ticker_catalogue(self, db_mock):
+        """ticker_catalogue should be loaded once and reloaded after tickers are loaded or it expires"""
+        repo = Repository()
+        db_mock.return_value.get_tickers.return_value = [("T1", "Ticker 1", None)]
+
+        catalogue = repo.ticker_catalogue()
+        self.assertIn("T1", catalogue)
+        self.assertIs(repo.ticker_catalogue(), catalogue)
+
+        db_mock.return_value.save_tickers.return_value = 1
+        self.assertEquals(repo.load_tickers([("T2", "Ticker 2", None)]), 1)
+        self.assertIsNot(repo.ticker_catalogue(), catalogue)
+
+        catalogue = repo.ticker_catalogue()
+        catalogue.loaded_at -= 24 * 60 * 60
+        self.assertIsNot(repo.ticker_catalogue(), catalogue)
+        self.assertEquals(db_mock.return_value.get_tickers.call_count, 3)
+
     @patch('components.repository.Database')
     def test_put_portfolio_raises_exception(self, db_mock):
         """put_portfolio saves portfolio to db"""
@@ -112,3 +218,35 @@ class TestFond(unittest.TestCase):
 
         db_instance.get_session.return_value = None
         self.assertFalse(repo.valid_session_key("1234"))
+
+    @patch('components.repository.Database')
+    def test_hot_tickers(self, db_mock):
+        """hot_tickers returns the tickers held by most users"""
+        repo = Repository()
+        db_instance = db_mock.return_value
+        db_instance.iter_portfolios.return_value = iter([
+            (1, [{"ticker": "T1"}, {"ticker": "T2"}]),
+            (2, [{"ticker": "T2"}]),
+            (3, [{"ticker": "T2"}, {"ticker": "T3"}, {"ticker": "T1"}]),
+        ])
+
+        self.assertEquals(repo.hot_tickers(2), ["T2", "T1"])
+
+    @patch('components.repository.Database')
+    def test_connection_per_thread(self, db_mock):
+        """every thread should get its own connection, and close should close them all"""
+        first, second = Mock(), Mock()
+        db_mock.side_effect = [first, second]
+        repo = Repository()
+
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(repo.db))
+        thread.start()
+        thread.join()
+
+        self.assertIs(repo.db, first)
+        self.assertEquals(connections, [second])
+
+        repo.close()
+        first.close.assert_called_once()
+        second.close.assert_called_once()
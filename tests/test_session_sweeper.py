@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+from mock import PropertyMock, MagicMock, patch, Mock
+
+from components.session_sweeper import SessionSweeper
+
+class TestSessionSweeper(unittest.TestCase):
+    def test_sweep(self):
+        """sweep should delete expired sessions in batches until a batch comes back short"""
+        db = Mock()
+        db.delete_expired_sessions.side_effect = [10, 10, 3]
+        sweeper = SessionSweeper(lambda: db, 60, 10)
+
+        self.assertEquals(sweeper.sweep(db), 23)
+        self.assertEquals(db.delete_expired_sessions.call_count, 3)
+        db.delete_expired_sessions.assert_called_with(10)
+
+    def test_sweep_stops(self):
+        """sweep should not delete anything once the sweeper is stopped"""
+        db = Mock()
+        sweeper = SessionSweeper(lambda: db, 60, 10)
+        sweeper.stop()
+
+        self.assertEquals(sweeper.sweep(db), 0)
+        db.delete_expired_sessions.assert_not_called()
+
+    def test_run(self):
+        """run should sweep with its own connection and close it when stopped"""
+        db = Mock()
+        db.delete_expired_sessions.return_value = 0
+        sweeper = SessionSweeper(lambda: db, 60, 10)
+        db.delete_expired_sessions.side_effect = lambda batch_size: sweeper.stop() or 0
+
+        sweeper.run()
+        db.delete_expired_sessions.assert_called_once_with(10)
+        db.close.assert_called_once()
+
+    def test_acquire(self):
+        """acquire should let one sweeper sweep while it holds the lock file"""
+        directory = tempfile.mkdtemp()
+        try:
+            lock_filename = os.path.join(directory, "sweeper.lock")
+            first = SessionSweeper(Mock, 60, 10, lock_filename)
+            second = SessionSweeper(Mock, 60, 10, lock_filename)
+
+            self.assertTrue(first.acquire())
+            self.assertTrue(first.acquire())
+            self.assertFalse(second.acquire())
+
+            first.lock_file.close()
+            self.assertTrue(second.acquire())
+            second.lock_file.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_run_without_lock(self):
+        """run should not sweep while another sweeper holds the lock file"""
+        db = Mock()
+        sweeper = SessionSweeper(lambda: db, 60, 10, "sweeper.lock")
+        sweeper.stopped.wait = lambda interval: sweeper.stop()
+
+        with patch.object(sweeper, "acquire", return_value=False):
+            sweeper.run()
+        db.delete_expired_sessions.assert_not_called()
+        db.close.assert_called_once()
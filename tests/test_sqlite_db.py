@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+import unittest
+
+from components.sqlite_db import SQLiteDatabase
+from components.storage import Storage
+from tests import test_db
+
+class TestSQLiteDatabase(test_db.TestDatabase):
+    """Runs the Database test suite against the SQLite backend"""
+
+    def setUp(self):
+        self.db = SQLiteDatabase(":memory:")
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_implements_storage(self):
+        """SQLiteDatabase should implement every Storage operation"""
+        self.assertIsInstance(self.db, Storage)
+        self.assertEquals(type(self.db).__abstractmethods__, frozenset())
+
+    def test_incomplete_backend(self):
+        """a backend missing a Storage operation should fail when it is created"""
+        class IncompleteStorage(Storage):
+            def get_portfolio(self, session_token):
+                return None
+
+        with self.assertRaises(TypeError):
+            IncompleteStorage()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+import unittest
+from mock import patch
+from datetime import date, timedelta
+
+from components.unit_index import UnitIndex
+
+class TestUnitIndex(unittest.TestCase):
+    def generate_quotes(self, closes):
+        return [{"quote_date": date(2016, 1, 1) + timedelta(days=i), "close": close} for i, close in enumerate(closes)]
+
+    def test_values(self):
+        """the index should follow the growth of the closing price"""
+        index = UnitIndex(self.generate_quotes([100, 110, 99, 198]))
+        self.assertEquals(len(index), 4)
+        self.assertEquals(index.values[0], 1.0)
+        self.assertAlmostEqual(index.values[1], 1.1)
+        self.assertAlmostEqual(index.values[2], 0.99)
+        self.assertAlmostEqual(index.values[3], 1.98)
+        self.assertEquals(index.position(date(2016, 1, 3)), 2)
+        self.assertEquals(index.position(date(2015, 1, 3)), None)
+
+    @patch.object(UnitIndex, "_registry", {})
+    def test_for_quotes(self):
+        """for_quotes should share the index of a ticker until its quotes are replaced"""
+        quotes = self.generate_quotes([100, 110])
+        index = UnitIndex.for_quotes("T1", quotes)
+        self.assertIs(UnitIndex.for_quotes("T1", quotes), index)
+        self.assertIsNot(UnitIndex.for_quotes("T2", quotes), index)
+
+        refreshed = UnitIndex.for_quotes("T1", self.generate_quotes([100, 110, 120]))
+        self.assertIsNot(refreshed, index)
+        self.assertEquals(len(refreshed), 3)
+
+if __name__ == "__main__":
+    unittest.main()
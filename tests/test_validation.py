@@ -3,6 +3,7 @@
 import unittest
 from mock import PropertyMock, MagicMock, patch, Mock
 from random import randint, uniform
+from StringIO import StringIO
 from datetime import date, datetime, timedelta
 
 from components import validation
@@ -82,3 +83,54 @@ class TestFond(unittest.TestCase):
                 "tickers": ["T1"]
             }))
         )
+
+    def test_validate_deposit_import(self):
+        """validate_deposit_import returns False if a deposit entry does not contain required fields"""
+        self.assertFalse(validation.validate_deposit_import(Request("POST", {})))
+        self.assertFalse(validation.validate_deposit_import(
+            Request("POST", {"deposits": [{"ticker": "T1", "amount": 100}]}))
+        )
+        self.assertFalse(validation.validate_deposit_import(
+            Request("POST", {"deposits": [{"ticker": "T1", "date": "2016-01-01", "amount": -1}]}))
+        )
+        self.assertTrue(validation.validate_deposit_import(
+            Request("POST", {"deposits": [{"ticker": "T1", "date": "2016-01-01", "amount": 100}]}))
+        )
+
+    def test_read_deposit_csv(self):
+        """read_deposit_csv parses ticker, date and amount from every row"""
+        csv = StringIO("ticker, date, amount\nT1,2016-01-01,100\nT2,2016-01-02,12.5\n")
+        self.assertEquals(validation.read_deposit_csv(csv), [
+            {"ticker": "T1", "date": "2016-01-01", "amount": 100},
+            {"ticker": "T2", "date": "2016-01-02", "amount": 12.5},
+        ])
+
+    def test_read_deposit_csv_raises_exception(self):
+        """read_deposit_csv raises an exception on a missing header or an invalid row"""
+        with self.assertRaises(InvalidUsage):
+            validation.read_deposit_csv(StringIO("T1,2016-01-01,100\n"))
+        with self.assertRaises(InvalidUsage):
+            validation.read_deposit_csv(StringIO("ticker,date,amount\nT1,2016-01-01,abc\n"))
+        with self.assertRaises(InvalidUsage):
+            validation.read_deposit_csv(StringIO("ticker,date,amount\n,2016-01-01,100\n"))
+
+    def test_read_since(self):
+        """read_since should parse a date or a revision:date token"""
+        self.assertIsNone(validation.read_since({}))
+        self.assertEquals(validation.read_since({"since": "2016-01-01"}), (None, date(2016, 1, 1)))
+        self.assertEquals(validation.read_since({"since": "12:2016-01-01"}), (12, date(2016, 1, 1)))
+
+        for since in ["yesterday", "x:2016-01-01", "12:2016-02-30"]:
+            with self.assertRaises(InvalidUsage):
+                validation.read_since({"since": since})
+
+    def test_read_date_range(self):
+        """read_date_range should parse optional start and end dates"""
+        self.assertEquals(validation.read_date_range({}), (None, None))
+        self.assertEquals(validation.read_date_range({"start": "2016-01-01", "end": ""}), (date(2016, 1, 1), None))
+        self.assertEquals(validation.read_date_range({"start": "2016-01-01", "end": "2016-02-01"}),
+                          (date(2016, 1, 1), date(2016, 2, 1)))
+
+        for args in [{"start": "yesterday"}, {"end": "2016-02-30"}, {"start": "2016-02-01", "end": "2016-01-01"}]:
+            with self.assertRaises(InvalidUsage):
+                validation.read_date_range(args)
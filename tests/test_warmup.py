@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+import unittest
+from mock import PropertyMock, MagicMock, patch, Mock
+
+from components import warmup
+from components.error import InvalidUsage
+from components.repository import Repository
+
+class TestWarmup(unittest.TestCase):
+    @patch('components.Fond.Investment.get_quotes')
+    def test_warm_up(self, get_quotes_mock):
+        """warm_up loads quotes for every ticker and skips the ones that fail"""
+        get_quotes_mock.side_effect = [[], InvalidUsage("invalid"), []]
+        self.assertEquals(warmup.warm_up(["T1", "T2", "T3"]), ["T1", "T3"])
+        self.assertEquals(get_quotes_mock.call_count, 3)
+
+    @patch('components.Investment.Investment._get_quotes_from_remote')
+    @patch('components.Investment.Investment._get_from_cache')
+    @patch('components.Investment.Investment._quotes_has_expired')
+    def test_warm_up_refreshes_expired_quotes(self, expired_mock, cache_mock, remote_mock):
+        """warm_up refreshes expired quotes before returning"""
+        expired_mock.return_value = True
+        cache_mock.return_value = {"fetch_time": 1234, "quotes": []}
+        remote_mock.return_value = {"fetch_time": 12345, "quotes": []}
+
+        self.assertEquals(warmup.warm_up(["T1"]), ["T1"])
+        remote_mock.assert_called_once_with()
+
+    def test_tickers_to_warm_up(self):
+        """tickers_to_warm_up combines configured tickers with the most held ones"""
+        repo = Mock(spec=Repository)
+        repo.hot_tickers.return_value = ["T2", "T3"]
+
+        self.assertEquals(warmup.tickers_to_warm_up(repo, ["T1", "T2"], 2), ["T1", "T2", "T3"])
+        repo.hot_tickers.assert_called_once_with(2)
+
+        repo.hot_tickers.reset_mock()
+        self.assertEquals(warmup.tickers_to_warm_up(repo, ["T1"], 0), ["T1"])
+        repo.hot_tickers.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import json
+import unittest
+from mock import patch, Mock
+from datetime import date
+
+from components import wire_format
+from components.records import DevelopmentRow
+from components.Portfolio import Portfolio
+
+class TestWireFormat(unittest.TestCase):
+    def setUp(self):
+        self.summary = [
+            {"ticker": "T1", "name": "Ticker 1", "total_deposited": 100, "development": [
+                DevelopmentRow(date(2016, 1, 1), 100, 100, {"quote_date": date(2016, 1, 1), "close": 10}),
+                DevelopmentRow(date(2016, 1, 2), 110.5, 0, {"quote_date": date(2016, 1, 2), "close": 11.05}),
+            ]},
+            {"ticker": "Portfolio", "name": "Portfolio", "total_deposited": 100, "covers": ["T1"], "development": [
+                DevelopmentRow(date(2016, 1, 1), 100, 100),
+                DevelopmentRow(date(2016, 1, 2), 110.5, 0),
+            ]},
+        ]
+
+    def test_columnar(self):
+        """columnar should turn the development rows into parallel arrays and keep the other fields"""
+        result = wire_format.columnar(self.summary)
+        self.assertEquals(result[0]["development"], {
+            "date": ["2016-01-01", "2016-01-02"],
+            "value": [100, 110.5],
+            "deposit": [100, 0],
+        })
+        self.assertEquals(result[1]["covers"], ["T1"])
+        self.assertEquals(result[1]["total_deposited"], 100)
+        self.assertEquals(len(self.summary[0]["development"]), 2)
+
+    def test_columnar_stored_summary(self):
+        """columnar should accept summaries decoded from json"""
+        stored = json.loads(wire_format.encode(self.summary, wire_format.JSON, default=Portfolio.json_serializer))
+        self.assertEquals(wire_format.columnar(stored), wire_format.columnar(self.summary))
+
+    def test_encode_columnar_json(self):
+        """encode should write the columnar format as json"""
+        encoded = wire_format.encode(self.summary, wire_format.COLUMNAR_JSON)
+        self.assertEquals(json.loads(encoded)[0]["development"]["date"], ["2016-01-01", "2016-01-02"])
+
+    def test_available(self):
+        """msgpack should only be offered when it is installed"""
+        with patch.object(wire_format, "msgpack", None):
+            self.assertEquals(wire_format.available(), [wire_format.JSON, wire_format.COLUMNAR_JSON])
+
+        msgpack = Mock()
+        msgpack.packb.return_value = "packed"
+        with patch.object(wire_format, "msgpack", msgpack):
+            self.assertIn(wire_format.COLUMNAR_MSGPACK, wire_format.available())
+            self.assertEquals(wire_format.encode(self.summary, wire_format.COLUMNAR_MSGPACK), "packed")
+            msgpack.packb.assert_called_once_with(wire_format.columnar(self.summary), use_bin_type=False)
+
+if __name__ == "__main__":
+    unittest.main()